@@ -1,23 +1,88 @@
-from typing import Optional
+from typing import Dict, FrozenSet, Iterable, List, NamedTuple, Optional, Tuple
 from sqlalchemy.exc import IntegrityError
 from datetime import datetime, timedelta, timezone
-from sqlalchemy import create_engine
+from sqlalchemy import (
+    and_,
+    bindparam,
+    create_engine,
+    delete,
+    func,
+    insert,
+    inspect,
+    or_,
+    select,
+    text,
+    update,
+)
 from sqlalchemy.orm import sessionmaker, declarative_base
 from app.connectors.db.base import Base
-from app.utils.date_helpers import get_start_window
-from app.connectors.db.models import TrainSchedule, APICallTracker
+from app.utils.date_helpers import from_epoch_minutes, get_start_window, to_epoch_minutes
+from app.connectors.db.models import (
+    APICallTracker,
+    CoverageInterval,
+    DepartureChange,
+    RefreshWindow,
+    TrainSchedule,
+)
+from app.connectors.db.tracker_mirror import TrackerKey, TrackerMirror
 from app.utils.config_loader import load_config
+from app.utils.intervals import IntervalSet
+from app.utils.logger import logger
+
+# (origin, destination, first epoch minute, end epoch minute) of departures an answer read
+DepartureRange = Tuple[str, str, int, int]
+
+
+class StoredDepartures(NamedTuple):
+    inserted: int
+    updated: int
+    deleted: int
+    # Epoch minutes of the departures that moved, appeared or went: old and new times both
+    changed: FrozenSet[int]
 
 
 class DatabaseConnector:
     """Handles database operations for train schedules and API tracking."""
 
     def create_db(self):
+        if self.engine.dialect.name == "sqlite" and not inspect(self.engine).get_table_names():
+            # Only takes effect before the first table exists, lets retention reclaim space incrementally
+            with self.engine.begin() as connection:
+                connection.execute(text("PRAGMA auto_vacuum = INCREMENTAL"))
         Base.metadata.create_all(bind=self.engine)
+        self._add_missing_columns()
+        self._add_missing_indexes()
+
+    def _add_missing_columns(self):
+        """create_all doesn't alter existing tables, so add any nullable columns added since."""
+        inspector = inspect(self.engine)
+        with self.engine.begin() as connection:
+            for table in Base.metadata.sorted_tables:
+                existing = {column["name"] for column in inspector.get_columns(table.name)}
+                for column in table.columns:
+                    if column.name in existing or not column.nullable:
+                        continue
+                    column_type = column.type.compile(dialect=self.engine.dialect)
+                    connection.execute(
+                        text(f"ALTER TABLE {table.name} ADD COLUMN {column.name} {column_type}")
+                    )
+                    if column.index:
+                        connection.execute(
+                            text(
+                                f"CREATE INDEX IF NOT EXISTS ix_{table.name}_{column.name} "
+                                f"ON {table.name} ({column.name})"
+                            )
+                        )
 
-    def __init__(self):
+    def _add_missing_indexes(self):
+        """create_all only indexes the tables it creates, so add indexes declared since."""
+        for table in Base.metadata.sorted_tables:
+            for index in table.indexes:
+                index.create(bind=self.engine, checkfirst=True)
+
+    def __init__(self, database_url: Optional[str] = None):
         config = load_config()
-        self.SQLALCHEMY_DATABASE_URL = config["db"]["database_url"]
+        self.SQLALCHEMY_DATABASE_URL = database_url or config["db"]["database_url"]
 
         self.engine = create_engine(
             self.SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False}
@@ -28,6 +93,12 @@ class DatabaseConnector:
         self.Base = declarative_base()
 
         self.session = self.SessionLocal()
+        self.tracker_mirror = TrackerMirror(
+            ttl_seconds=config["db"].get("tracker_mirror_ttl_seconds", 300),
+            max_entries=config["db"].get("tracker_mirror_max_entries", 100_000),
+        )
+        # (origin, destination) -> fetched intervals read or written by this worker
+        self.coverage_intervals: Dict[Tuple[str, str], IntervalSet] = {}
 
     def close(self):
         self.session.close()
@@ -75,6 +146,582 @@ class DatabaseConnector:
         self.session.refresh(new_entry)
         return new_entry
 
+    def store_departures(
+        self,
+        origin_station_code: str,
+        destination_station_code: str,
+        day: datetime,
+        departures,
+        window: Optional[Tuple[datetime, datetime]] = None,
+    ) -> StoredDepartures:
+        """
+        Merge a fetched board into the day's stored rows in one transaction, matching
+        departures by train_uid (or by times, for rows without one) so a refresh updates
+        changed times in place instead of appending the day again.
+
+        Stored rows missing from the board (cancelled trains, duplicates from older
+        appends) are removed: across the whole day without a window, and with one only
+        those departing inside it, since the board says nothing about the rest of the day.
+        A windowed refresh is recorded in refresh_window, and the departure times it
+        changed in departure_change, in the same transaction.
+        """
+        day_start = get_start_window(day)
+        inserts, updates, matched, changed = [], [], set(), set()
+
+        with self.engine.begin() as connection:
+            stored = connection.execute(
+                select(
+                    TrainSchedule.id,
+                    TrainSchedule.train_uid,
+                    TrainSchedule.origin_expected_departure_time,
+                    TrainSchedule.destination_aimed_arrival_time,
+                ).where(
+                    TrainSchedule.origin_station_code == origin_station_code,
+                    TrainSchedule.destination_station_code == destination_station_code,
+                    TrainSchedule.origin_expected_departure_time >= day_start,
+                    TrainSchedule.origin_expected_departure_time
+                    < day_start + timedelta(days=1),
+                )
+            ).all()
+            by_uid = {row.train_uid: row for row in stored if row.train_uid}
+            # Rows stored before train_uid existed, or trains the API gave no uid for
+            by_times = {
+                (row.origin_expected_departure_time, row.destination_aimed_arrival_time): row
+                for row in stored
+            }
+
+            for train in departures:
+                departure = train.origin_expected_departure_time
+                # The destination arrival doubles as the origin arrival, as in add_train_schedule callers
+                arrival = train.destination_aimed_arrival_time
+                if not departure < arrival:
+                    logger.warning(
+                        f"Skipping {origin_station_code} to {destination_station_code} departure at {departure} arriving at {arrival}"
+                    )
+                    continue
+                row = by_uid.get(train.train_uid) if train.train_uid else None
+                if row is None:
+                    row = by_times.get((departure, arrival))
+                if row is None:
+                    inserts.append(
+                        {
+                            "origin_station_code": origin_station_code,
+                            "destination_station_code": train.destination_station_code,
+                            "origin_expected_departure_time": departure,
+                            "origin_expected_arrival_time": arrival,
+                            "destination_aimed_arrival_time": arrival,
+                            "train_uid": train.train_uid,
+                        }
+                    )
+                    changed.add(departure)
+                    continue
+                matched.add(row.id)
+                times_changed = (
+                    row.origin_expected_departure_time != departure
+                    or row.destination_aimed_arrival_time != arrival
+                )
+                if times_changed:
+                    changed.update((row.origin_expected_departure_time, departure))
+                if times_changed or row.train_uid != train.train_uid:
+                    updates.append(
+                        {
+                            "row_id": row.id,
+                            "departure": departure,
+                            "arrival": arrival,
+                            "uid": train.train_uid,
+                        }
+                    )
+
+            removed = [
+                row
+                for row in stored
+                if row.id not in matched
+                and (window is None or window[0] <= row.origin_expected_departure_time < window[1])
+            ]
+            changed.update(row.origin_expected_departure_time for row in removed)
+            if removed:
+                connection.execute(
+                    delete(TrainSchedule).where(TrainSchedule.id.in_([row.id for row in removed]))
+                )
+            if updates:
+                connection.execute(
+                    update(TrainSchedule)
+                    .where(TrainSchedule.id == bindparam("row_id"))
+                    .values(
+                        origin_expected_departure_time=bindparam("departure"),
+                        origin_expected_arrival_time=bindparam("arrival"),
+                        destination_aimed_arrival_time=bindparam("arrival"),
+                        train_uid=bindparam("uid"),
+                    )
+                    .execution_options(synchronize_session=False),
+                    updates,
+                )
+            if inserts:
+                connection.execute(insert(TrainSchedule), inserts)
+            if window:
+                connection.execute(
+                    insert(RefreshWindow).values(
+                        origin_station_code=origin_station_code,
+                        destination_station_code=destination_station_code,
+                        window_start=window[0],
+                        window_end=window[1],
+                        refreshed_at=datetime.now(timezone.utc).replace(tzinfo=None),
+                        rows_changed=len(inserts) + len(updates) + len(removed),
+                    )
+                )
+                if changed:
+                    connection.execute(
+                        insert(DepartureChange),
+                        [
+                            {
+                                "origin_station_code": origin_station_code,
+                                "destination_station_code": destination_station_code,
+                                "departure_time": departure,
+                            }
+                            for departure in sorted(changed)
+                        ],
+                    )
+        # Rows changed underneath the session, don't serve stale identities from it
+        self.session.expire_all()
+        return StoredDepartures(
+            len(inserts),
+            len(updates),
+            len(removed),
+            frozenset(to_epoch_minutes(departure) for departure in changed),
+        )
+
+    def get_departure_change_ids(
+        self, ranges: Iterable[DepartureRange]
+    ) -> Dict[DepartureRange, int]:
+        """
+        The latest departure_change id inside each range, 0 if none, in one query. It only
+        moves when a windowed refresh changes a departure in the range, so it versions the
+        answers read from the range without involving the rest of the day.
+        """
+        ranges = set(ranges)
+        if not ranges:
+            return {}
+        rows = (
+            self.session.query(
+                DepartureChange.id,
+                DepartureChange.origin_station_code,
+                DepartureChange.destination_station_code,
+                DepartureChange.departure_time,
+            )
+            .filter(
+                or_(
+                    *(
+                        and_(
+                            DepartureChange.origin_station_code == origin,
+                            DepartureChange.destination_station_code == destination,
+                            DepartureChange.departure_time >= from_epoch_minutes(start),
+                            DepartureChange.departure_time < from_epoch_minutes(end),
+                        )
+                        for origin, destination, start, end in ranges
+                    )
+                )
+            )
+            .all()
+        )
+        latest = dict.fromkeys(ranges, 0)
+        for row in rows:
+            minute = to_epoch_minutes(row.departure_time)
+            for departure_range in ranges:
+                origin, destination, start, end = departure_range
+                if (
+                    row.origin_station_code == origin
+                    and row.destination_station_code == destination
+                    and start <= minute < end
+                ):
+                    latest[departure_range] = max(latest[departure_range], row.id)
+        return latest
+
+    def get_window_refreshed_at(
+        self,
+        origin_station_code: str,
+        destination_station_code: str,
+        window_start: datetime,
+        window_end: datetime,
+    ) -> Optional[datetime]:
+        """Latest refresh of a window covering [window_start, window_end), naive UTC."""
+        return (
+            self.session.query(func.max(RefreshWindow.refreshed_at))
+            .filter(
+                RefreshWindow.origin_station_code == origin_station_code,
+                RefreshWindow.destination_station_code == destination_station_code,
+                RefreshWindow.window_start <= window_start,
+                RefreshWindow.window_end >= window_end,
+            )
+            .scalar()
+        )
+
+    def get_coverage_gaps(
+        self,
+        origin_station_code: str,
+        destination_station_code: str,
+        start: datetime,
+        end: datetime,
+    ) -> List[Tuple[datetime, datetime]]:
+        """
+        The parts of [start, end) no fetched interval covers for the pair. Whole cached days
+        live in api_call_tracker, so check those first. Ranges the in-memory intervals
+        already cover need no query; otherwise the overlapping rows are read and merged in.
+        """
+        pair = (origin_station_code, destination_station_code)
+        known = self.coverage_intervals.get(pair)
+        if known is not None and known.covers(start, end):
+            return []
+        rows = (
+            self.session.query(CoverageInterval.interval_start, CoverageInterval.interval_end)
+            .filter(
+                CoverageInterval.origin_station_code == origin_station_code,
+                CoverageInterval.destination_station_code == destination_station_code,
+                CoverageInterval.interval_start < end,
+                CoverageInterval.interval_end > start,
+            )
+            .all()
+        )
+        intervals = self.coverage_intervals.setdefault(pair, IntervalSet())
+        for interval_start, interval_end in rows:
+            intervals.add(interval_start, interval_end)
+        return intervals.gaps(start, end)
+
+    def add_coverage_interval(
+        self,
+        origin_station_code: str,
+        destination_station_code: str,
+        start: datetime,
+        end: datetime,
+    ) -> bool:
+        """
+        Record that departures in [start, end) were fetched, merging with the pair's
+        overlapping or touching intervals. Returns True if this completed the day of
+        `start`, i.e. the day is now covered end to end and wasn't before.
+        """
+        day_start = get_start_window(start)
+        day_end = day_start + timedelta(days=1)
+        pair_filter = (
+            CoverageInterval.origin_station_code == origin_station_code,
+            CoverageInterval.destination_station_code == destination_station_code,
+        )
+        with self.engine.begin() as connection:
+            day_before = IntervalSet(
+                connection.execute(
+                    select(CoverageInterval.interval_start, CoverageInterval.interval_end).where(
+                        *pair_filter,
+                        CoverageInterval.interval_start < day_end,
+                        CoverageInterval.interval_end > day_start,
+                    )
+                ).all()
+            )
+            touching = connection.execute(
+                select(
+                    CoverageInterval.id,
+                    CoverageInterval.interval_start,
+                    CoverageInterval.interval_end,
+                ).where(
+                    *pair_filter,
+                    CoverageInterval.interval_start <= end,
+                    CoverageInterval.interval_end >= start,
+                )
+            ).all()
+            merged_start = min([start, *(row.interval_start for row in touching)])
+            merged_end = max([end, *(row.interval_end for row in touching)])
+            if touching:
+                connection.execute(
+                    delete(CoverageInterval).where(
+                        CoverageInterval.id.in_([row.id for row in touching])
+                    )
+                )
+            connection.execute(
+                insert(CoverageInterval).values(
+                    origin_station_code=origin_station_code,
+                    destination_station_code=destination_station_code,
+                    interval_start=merged_start,
+                    interval_end=merged_end,
+                    fetched_at=datetime.now(timezone.utc).replace(tzinfo=None),
+                )
+            )
+
+        pair = (origin_station_code, destination_station_code)
+        self.coverage_intervals.setdefault(pair, IntervalSet()).add(merged_start, merged_end)
+        day_after = IntervalSet(day_before)
+        day_after.add(merged_start, merged_end)
+        return day_after.covers(day_start, day_end) and not day_before.covers(
+            day_start, day_end
+        )
+
+    def delete_coverage_intervals_before(self, cutoff: datetime, limit: int) -> List[dict]:
+        """Delete up to `limit` coverage_interval rows ending before the cutoff day, returning them."""
+        cutoff_day = get_start_window(cutoff)
+        deleted = self._delete_batch(
+            CoverageInterval, CoverageInterval.interval_end <= cutoff_day, limit
+        )
+        for intervals in self.coverage_intervals.values():
+            intervals.discard_before(cutoff_day)
+        return deleted
+
+    def get_day_schedule_rows(
+        self,
+        origin_station_code: str,
+        destination_station_code: str,
+        day: datetime,
+    ) -> List[tuple]:
+        """A day's departures as plain row tuples, skipping ORM object hydration."""
+        day_start = get_start_window(day)
+        with self.engine.connect() as connection:
+            return connection.execute(
+                select(
+                    TrainSchedule.origin_station_code,
+                    TrainSchedule.destination_station_code,
+                    TrainSchedule.origin_expected_departure_time,
+                    TrainSchedule.origin_expected_arrival_time,
+                    TrainSchedule.destination_aimed_arrival_time,
+                )
+                .where(
+                    TrainSchedule.origin_station_code == origin_station_code,
+                    TrainSchedule.destination_station_code == destination_station_code,
+                    TrainSchedule.origin_expected_departure_time >= day_start,
+                    TrainSchedule.origin_expected_departure_time
+                    < day_start + timedelta(days=1),
+                )
+                .order_by(TrainSchedule.origin_expected_departure_time)
+            ).all()
+
+    def get_day_departures(
+        self,
+        origin_station_code: str,
+        destination_station_code: str,
+        day: datetime,
+    ) -> List[Tuple[datetime, datetime, datetime, Optional[str]]]:
+        """
+        A day's stored departures as (departure, origin arrival, destination arrival,
+        train_uid), in departure order.
+        """
+        day_start = get_start_window(day)
+        with self.engine.connect() as connection:
+            return connection.execute(
+                select(
+                    TrainSchedule.origin_expected_departure_time,
+                    TrainSchedule.origin_expected_arrival_time,
+                    TrainSchedule.destination_aimed_arrival_time,
+                    TrainSchedule.train_uid,
+                )
+                .where(
+                    TrainSchedule.origin_station_code == origin_station_code,
+                    TrainSchedule.destination_station_code == destination_station_code,
+                    TrainSchedule.origin_expected_departure_time >= day_start,
+                    TrainSchedule.origin_expected_departure_time
+                    < day_start + timedelta(days=1),
+                )
+                .order_by(TrainSchedule.origin_expected_departure_time, TrainSchedule.id)
+            ).all()
+
+    def import_days(self, days) -> Tuple[List[TrackerKey], int, int]:
+        """
+        Load whole cached days, as (origin, destination, day, last_fetched, departures) with
+        departures like get_day_departures rows, in one transaction. A day's departures
+        replace the ones stored for it and its tracker row takes the given last_fetched
+        (naive UTC), so imported days age out like fetched ones. Days this database fetched
+        at or after that time are kept as they are.
+        Returns (keys of the days imported, days skipped, rows inserted).
+        """
+        imported, skipped, inserted = [], 0, 0
+        with self.engine.begin() as connection:
+            for origin, destination, day, last_fetched, departures in days:
+                day_start = get_start_window(day)
+                stored = connection.execute(
+                    select(APICallTracker.last_fetched).where(
+                        APICallTracker.origin_station_code == origin,
+                        APICallTracker.destination_station_code == destination,
+                        APICallTracker.start_time == day_start,
+                    )
+                ).first()
+                if stored is not None and _naive_utc(stored.last_fetched) >= last_fetched:
+                    skipped += 1
+                    continue
+                connection.execute(
+                    delete(TrainSchedule).where(
+                        TrainSchedule.origin_station_code == origin,
+                        TrainSchedule.destination_station_code == destination,
+                        TrainSchedule.origin_expected_departure_time >= day_start,
+                        TrainSchedule.origin_expected_departure_time
+                        < day_start + timedelta(days=1),
+                    )
+                )
+                rows = [
+                    {
+                        "origin_station_code": origin,
+                        "destination_station_code": destination,
+                        "origin_expected_departure_time": departure,
+                        "origin_expected_arrival_time": origin_arrival,
+                        "destination_aimed_arrival_time": destination_arrival,
+                        "train_uid": train_uid,
+                    }
+                    for departure, origin_arrival, destination_arrival, train_uid in departures
+                    # Same rule as the table's check constraint
+                    if departure < origin_arrival
+                ]
+                if rows:
+                    connection.execute(insert(TrainSchedule), rows)
+                if stored is None:
+                    connection.execute(
+                        insert(APICallTracker).values(
+                            origin_station_code=origin,
+                            destination_station_code=destination,
+                            start_time=day_start,
+                            last_fetched=last_fetched,
+                        )
+                    )
+                else:
+                    connection.execute(
+                        update(APICallTracker)
+                        .where(
+                            APICallTracker.origin_station_code == origin,
+                            APICallTracker.destination_station_code == destination,
+                            APICallTracker.start_time == day_start,
+                        )
+                        .values(last_fetched=last_fetched)
+                    )
+                imported.append(((origin, destination, day_start), last_fetched))
+                inserted += len(rows)
+        for key, last_fetched in imported:
+            self.tracker_mirror.put(key, last_fetched)
+        self.session.expire_all()
+        return [key for key, _ in imported], skipped, inserted
+
+    def get_departure_times(
+        self,
+        origin_station_code: str,
+        destination_station_code: str,
+        start: datetime,
+        end: datetime,
+    ) -> List[Tuple[datetime, datetime]]:
+        """(departure, destination arrival) for every departure in [start, end), in departure order."""
+        with self.engine.connect() as connection:
+            return connection.execute(
+                select(
+                    TrainSchedule.origin_expected_departure_time,
+                    TrainSchedule.destination_aimed_arrival_time,
+                )
+                .where(
+                    TrainSchedule.origin_station_code == origin_station_code,
+                    TrainSchedule.destination_station_code == destination_station_code,
+                    TrainSchedule.origin_expected_departure_time >= start,
+                    TrainSchedule.origin_expected_departure_time < end,
+                )
+                .order_by(TrainSchedule.origin_expected_departure_time)
+            ).all()
+
+    def get_departures_page(
+        self,
+        origin_station_code: str,
+        destination_station_code: str,
+        start: datetime,
+        end: datetime,
+        limit: int,
+        after: Optional[Tuple[datetime, int]] = None,
+    ) -> List[Tuple[int, datetime, datetime]]:
+        """
+        Up to `limit` (id, departure, destination arrival) in [start, end), ordered by
+        departure then id. `after` is the (departure, id) of the last row of the previous
+        page; the next page seeks past it on the leg index rather than skipping rows with
+        OFFSET, so each page costs the same however deep it is.
+        """
+        conditions = [
+            TrainSchedule.origin_station_code == origin_station_code,
+            TrainSchedule.destination_station_code == destination_station_code,
+            TrainSchedule.origin_expected_departure_time >= start,
+            TrainSchedule.origin_expected_departure_time < end,
+        ]
+        if after is not None:
+            conditions.append(
+                or_(
+                    TrainSchedule.origin_expected_departure_time > after[0],
+                    and_(
+                        TrainSchedule.origin_expected_departure_time == after[0],
+                        TrainSchedule.id > after[1],
+                    ),
+                )
+            )
+        with self.engine.connect() as connection:
+            return connection.execute(
+                select(
+                    TrainSchedule.id,
+                    TrainSchedule.origin_expected_departure_time,
+                    TrainSchedule.destination_aimed_arrival_time,
+                )
+                .where(*conditions)
+                .order_by(TrainSchedule.origin_expected_departure_time, TrainSchedule.id)
+                .limit(limit)
+            ).all()
+
+    def get_api_call_keys(self, since: datetime) -> List[Tuple[str, str, datetime]]:
+        """(origin, destination, day) for every cached day from `since` onwards."""
+        return (
+            self.session.query(
+                APICallTracker.origin_station_code,
+                APICallTracker.destination_station_code,
+                APICallTracker.start_time,
+            )
+            .filter(APICallTracker.start_time >= get_start_window(since))
+            .all()
+        )
+
+    def get_api_call_versions(
+        self, keys: Iterable[Tuple[str, str, datetime]]
+    ) -> Dict[TrackerKey, datetime]:
+        """last_fetched for each cached (origin, destination, day) key, in one query."""
+        keys = {(origin, destination, get_start_window(day)) for origin, destination, day in keys}
+        return self._query_last_fetched(keys)
+
+    def get_coverage(
+        self, keys: Iterable[Tuple[str, str, datetime]]
+    ) -> Dict[TrackerKey, Optional[datetime]]:
+        """
+        Whether each (origin, destination, day) key is cached: its last_fetched (naive UTC),
+        or None if the day hasn't been fetched. Days in the tracker mirror are answered from
+        memory and the rest in one query, so a whole journey costs at most one round trip.
+        """
+        keys = {(origin, destination, get_start_window(day)) for origin, destination, day in keys}
+        coverage = {key: self.tracker_mirror.get(key) for key in keys}
+        missing = [key for key, last_fetched in coverage.items() if last_fetched is None]
+        if missing:
+            coverage.update(
+                (key, _naive_utc(last_fetched))
+                for key, last_fetched in self._query_last_fetched(missing).items()
+            )
+        return coverage
+
+    def _query_last_fetched(self, keys) -> Dict[TrackerKey, datetime]:
+        if not keys:
+            return {}
+        rows = (
+            self.session.query(
+                APICallTracker.origin_station_code,
+                APICallTracker.destination_station_code,
+                APICallTracker.start_time,
+                APICallTracker.last_fetched,
+            )
+            .filter(
+                or_(
+                    *(
+                        and_(
+                            APICallTracker.origin_station_code == origin,
+                            APICallTracker.destination_station_code == destination,
+                            APICallTracker.start_time == day,
+                        )
+                        for origin, destination, day in keys
+                    )
+                )
+            )
+            .all()
+        )
+        versions = {(origin, destination, day): fetched for origin, destination, day, fetched in rows}
+        for key, last_fetched in versions.items():
+            self.tracker_mirror.put(key, _naive_utc(last_fetched))
+        return versions
+
     def has_recent_api_call(
         self,
         origin_station_code: str,
@@ -82,6 +729,9 @@ class DatabaseConnector:
         start_time: datetime,
     ) -> bool:
         normalised_start_time = get_start_window(start_time)
+        key = (origin_station_code, destination_station_code, normalised_start_time)
+        if self.tracker_mirror.get(key) is not None:
+            return True
 
         recent_call = (
             self.session.query(APICallTracker)
@@ -92,6 +742,8 @@ class DatabaseConnector:
             )
             .first()
         )
+        if recent_call is not None:
+            self.tracker_mirror.put(key, _naive_utc(recent_call.last_fetched))
 
         return recent_call is not None
 
@@ -113,7 +765,85 @@ class DatabaseConnector:
             self.session.add(new_tracker)
             self.session.commit()
         except IntegrityError:
+            # Already cached, record the refresh so waiting workers can see it happened
             self.session.rollback()
+            self.session.query(APICallTracker).filter_by(
+                origin_station_code=origin_station_code,
+                destination_station_code=destination_station_code,
+                start_time=start_window,
+            ).update({"last_fetched": new_tracker.last_fetched})
+            self.session.commit()
+        self.tracker_mirror.put(
+            (origin_station_code, destination_station_code, start_window),
+            _naive_utc(new_tracker.last_fetched),
+        )
+
+    def add_api_call_trackers(
+        self,
+        origin_station_code: str,
+        destination_station_codes: Iterable[str],
+        start_time: datetime,
+    ):
+        """Mark several destinations from one origin as fetched for the day, in one transaction."""
+        start_window = get_start_window(start_time)
+        destinations = set(destination_station_codes)
+        last_fetched = datetime.now(timezone.utc)
+        with self.engine.begin() as connection:
+            existing = set(
+                connection.execute(
+                    select(APICallTracker.destination_station_code).where(
+                        APICallTracker.origin_station_code == origin_station_code,
+                        APICallTracker.start_time == start_window,
+                        APICallTracker.destination_station_code.in_(destinations),
+                    )
+                ).scalars()
+            )
+            if existing:
+                connection.execute(
+                    update(APICallTracker)
+                    .where(
+                        APICallTracker.origin_station_code == origin_station_code,
+                        APICallTracker.start_time == start_window,
+                        APICallTracker.destination_station_code.in_(existing),
+                    )
+                    .values(last_fetched=last_fetched)
+                )
+            if destinations - existing:
+                connection.execute(
+                    insert(APICallTracker),
+                    [
+                        {
+                            "origin_station_code": origin_station_code,
+                            "destination_station_code": destination,
+                            "start_time": start_window,
+                            "last_fetched": last_fetched,
+                        }
+                        for destination in destinations - existing
+                    ],
+                )
+        self.session.expire_all()
+        for destination in destinations:
+            self.tracker_mirror.put(
+                (origin_station_code, destination, start_window), _naive_utc(last_fetched)
+            )
+
+    def get_api_call_last_fetched(
+        self,
+        origin_station_code: str,
+        destination_station_code: str,
+        start_time: datetime,
+    ) -> Optional[datetime]:
+        """When the day was last fetched from the API (naive UTC), or None if it isn't cached."""
+        last_fetched = (
+            self.session.query(APICallTracker.last_fetched)
+            .filter_by(
+                origin_station_code=origin_station_code,
+                destination_station_code=destination_station_code,
+                start_time=get_start_window(start_time),
+            )
+            .scalar()
+        )
+        return _naive_utc(last_fetched)
 
     def update_api_call_tracker(self, origin_station_code: str, start_time: datetime):
         tracker = (
@@ -128,5 +858,114 @@ class DatabaseConnector:
             tracker.last_fetched = datetime.now(timezone.utc)
             self.session.commit()
 
+    def get_popular_routes(
+        self, since: datetime, limit: int
+    ) -> List[Tuple[str, str, int]]:
+        """(origin, destination, days fetched) for the most frequently fetched routes since a day."""
+        return (
+            self.session.query(
+                APICallTracker.origin_station_code,
+                APICallTracker.destination_station_code,
+                func.count(APICallTracker.id).label("days_fetched"),
+            )
+            .filter(APICallTracker.start_time >= get_start_window(since))
+            .group_by(
+                APICallTracker.origin_station_code,
+                APICallTracker.destination_station_code,
+            )
+            .order_by(func.count(APICallTracker.id).desc())
+            .limit(limit)
+            .all()
+        )
+
+    def delete_api_call_trackers_before(
+        self, cutoff: datetime, limit: int
+    ) -> List[dict]:
+        """Delete up to `limit` tracker rows for days before the cutoff, returning them."""
+        deleted = self._delete_batch(
+            APICallTracker, APICallTracker.start_time < get_start_window(cutoff), limit
+        )
+        self.tracker_mirror.discard_before(get_start_window(cutoff))
+        return deleted
+
+    def delete_refresh_windows_before(self, cutoff: datetime, limit: int) -> List[dict]:
+        """Delete up to `limit` refresh_window rows for days before the cutoff, returning them."""
+        return self._delete_batch(
+            RefreshWindow, RefreshWindow.window_start < get_start_window(cutoff), limit
+        )
+
+    def delete_departure_changes_before(self, cutoff: datetime, limit: int) -> List[dict]:
+        """Delete up to `limit` departure_change rows for days before the cutoff, returning them."""
+        return self._delete_batch(
+            DepartureChange, DepartureChange.departure_time < get_start_window(cutoff), limit
+        )
+
+    def delete_train_schedules_before(self, cutoff: datetime, limit: int) -> List[dict]:
+        """Delete up to `limit` schedule rows departing before the cutoff, returning them."""
+        return self._delete_batch(
+            TrainSchedule, TrainSchedule.origin_expected_departure_time < cutoff, limit
+        )
+
+    def count_rows_before(self, cutoff: datetime) -> Tuple[int, int]:
+        """(train_schedule rows, api_call_tracker rows) that a retention run would remove."""
+        schedules = (
+            self.session.query(func.count(TrainSchedule.id))
+            .filter(TrainSchedule.origin_expected_departure_time < cutoff)
+            .scalar()
+        )
+        trackers = (
+            self.session.query(func.count(APICallTracker.id))
+            .filter(APICallTracker.start_time < get_start_window(cutoff))
+            .scalar()
+        )
+        return schedules, trackers
+
+    def _delete_batch(self, model, condition, limit: int) -> List[dict]:
+        # Short transaction per batch, so readers and the request path are never blocked for long
+        with self.engine.begin() as connection:
+            rows = (
+                connection.execute(
+                    select(model.__table__).where(condition).order_by(model.id).limit(limit)
+                )
+                .mappings()
+                .all()
+            )
+            if rows:
+                connection.execute(
+                    delete(model).where(model.id.in_([row["id"] for row in rows]))
+                )
+        return [dict(row) for row in rows]
+
+    def compact(self, incremental_vacuum_pages: int = 0, full_vacuum: bool = False):
+        """Reclaim free pages and refresh planner statistics (SQLite only)."""
+        if self.engine.dialect.name != "sqlite":
+            return
+        with self.engine.connect() as connection:
+            if full_vacuum:
+                connection.exec_driver_sql("VACUUM")
+            elif incremental_vacuum_pages:
+                auto_vacuum = connection.exec_driver_sql("PRAGMA auto_vacuum").scalar()
+                if auto_vacuum == 2:
+                    # executescript steps the pragma to completion, a plain execute frees one page
+                    connection.connection.driver_connection.executescript(
+                        f"PRAGMA incremental_vacuum({int(incremental_vacuum_pages)});"
+                    )
+            connection.exec_driver_sql("PRAGMA optimize")
+            connection.commit()
+
+    def enable_incremental_vacuum(self):
+        """One-off conversion of an existing SQLite file to auto_vacuum=INCREMENTAL (rewrites the file)."""
+        with self.engine.connect() as connection:
+            connection.exec_driver_sql("PRAGMA auto_vacuum = INCREMENTAL")
+            connection.exec_driver_sql("VACUUM")
+            connection.commit()
+
+
+def _naive_utc(value: Optional[datetime]) -> Optional[datetime]:
+    """Tracker timestamps as naive UTC, whether or not the driver kept the timezone."""
+    if value is not None and value.tzinfo is not None:
+        value = value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
+
 
 db_connector = DatabaseConnector()
@@ -4,6 +4,7 @@ from sqlalchemy import (
     Integer,
     String,
     DateTime,
+    Index,
     UniqueConstraint,
 )
 from app.connectors.db.base import Base
@@ -18,12 +19,21 @@ class TrainSchedule(Base):
     origin_expected_departure_time = Column(DateTime, nullable=False, index=True)
     origin_expected_arrival_time = Column(DateTime, nullable=False)
     destination_aimed_arrival_time = Column(DateTime, nullable=False)
+    # TransportAPI's id for the service, lets refreshes update a departure in place
+    train_uid = Column(String, nullable=True, index=True)
 
     __table_args__ = (
         CheckConstraint(
             "origin_expected_departure_time < origin_expected_arrival_time",
             name="check_departure_before_arrival",
         ),
+        # A leg's departures in time order, for range reads and keyset paging
+        Index(
+            "ix_train_schedule_leg",
+            "origin_station_code",
+            "destination_station_code",
+            "origin_expected_departure_time",
+        ),
     )
 
 
@@ -44,3 +54,56 @@ class APICallTracker(Base):
             name="unique_station_time",
         ),
     )
+
+
+class RefreshWindow(Base):
+    """A partial refresh of a cached day, covering [window_start, window_end)."""
+
+    __tablename__ = "refresh_window"
+
+    id = Column(Integer, primary_key=True, index=True)
+    origin_station_code = Column(String, nullable=False, index=True)
+    destination_station_code = Column(String, nullable=False, index=True)
+    window_start = Column(DateTime, nullable=False, index=True)
+    window_end = Column(DateTime, nullable=False)
+    refreshed_at = Column(DateTime, nullable=False)
+    rows_changed = Column(Integer, nullable=False, default=0)
+
+
+class DepartureChange(Base):
+    """
+    A departure time a windowed refresh changed: a train's old or new departure, one row
+    each. Versions cached responses by the departure ranges they depend on.
+    """
+
+    __tablename__ = "departure_change"
+
+    id = Column(Integer, primary_key=True, index=True)
+    origin_station_code = Column(String, nullable=False)
+    destination_station_code = Column(String, nullable=False)
+    departure_time = Column(DateTime, nullable=False, index=True)
+
+    __table_args__ = (
+        Index(
+            "ix_departure_change_leg",
+            "origin_station_code",
+            "destination_station_code",
+            "departure_time",
+        ),
+    )
+
+
+class CoverageInterval(Base):
+    """
+    Departures fetched for [interval_start, interval_end) of a pair whose day isn't
+    fully cached. Overlapping and touching intervals are merged into one row.
+    """
+
+    __tablename__ = "coverage_interval"
+
+    id = Column(Integer, primary_key=True, index=True)
+    origin_station_code = Column(String, nullable=False, index=True)
+    destination_station_code = Column(String, nullable=False, index=True)
+    interval_start = Column(DateTime, nullable=False, index=True)
+    interval_end = Column(DateTime, nullable=False)
+    fetched_at = Column(DateTime, nullable=False)
@@ -0,0 +1,257 @@
+import csv
+import glob
+import gzip
+import json
+import os
+from datetime import datetime, timezone
+from itertools import groupby, islice
+from typing import Iterable, Iterator, List, NamedTuple, Optional, Tuple
+
+from app.connectors.db.db_connector import DatabaseConnector
+from app.connectors.snapshot.snapshot_store import snapshot_store
+from app.connectors.train_api.train_api_connector import map_api_response_to_model
+from app.utils.date_helpers import get_start_window, to_epoch_minutes
+from app.utils.logger import logger
+
+BUNDLE_FORMAT = 1
+MANIFEST_FILE = "manifest.json"
+TRACKER_FILE = "api_call_tracker.csv.gz"
+SCHEDULE_FILE = "train_schedule.csv.gz"
+TRACKER_COLUMNS = ("origin_station_code", "destination_station_code", "start_time", "last_fetched")
+SCHEDULE_COLUMNS = (
+    "origin_station_code",
+    "destination_station_code",
+    "origin_expected_departure_time",
+    "origin_expected_arrival_time",
+    "destination_aimed_arrival_time",
+    "train_uid",
+)
+DAY_FORMAT = "%Y-%m-%d"
+
+
+class BundleDay(NamedTuple):
+    """A whole cached day: its tracker entry and its departures, as get_day_departures rows."""
+
+    origin_station_code: str
+    destination_station_code: str
+    day: datetime
+    last_fetched: datetime
+    departures: List[tuple]
+
+
+class BundleError(ValueError):
+    """Raised when a bundle is missing files, from another format version or out of order."""
+
+
+def write_bundle(directory: str, days: Iterable[BundleDay]) -> Tuple[int, int]:
+    """
+    Write days, in (origin, destination, day) order, to `directory` as gzip compressed
+    CSV: one tracker row per day, the days' departures in the same order, and a
+    manifest. Returns (days, rows) written.
+    """
+    os.makedirs(directory, exist_ok=True)
+    day_count = row_count = 0
+    with _open_csv(directory, TRACKER_FILE, "wt") as tracker_file, _open_csv(
+        directory, SCHEDULE_FILE, "wt"
+    ) as schedule_file:
+        trackers = csv.writer(tracker_file)
+        schedule = csv.writer(schedule_file)
+        trackers.writerow(TRACKER_COLUMNS)
+        schedule.writerow(SCHEDULE_COLUMNS)
+        for origin, destination, day, last_fetched, departures in days:
+            # Tracker timestamps keep their microseconds, they version cached responses
+            trackers.writerow(
+                (origin, destination, f"{day:{DAY_FORMAT}}", last_fetched.isoformat(" "))
+            )
+            # isoformat and fromisoformat rather than strftime and strptime, which are
+            # several times slower and dominate the time a large bundle takes
+            schedule.writerows(
+                (
+                    origin,
+                    destination,
+                    departure.isoformat(" ", "minutes"),
+                    origin_arrival.isoformat(" ", "minutes"),
+                    destination_arrival.isoformat(" ", "minutes"),
+                    train_uid or "",
+                )
+                for departure, origin_arrival, destination_arrival, train_uid in departures
+            )
+            day_count += 1
+            row_count += len(departures)
+    with open(os.path.join(directory, MANIFEST_FILE), "w", encoding="utf-8") as file:
+        json.dump(
+            {
+                "format": BUNDLE_FORMAT,
+                "created_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+                "days": day_count,
+                "rows": row_count,
+            },
+            file,
+            indent=2,
+        )
+    return day_count, row_count
+
+
+def read_bundle(directory: str) -> Iterator[BundleDay]:
+    """The days in a bundle, in the order they were written, read as they are needed."""
+    try:
+        with open(os.path.join(directory, MANIFEST_FILE), "r", encoding="utf-8") as file:
+            manifest = json.load(file)
+    except (OSError, ValueError) as e:
+        raise BundleError(f"No readable bundle manifest in {directory}: {e}")
+    if manifest.get("format") != BUNDLE_FORMAT:
+        raise BundleError(f"Unsupported bundle format {manifest.get('format')!r}")
+
+    with _open_csv(directory, TRACKER_FILE, "rt") as tracker_file, _open_csv(
+        directory, SCHEDULE_FILE, "rt"
+    ) as schedule_file:
+        trackers = csv.reader(tracker_file)
+        schedule = csv.reader(schedule_file)
+        next(trackers, None)
+        next(schedule, None)
+        # Departures are written day by day in tracker order, so the two files are merged
+        # a day at a time rather than loading the schedule into memory
+        groups = groupby(schedule, key=lambda row: (row[0], row[1], row[2][:10]))
+        group = next(groups, None)
+        for origin, destination, day, last_fetched in trackers:
+            if group is not None and group[0] < (origin, destination, day):
+                raise BundleError(f"Departures for {group[0]} don't follow their tracker row")
+            departures = []
+            if group is not None and group[0] == (origin, destination, day):
+                departures = [
+                    (
+                        datetime.fromisoformat(row[2]),
+                        datetime.fromisoformat(row[3]),
+                        datetime.fromisoformat(row[4]),
+                        row[5] or None,
+                    )
+                    for row in group[1]
+                ]
+                group = next(groups, None)
+            yield BundleDay(
+                origin,
+                destination,
+                datetime.fromisoformat(day),
+                datetime.fromisoformat(last_fetched),
+                departures,
+            )
+        if group is not None:
+            raise BundleError(f"Departures for {group[0]} don't follow their tracker row")
+
+
+def export_bundle(
+    db: DatabaseConnector, directory: str, since: Optional[datetime] = None
+) -> Tuple[int, int]:
+    """Write every cached day from `since` (default: all of them) to a bundle."""
+    keys = sorted(db.get_api_call_keys(since or datetime.min))
+    versions = db.get_api_call_versions(keys)
+    return write_bundle(
+        directory,
+        (
+            BundleDay(
+                origin,
+                destination,
+                day,
+                versions[(origin, destination, day)],
+                db.get_day_departures(origin, destination, day),
+            )
+            for origin, destination, day in keys
+            if (origin, destination, day) in versions
+        ),
+    )
+
+
+def import_days(
+    db: DatabaseConnector, days: Iterable[BundleDay], batch_days: int = 500
+) -> Tuple[int, int, int]:
+    """
+    Load days into the database, `batch_days` per transaction, and refresh their
+    snapshots. Returns (days imported, days skipped as already fresher here, rows).
+    """
+    imported = skipped = rows = 0
+    days = iter(days)
+    while batch := list(islice(days, batch_days)):
+        keys, batch_skipped, batch_rows = db.import_days(batch)
+        imported += len(keys)
+        skipped += batch_skipped
+        rows += batch_rows
+        if snapshot_store.enabled:
+            _write_snapshots(batch, set(keys))
+        logger.info(f"Imported {imported} days so far, {rows} departures")
+    return imported, skipped, rows
+
+
+def import_bundle(db: DatabaseConnector, directory: str, batch_days: int = 500):
+    return import_days(db, read_bundle(directory), batch_days)
+
+
+def days_from_captures(pattern: str = "api_raw_data/*.json") -> Iterator[BundleDay]:
+    """
+    Whole days from saved TransportAPI responses named
+    `<ORIGIN>_TO_<DESTINATION>_AT_<request time>_<captured at>.json`, mapped as a fetch
+    would map them. The latest capture of each pair and day wins, and boards with no
+    departures are left out, as fetches don't cache those either.
+    """
+    latest = {}
+    for path in sorted(glob.glob(pattern)):
+        name = os.path.basename(path).removesuffix(".json")
+        origin, _, rest = name.partition("_TO_")
+        destination, _, rest = rest.partition("_AT_")
+        try:
+            captured_at = datetime.strptime(rest.rsplit("_", 2)[1], "%Y-%m-%dT%H-%M-%S.%f")
+        except (IndexError, ValueError):
+            logger.warning(f"Skipping capture with an unexpected name: {path}")
+            continue
+        with open(path, "r", encoding="utf-8") as file:
+            payload = json.load(file)
+        try:
+            day = datetime.strptime(payload.get("date", ""), DAY_FORMAT)
+        except ValueError:
+            logger.warning(f"Skipping capture without a board date: {path}")
+            continue
+        key = (origin, destination, day)
+        if key not in latest or latest[key][0] < captured_at:
+            latest[key] = (captured_at, payload)
+
+    for (origin, destination, day), (captured_at, payload) in sorted(latest.items()):
+        departures = []
+        for record in map_api_response_to_model(payload).departures:
+            departure = record.origin_expected_departure_time
+            if record.destination_station_code != destination or get_start_window(departure) != day:
+                continue
+            # The destination arrival doubles as the origin arrival, as in store_departures
+            arrival = record.destination_aimed_arrival_time
+            departures.append((departure, arrival, arrival, record.train_uid))
+        if departures:
+            departures.sort(key=lambda row: row[:3])
+            yield BundleDay(origin, destination, day, captured_at, departures)
+
+
+def _write_snapshots(days: List[BundleDay], keys: set):
+    for origin, destination, day, _, departures in days:
+        if (origin, destination, get_start_window(day)) not in keys:
+            continue
+        snapshot_store.write(
+            origin,
+            destination,
+            day,
+            [
+                (
+                    origin,
+                    destination,
+                    to_epoch_minutes(departure),
+                    to_epoch_minutes(origin_arrival),
+                    to_epoch_minutes(destination_arrival),
+                )
+                for departure, origin_arrival, destination_arrival, _ in departures
+                if departure < origin_arrival
+            ],
+        )
+
+
+def _open_csv(directory: str, name: str, mode: str):
+    path = os.path.join(directory, name)
+    try:
+        return gzip.open(path, mode, encoding="utf-8", newline="")
+    except FileNotFoundError:
+        raise BundleError(f"Bundle file missing: {path}")
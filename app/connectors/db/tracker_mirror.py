@@ -0,0 +1,63 @@
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+from typing import Optional, Tuple
+
+TrackerKey = Tuple[str, str, datetime]
+
+
+class TrackerMirror:
+    """
+    In-process copy of the api_call_tracker rows this worker has read or written, so
+    coverage checks for cached days don't need a query.
+
+    Only cached days are mirrored: a day missing here may have been fetched by another
+    worker since, so misses always go to the database. Entries are re-read after
+    `ttl_seconds`, which bounds how stale a last_fetched here can be; anything that must be
+    exact across workers, such as response cache versions, reads the table directly.
+    """
+
+    def __init__(self, ttl_seconds: float = 300, max_entries: int = 100_000):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        # key -> (last_fetched, monotonic expiry)
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        return self.ttl_seconds > 0
+
+    def get(self, key: TrackerKey) -> Optional[datetime]:
+        """last_fetched for a cached day, or None if it isn't mirrored (or has expired)."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry[1] <= time.monotonic():
+                del self._entries[key]
+                return None
+            return entry[0]
+
+    def put(self, key: TrackerKey, last_fetched: datetime):
+        if not self.enabled:
+            return
+        with self._lock:
+            self._entries[key] = (last_fetched, time.monotonic() + self.ttl_seconds)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def discard_before(self, day: datetime):
+        """Forget days before `day`, after retention removed their tracker rows."""
+        with self._lock:
+            for key in [key for key in self._entries if key[2] < day]:
+                del self._entries[key]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
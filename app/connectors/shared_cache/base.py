@@ -0,0 +1,52 @@
+import asyncio
+import time
+import uuid
+from abc import ABC, abstractmethod
+from contextlib import asynccontextmanager
+
+from app.utils.logger import logger
+
+
+class SharedCache(ABC):
+    """
+    Advisory locks shared by every worker on a node, for fetch de-duplication and job
+    claims. Timetables themselves are shared through the database and snapshot files.
+
+    Locks are leases: they expire after their TTL so a crashed worker can't wedge a key,
+    and only the holder's token can release them.
+    """
+
+    @abstractmethod
+    async def acquire_lock(self, name: str, token: str, ttl_seconds: float) -> bool: ...
+
+    @abstractmethod
+    async def release_lock(self, name: str, token: str) -> bool: ...
+
+    async def close(self):
+        pass
+
+    @asynccontextmanager
+    async def lock(
+        self,
+        name: str,
+        ttl_seconds: float = 30,
+        wait_seconds: float = 20,
+        poll_seconds: float = 0.05,
+    ):
+        """
+        Hold the named lock for the duration of the block. Yields whether it was acquired,
+        callers carry on unlocked after wait_seconds rather than failing the request.
+        """
+        token = uuid.uuid4().hex
+        deadline = time.monotonic() + wait_seconds
+        acquired = await self.acquire_lock(name, token, ttl_seconds)
+        while not acquired and time.monotonic() < deadline:
+            await asyncio.sleep(poll_seconds)
+            acquired = await self.acquire_lock(name, token, ttl_seconds)
+        if not acquired:
+            logger.warning(f"Timed out waiting for shared lock {name}, continuing without it")
+        try:
+            yield acquired
+        finally:
+            if acquired:
+                await self.release_lock(name, token)
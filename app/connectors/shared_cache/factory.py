@@ -0,0 +1,21 @@
+from app.connectors.shared_cache.base import SharedCache
+from app.connectors.shared_cache.local_cache import LocalSharedCache
+from app.connectors.shared_cache.redis_cache import RedisSharedCache
+from app.connectors.shared_cache.sqlite_cache import SQLiteSharedCache
+from app.utils.config_loader import load_config
+
+
+def create_shared_cache(settings: dict) -> SharedCache:
+    """Build the configured backend: "local" (per process), "sqlite" (per node) or "redis"."""
+    backend = settings.get("backend", "local")
+    if backend == "local":
+        return LocalSharedCache()
+    if backend == "sqlite":
+        return SQLiteSharedCache(settings.get("sqlite_path", "shared_cache.db"))
+    if backend == "redis":
+        return RedisSharedCache(settings.get("redis_url", "redis://localhost:6379/0"))
+    raise ValueError(f"Unknown shared cache backend: {backend}")
+
+
+shared_cache_config = load_config().get("shared_cache", {})
+shared_cache = create_shared_cache(shared_cache_config)
@@ -0,0 +1,121 @@
+import asyncio
+import time
+from typing import Optional
+
+from app.connectors.shared_cache.redis_cache import RELEASE_LOCK_SCRIPT, encode_command
+
+
+def _encode_reply(value) -> bytes:
+    if value is None:
+        return b"$-1\r\n"
+    if isinstance(value, bool) or isinstance(value, int):
+        return b":%d\r\n" % int(value)
+    if isinstance(value, str):
+        return f"+{value}\r\n".encode()
+    if isinstance(value, Exception):
+        return f"-ERR {value}\r\n".encode()
+    return b"$%d\r\n%s\r\n" % (len(value), value)
+
+
+class FakeRedisServer:
+    """
+    Minimal in-process Redis-protocol server implementing the commands RedisSharedCache
+    uses (GET/SET with NX/PX/EX, DEL, PING, SELECT, AUTH, FLUSHDB and the lock release
+    script). Lets the Redis backend run in tests and offline without a real server.
+    """
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0):
+        self.host = host
+        self.port = port
+        self._data = {}
+        self._server: Optional[asyncio.AbstractServer] = None
+        self.commands = 0
+
+    @property
+    def url(self) -> str:
+        return f"redis://{self.host}:{self.port}/0"
+
+    async def start(self):
+        self._server = await asyncio.start_server(self._handle, self.host, self.port)
+        self.port = self._server.sockets[0].getsockname()[1]
+        return self
+
+    async def stop(self):
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+
+    def _get(self, key: bytes):
+        entry = self._data.get(key)
+        if entry is None:
+            return None
+        value, expires_at = entry
+        if expires_at is not None and expires_at <= time.monotonic():
+            del self._data[key]
+            return None
+        return value
+
+    def _set(self, args):
+        key, value, options = args[0], args[1], [arg.upper() for arg in args[2:]]
+        expires_at = None
+        if b"PX" in options:
+            expires_at = time.monotonic() + int(args[2 + options.index(b"PX") + 1]) / 1000
+        if b"EX" in options:
+            expires_at = time.monotonic() + int(args[2 + options.index(b"EX") + 1])
+        if b"NX" in options and self._get(key) is not None:
+            return None
+        if b"XX" in options and self._get(key) is None:
+            return None
+        self._data[key] = (value, expires_at)
+        return "OK"
+
+    def _eval(self, args):
+        script, keys = args[0].decode(), args[2 : 2 + int(args[1])]
+        if script != RELEASE_LOCK_SCRIPT:
+            return ValueError("FakeRedisServer only supports the lock release script")
+        token = args[2 + int(args[1])]
+        if self._get(keys[0]) == token:
+            del self._data[keys[0]]
+            return 1
+        return 0
+
+    def dispatch(self, command: bytes, args):
+        self.commands += 1
+        name = command.upper()
+        if name == b"PING":
+            return "PONG"
+        if name in (b"SELECT", b"AUTH"):
+            return "OK"
+        if name == b"FLUSHDB":
+            self._data.clear()
+            return "OK"
+        if name == b"GET":
+            return self._get(args[0])
+        if name == b"SET":
+            return self._set(args)
+        if name == b"DEL":
+            return sum(1 for key in args if self._data.pop(key, None) is not None)
+        if name == b"EVAL":
+            return self._eval(args)
+        return ValueError(f"unknown command '{command.decode()}'")
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            while True:
+                header = await reader.readline()
+                if not header:
+                    break
+                count = int(header[1:-2])
+                parts = []
+                for _ in range(count):
+                    length = int((await reader.readline())[1:-2])
+                    parts.append((await reader.readexactly(length + 2))[:-2])
+                writer.write(_encode_reply(self.dispatch(parts[0], parts[1:])))
+                await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+
+__all__ = ["FakeRedisServer", "encode_command"]
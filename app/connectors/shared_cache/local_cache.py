@@ -0,0 +1,32 @@
+import time
+
+from app.connectors.shared_cache.base import SharedCache
+
+
+class LocalSharedCache(SharedCache):
+    """In-process backend, for single worker deployments and tests."""
+
+    def __init__(self):
+        self._locks = {}
+
+    def _live(self, store: dict, key: str):
+        entry = store.get(key)
+        if entry is None:
+            return None
+        value, expires_at = entry
+        if expires_at is not None and expires_at <= time.monotonic():
+            del store[key]
+            return None
+        return value
+
+    async def acquire_lock(self, name: str, token: str, ttl_seconds: float) -> bool:
+        if self._live(self._locks, name) is not None:
+            return False
+        self._locks[name] = (token, time.monotonic() + ttl_seconds)
+        return True
+
+    async def release_lock(self, name: str, token: str) -> bool:
+        if self._live(self._locks, name) != token:
+            return False
+        del self._locks[name]
+        return True
@@ -0,0 +1,119 @@
+import asyncio
+from urllib.parse import urlparse
+
+from app.connectors.shared_cache.base import SharedCache
+
+# Deletes the lock only if it still holds our token, so an expired-and-retaken lock
+# is never released by its previous owner
+RELEASE_LOCK_SCRIPT = (
+    "if redis.call('get', KEYS[1]) == ARGV[1] then "
+    "return redis.call('del', KEYS[1]) else return 0 end"
+)
+
+
+class RedisError(Exception):
+    pass
+
+
+def encode_command(*args) -> bytes:
+    parts = [f"*{len(args)}\r\n".encode()]
+    for arg in args:
+        data = arg if isinstance(arg, bytes) else str(arg).encode()
+        parts.append(b"$%d\r\n%s\r\n" % (len(data), data))
+    return b"".join(parts)
+
+
+async def read_reply(reader: asyncio.StreamReader):
+    line = await reader.readline()
+    if not line:
+        raise ConnectionError("Connection closed by server")
+    kind, payload = line[:1], line[1:-2]
+    if kind == b"+":
+        return payload.decode()
+    if kind == b"-":
+        raise RedisError(payload.decode())
+    if kind == b":":
+        return int(payload)
+    if kind == b"$":
+        length = int(payload)
+        if length == -1:
+            return None
+        data = await reader.readexactly(length + 2)
+        return data[:-2]
+    if kind == b"*":
+        length = int(payload)
+        if length == -1:
+            return None
+        return [await read_reply(reader) for _ in range(length)]
+    raise RedisError(f"Unexpected reply from server: {line!r}")
+
+
+class RedisSharedCache(SharedCache):
+    """
+    Backend speaking the Redis protocol (RESP2) over a single asyncio connection, so it
+    needs no client library. Commands are serialised over the connection and it
+    reconnects once on a dropped connection.
+    """
+
+    def __init__(self, url: str = "redis://localhost:6379/0", key_prefix: str = "trains:"):
+        parsed = urlparse(url)
+        self.host = parsed.hostname or "localhost"
+        self.port = parsed.port or 6379
+        self.password = parsed.password
+        self.database = int(parsed.path.lstrip("/") or 0)
+        self.key_prefix = key_prefix
+        self._reader = None
+        self._writer = None
+        self._lock = asyncio.Lock()
+
+    async def _connect(self):
+        self._reader, self._writer = await asyncio.open_connection(self.host, self.port)
+        if self.password:
+            await self._send("AUTH", self.password)
+        if self.database:
+            await self._send("SELECT", self.database)
+
+    async def _send(self, *args):
+        self._writer.write(encode_command(*args))
+        await self._writer.drain()
+        return await read_reply(self._reader)
+
+    async def execute(self, *args):
+        async with self._lock:
+            for attempt in range(2):
+                try:
+                    if self._writer is None:
+                        await self._connect()
+                    return await self._send(*args)
+                except (ConnectionError, OSError, asyncio.IncompleteReadError):
+                    await self._disconnect()
+                    if attempt:
+                        raise
+
+    async def _disconnect(self):
+        if self._writer is not None:
+            self._writer.close()
+            try:
+                await self._writer.wait_closed()
+            except (ConnectionError, OSError):
+                pass
+        self._reader = self._writer = None
+
+    def _key(self, key: str) -> str:
+        return f"{self.key_prefix}{key}"
+
+    async def acquire_lock(self, name: str, token: str, ttl_seconds: float) -> bool:
+        reply = await self.execute(
+            "SET", self._key(f"lock:{name}"), token, "NX", "PX", int(ttl_seconds * 1000)
+        )
+        return reply == "OK"
+
+    async def release_lock(self, name: str, token: str) -> bool:
+        reply = await self.execute(
+            "EVAL", RELEASE_LOCK_SCRIPT, 1, self._key(f"lock:{name}"), token
+        )
+        return reply == 1
+
+    async def close(self):
+        async with self._lock:
+            await self._disconnect()
@@ -0,0 +1,76 @@
+import asyncio
+import os
+import sqlite3
+import threading
+import time
+from typing import Optional
+
+from app.connectors.shared_cache.base import SharedCache
+
+
+class SQLiteSharedCache(SharedCache):
+    """
+    Node-local backend on a separate SQLite file in WAL mode. Every worker opens the same
+    file, so locks are shared between processes without running a server.
+    Expiry uses wall-clock time because monotonic clocks aren't comparable across processes.
+    Statements run in a thread, so waiting out another worker's write lock (up to
+    `busy_timeout_ms`) doesn't stall the event loop.
+    """
+
+    def __init__(self, path: str, busy_timeout_ms: int = 2000):
+        self.path = path
+        self.busy_timeout_ms = busy_timeout_ms
+        # Opened on first use in each process, since a SQLite connection must not be used
+        # on both sides of a fork and the production launcher forks its workers
+        self._connection: Optional[sqlite3.Connection] = None
+        self._pid: Optional[int] = None
+        self._mutex = threading.Lock()
+
+    def _connect(self):
+        self._mutex = threading.Lock()
+        self._connection = sqlite3.connect(
+            self.path,
+            timeout=self.busy_timeout_ms / 1000,
+            check_same_thread=False,
+            isolation_level=None,
+        )
+        self._pid = os.getpid()
+        with self._mutex:
+            self._connection.execute("PRAGMA journal_mode=WAL")
+            self._connection.execute("PRAGMA synchronous=NORMAL")
+            self._connection.execute(
+                "CREATE TABLE IF NOT EXISTS shared_lock "
+                "(name TEXT PRIMARY KEY, token TEXT NOT NULL, expires_at REAL NOT NULL)"
+            )
+
+    def _execute(self, sql: str, params: tuple = ()) -> int:
+        """Run a statement, returning how many rows it changed."""
+        if self._pid != os.getpid():
+            self._connect()
+        with self._mutex:
+            return self._connection.execute(sql, params).rowcount
+
+    async def acquire_lock(self, name: str, token: str, ttl_seconds: float) -> bool:
+        now = time.time()
+        # Takes the lock if it's free or its lease ran out, in a single atomic statement
+        changed = await asyncio.to_thread(
+            self._execute,
+            "INSERT INTO shared_lock (name, token, expires_at) VALUES (?, ?, ?) "
+            "ON CONFLICT(name) DO UPDATE SET token = excluded.token, expires_at = excluded.expires_at "
+            "WHERE shared_lock.expires_at <= ?",
+            (name, token, now + ttl_seconds, now),
+        )
+        return changed == 1
+
+    async def release_lock(self, name: str, token: str) -> bool:
+        changed = await asyncio.to_thread(
+            self._execute, "DELETE FROM shared_lock WHERE name = ? AND token = ?", (name, token)
+        )
+        return changed == 1
+
+    async def close(self):
+        if self._pid != os.getpid():
+            return
+        with self._mutex:
+            self._connection.close()
+        self._connection = self._pid = None
@@ -0,0 +1,177 @@
+import mmap
+import os
+import struct
+import sys
+import zlib
+from array import array
+from bisect import bisect_left
+from typing import Iterable, List, Optional, Tuple
+
+from app.utils.date_helpers import from_epoch_minutes, to_epoch_minutes
+
+# File layout (little-endian):
+#   header   magic, version, reserved, day (epoch minutes), row count,
+#            station table length, crc32 of everything after the header
+#   stations newline separated CRS codes, padded to a 4 byte boundary
+#   columns  int32 departure / origin arrival / destination arrival (epoch minutes),
+#            then uint16 origin / destination indexes into the station table
+# Rows are sorted by departure so lookups are a binary search over a mapped column.
+MAGIC = b"TTSN"
+VERSION = 1
+HEADER = struct.Struct("<4sHHiIII")
+TIME_COLUMNS = ("departure", "origin_arrival", "destination_arrival")
+STATION_COLUMNS = ("origin", "destination")
+
+SnapshotRow = Tuple[str, str, int, int, int]
+
+
+class SnapshotError(ValueError):
+    """Raised when a snapshot file is truncated, corrupt or from another format version."""
+
+
+def _column_bytes(values: array) -> bytes:
+    if sys.byteorder != "little":
+        values = array(values.typecode, values)
+        values.byteswap()
+    return values.tobytes()
+
+
+def _padded(data: bytes) -> bytes:
+    return data + b"\0" * (-len(data) % 4)
+
+
+def write_snapshot(path: str, day_minutes: int, rows: Iterable[SnapshotRow]) -> int:
+    """
+    Write (origin, destination, departure, origin arrival, destination arrival) rows, times
+    in epoch minutes, as a snapshot file. Written to a temp file and renamed into place so
+    readers mapping the old file are never exposed to a partial write.
+    """
+    ordered = sorted(rows, key=lambda row: row[2])
+    stations = sorted({row[0] for row in ordered} | {row[1] for row in ordered})
+    station_index = {code: i for i, code in enumerate(stations)}
+
+    station_table = _padded("\n".join(stations).encode("ascii"))
+    columns = [array("i", (row[2 + i] for row in ordered)) for i in range(3)]
+    columns += [array("H", (station_index[row[i]] for row in ordered)) for i in range(2)]
+    body = [station_table] + [_column_bytes(column) for column in columns]
+
+    checksum = 0
+    for chunk in body:
+        checksum = zlib.crc32(chunk, checksum)
+
+    temp_path = f"{path}.tmp{os.getpid()}"
+    with open(temp_path, "wb") as file:
+        file.write(
+            HEADER.pack(MAGIC, VERSION, 0, day_minutes, len(ordered), len(station_table), checksum)
+        )
+        for chunk in body:
+            file.write(chunk)
+    os.replace(temp_path, path)
+    return len(ordered)
+
+
+class DaySnapshot:
+    """
+    A memory-mapped, read-only view of one (origin, destination, day) timetable.
+
+    The columns are memoryviews straight onto the mapped file, so loading costs no parsing
+    or object creation, and processes mapping the same file share it via the page cache.
+    """
+
+    def __init__(self, path: str, verify_checksum: bool = True):
+        self.path = path
+        with open(path, "rb") as file:
+            stat = os.fstat(file.fileno())
+            # Snapshots are replaced by rename, so a new inode means a new version
+            self.version = (stat.st_ino, stat.st_mtime_ns)
+            try:
+                self._map = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+            except ValueError:
+                raise SnapshotError(f"Snapshot {path} is empty")
+        view = self._view = memoryview(self._map)
+
+        if len(view) < HEADER.size:
+            raise SnapshotError(f"Snapshot {path} is truncated")
+        magic, version, _, self.day_minutes, self.row_count, table_length, checksum = (
+            HEADER.unpack_from(view)
+        )
+        if magic != MAGIC or version != VERSION:
+            raise SnapshotError(f"{path} is not a version {VERSION} timetable snapshot")
+
+        expected_size = HEADER.size + table_length + self.row_count * (3 * 4 + 2 * 2)
+        if len(view) < expected_size:
+            raise SnapshotError(f"Snapshot {path} is truncated")
+        if verify_checksum and zlib.crc32(view[HEADER.size : expected_size]) != checksum:
+            raise SnapshotError(f"Snapshot {path} failed its checksum")
+
+        offset = HEADER.size
+        table = bytes(view[offset : offset + table_length]).rstrip(b"\0").decode("ascii")
+        self.stations: List[str] = [sys.intern(code) for code in table.split("\n") if code]
+        offset += table_length
+
+        self.columns = {}
+        for name, typecode, width in [(name, "i", 4) for name in TIME_COLUMNS] + [
+            (name, "H", 2) for name in STATION_COLUMNS
+        ]:
+            column = view[offset : offset + self.row_count * width].cast(typecode)
+            if sys.byteorder != "little":
+                column = array(typecode, column)
+                column.byteswap()
+            self.columns[name] = column
+            offset += self.row_count * width
+
+        self.departure_minutes = self.columns["departure"]
+
+    def __len__(self) -> int:
+        return self.row_count
+
+    def row(self, index: int) -> SnapshotRow:
+        return (
+            self.stations[self.columns["origin"][index]],
+            self.stations[self.columns["destination"][index]],
+            self.columns["departure"][index],
+            self.columns["origin_arrival"][index],
+            self.columns["destination_arrival"][index],
+        )
+
+    def first_departure_between(self, start_minute: int, end_minute: int) -> Optional[int]:
+        """Index of the first row departing in [start_minute, end_minute), if any."""
+        index = bisect_left(self.departure_minutes, start_minute)
+        if index < self.row_count and self.departure_minutes[index] < end_minute:
+            return index
+        return None
+
+    def close(self):
+        for column in self.columns.values():
+            if isinstance(column, memoryview):
+                column.release()
+        self.columns = {}
+        self.departure_minutes = None
+        self._view.release()
+        self._map.close()
+
+
+def rows_from_schedule_rows(rows) -> List[SnapshotRow]:
+    """Snapshot rows for DatabaseConnector.get_day_schedule_rows tuples."""
+    return [
+        (
+            origin,
+            destination,
+            to_epoch_minutes(departure),
+            to_epoch_minutes(origin_arrival),
+            to_epoch_minutes(destination_arrival),
+        )
+        for origin, destination, departure, origin_arrival, destination_arrival in rows
+    ]
+
+
+def row_datetimes(row: SnapshotRow):
+    """(origin, destination, departure, origin arrival, destination arrival) with datetimes."""
+    origin, destination, departure, origin_arrival, destination_arrival = row
+    return (
+        origin,
+        destination,
+        from_epoch_minutes(departure),
+        from_epoch_minutes(origin_arrival),
+        from_epoch_minutes(destination_arrival),
+    )
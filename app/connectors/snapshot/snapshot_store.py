@@ -0,0 +1,172 @@
+import os
+import threading
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import Iterable, Optional
+
+from app.connectors.snapshot.day_snapshot import (
+    DaySnapshot,
+    SnapshotError,
+    SnapshotRow,
+    row_datetimes,
+    write_snapshot,
+)
+from app.utils.config_loader import load_config
+from app.utils.date_helpers import get_start_window, to_epoch_minutes
+from app.utils.logger import logger
+
+# Returned by find_first_departure when some day in the window has no snapshot,
+# meaning the caller has to fall back to the database.
+MISSING = object()
+
+
+class SnapshotStore:
+    """
+    Directory of per (origin, destination, day) timetable snapshots, with a small LRU of
+    mapped files. Files written by another worker are picked up on the next lookup.
+    """
+
+    def __init__(
+        self,
+        directory: str,
+        enabled: bool = True,
+        cache_size: int = 256,
+        verify_checksum: bool = True,
+    ):
+        self.directory = directory
+        self.enabled = enabled
+        self.cache_size = cache_size
+        self.verify_checksum = verify_checksum
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+
+    def path_for(
+        self, origin_station_code: str, destination_station_code: str, day: datetime
+    ) -> str:
+        return os.path.join(
+            self.directory,
+            f"{origin_station_code}_{destination_station_code}_{day:%Y-%m-%d}.ttsnap",
+        )
+
+    def write(
+        self,
+        origin_station_code: str,
+        destination_station_code: str,
+        day: datetime,
+        rows: Iterable[SnapshotRow],
+    ) -> Optional[str]:
+        if not self.enabled:
+            return None
+        day = get_start_window(day)
+        os.makedirs(self.directory, exist_ok=True)
+        path = self.path_for(origin_station_code, destination_station_code, day)
+        count = write_snapshot(path, to_epoch_minutes(day), rows)
+        self.evict(origin_station_code, destination_station_code, day)
+        logger.debug(f"Wrote {count} departures to snapshot {path}")
+        return path
+
+    def get(
+        self, origin_station_code: str, destination_station_code: str, day: datetime
+    ) -> Optional[DaySnapshot]:
+        """The mapped snapshot for a day, or None when there isn't a usable one."""
+        if not self.enabled:
+            return None
+        path = self.path_for(
+            origin_station_code, destination_station_code, get_start_window(day)
+        )
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            return None
+
+        with self._lock:
+            snapshot = self._cache.get(path)
+            if snapshot is not None and snapshot.version == (stat.st_ino, stat.st_mtime_ns):
+                self._cache.move_to_end(path)
+                return snapshot
+
+        try:
+            snapshot = DaySnapshot(path, verify_checksum=self.verify_checksum)
+        except (OSError, SnapshotError) as e:
+            logger.error(f"Ignoring unusable timetable snapshot: {e}")
+            return None
+
+        with self._lock:
+            self._cache[path] = snapshot
+            self._cache.move_to_end(path)
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+        return snapshot
+
+    def evict(
+        self, origin_station_code: str, destination_station_code: str, day: datetime
+    ):
+        path = self.path_for(
+            origin_station_code, destination_station_code, get_start_window(day)
+        )
+        with self._lock:
+            self._cache.pop(path, None)
+
+    def purge_before(self, cutoff: datetime) -> int:
+        """Delete snapshot files for days before the cutoff."""
+        if not self.enabled or not os.path.isdir(self.directory):
+            return 0
+        cutoff_day = f"{get_start_window(cutoff):%Y-%m-%d}"
+        deleted = 0
+        for name in os.listdir(self.directory):
+            if not name.endswith(".ttsnap"):
+                continue
+            day = name.removesuffix(".ttsnap").rsplit("_", 1)[-1]
+            if day < cutoff_day:
+                path = os.path.join(self.directory, name)
+                with self._lock:
+                    self._cache.pop(path, None)
+                os.remove(path)
+                deleted += 1
+        return deleted
+
+    def preload(self, keys: Iterable[tuple]) -> int:
+        """Map the snapshots for (origin, destination, day) keys ahead of traffic."""
+        return sum(1 for key in keys if self.get(*key) is not None)
+
+    def find_first_departure(
+        self,
+        origin_station_code: str,
+        destination_station_code: str,
+        start_time: datetime,
+        max_wait_time: int,
+    ):
+        """
+        Same semantics as DatabaseConnector.get_train_schedule, answered from snapshots.
+        Returns a row tuple with datetimes, None when nothing departs in the window, or
+        MISSING when a day in the window has no snapshot.
+        """
+        if not self.enabled:
+            return MISSING
+        end_time = start_time + timedelta(minutes=max_wait_time)
+        start_minute = to_epoch_minutes(start_time)
+        if start_time.second or start_time.microsecond:
+            start_minute += 1
+        end_minute = to_epoch_minutes(end_time)
+        if end_time.second or end_time.microsecond:
+            end_minute += 1
+
+        day = get_start_window(start_time)
+        while day < end_time:
+            snapshot = self.get(origin_station_code, destination_station_code, day)
+            if snapshot is None:
+                return MISSING
+            index = snapshot.first_departure_between(start_minute, end_minute)
+            if index is not None:
+                return row_datetimes(snapshot.row(index))
+            day += timedelta(days=1)
+        return None
+
+
+snapshot_config = load_config().get("snapshots", {})
+snapshot_store = SnapshotStore(
+    snapshot_config.get("directory", "snapshots"),
+    enabled=snapshot_config.get("enabled", False),
+    cache_size=snapshot_config.get("cache_size", 256),
+    verify_checksum=snapshot_config.get("verify_checksum", True),
+)
@@ -0,0 +1,115 @@
+import csv
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import FrozenSet, Optional, Tuple
+
+from app.utils.config_loader import load_config
+from app.utils.logger import logger
+
+BUNDLED_STATIONS_PATH = Path(__file__).parent / "stations.csv"
+
+
+class StationRegistry:
+    """
+    Known CRS station codes, loaded once from a CSV with a `crs` column, plus a negative
+    cache of (origin, destination) pairs TransportAPI recently had no trains for.
+
+    Both exist so requests that can't be answered are turned away before they cost an API
+    call or a DB query. Codes missing from the dataset are only rejected with
+    `reject_unknown`, for a dataset that covers the whole network; the bundled one doesn't.
+    If the dataset can't be loaded every code is accepted, as before.
+    """
+
+    def __init__(
+        self,
+        path: Optional[str] = None,
+        enabled: bool = True,
+        reject_unknown: bool = False,
+        empty_pair_ttl_seconds: float = 3600,
+        max_empty_pairs: int = 10_000,
+    ):
+        self.path = Path(path) if path else BUNDLED_STATIONS_PATH
+        self.enabled = enabled
+        self.reject_unknown = reject_unknown
+        self.empty_pair_ttl_seconds = empty_pair_ttl_seconds
+        self.max_empty_pairs = max_empty_pairs
+        self.codes: FrozenSet[str] = frozenset()
+        # (origin, destination) -> monotonic time the entry expires
+        self._empty_pairs = OrderedDict()
+        self._lock = threading.Lock()
+        if enabled:
+            self.load()
+
+    def load(self) -> int:
+        """(Re)load the station codes, returning how many were read."""
+        try:
+            with self.path.open("r", encoding="utf-8", newline="") as file:
+                codes = frozenset(
+                    row["crs"].strip().upper() for row in csv.DictReader(file) if row.get("crs")
+                )
+        except (OSError, KeyError) as e:
+            logger.warning(f"Station registry not loaded from {self.path}, accepting any code: {e}")
+            codes = frozenset()
+        self.codes = codes
+        logger.info(f"Loaded {len(codes)} station codes")
+        return len(codes)
+
+    def is_known(self, code: str) -> bool:
+        if not self.enabled or not self.codes:
+            return True
+        return code.upper() in self.codes
+
+    def rejects(self, code: str) -> bool:
+        """Whether requests naming the code are turned away as not being a station."""
+        return self.reject_unknown and not self.is_known(code)
+
+    def record_empty(self, origin_station_code: str, destination_station_code: str):
+        """Remember that TransportAPI had no trains between the pair, for empty_pair_ttl_seconds."""
+        if not self.enabled or self.empty_pair_ttl_seconds <= 0:
+            return
+        key = (origin_station_code, destination_station_code)
+        with self._lock:
+            self._empty_pairs[key] = time.monotonic() + self.empty_pair_ttl_seconds
+            self._empty_pairs.move_to_end(key)
+            while len(self._empty_pairs) > self.max_empty_pairs:
+                self._empty_pairs.popitem(last=False)
+
+    def is_known_empty(self, origin_station_code: str, destination_station_code: str) -> bool:
+        key = (origin_station_code, destination_station_code)
+        with self._lock:
+            expires = self._empty_pairs.get(key)
+            if expires is None:
+                return False
+            if expires <= time.monotonic():
+                del self._empty_pairs[key]
+                return False
+        return True
+
+    def forget_empty(self, origin_station_code: str, destination_station_code: str):
+        with self._lock:
+            self._empty_pairs.pop((origin_station_code, destination_station_code), None)
+
+    def first_known_empty(self, station_codes) -> Optional[Tuple[str, str]]:
+        """The first leg of a journey that is in the negative cache, if any."""
+        if not self._empty_pairs:
+            return None
+        for leg in zip(station_codes, station_codes[1:]):
+            if self.is_known_empty(*leg):
+                return leg
+        return None
+
+    def clear_empty(self):
+        with self._lock:
+            self._empty_pairs.clear()
+
+
+station_registry_config = load_config().get("stations", {})
+station_registry = StationRegistry(
+    path=station_registry_config.get("path"),
+    enabled=station_registry_config.get("enabled", True),
+    reject_unknown=station_registry_config.get("reject_unknown", False),
+    empty_pair_ttl_seconds=station_registry_config.get("empty_pair_ttl_seconds", 3600),
+    max_empty_pairs=station_registry_config.get("max_empty_pairs", 10_000),
+)
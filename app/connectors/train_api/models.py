@@ -1,6 +1,10 @@
+import sys
+from array import array
 from datetime import datetime
-from pydantic import BaseModel
-from typing import List, Optional
+from pydantic import BaseModel, ConfigDict
+from typing import Dict, Iterator, List, NamedTuple, Optional, Tuple
+
+from app.utils.date_helpers import from_epoch_minutes
 
 
 class TrainDeparture(BaseModel):
@@ -9,12 +13,122 @@ class TrainDeparture(BaseModel):
     origin_expected_departure_time: datetime
     origin_expected_arrival_time: datetime
     destination_aimed_arrival_time: datetime
+    train_uid: Optional[str] = None
+
+
+class DepartureRecord(NamedTuple):
+    """
+    One departure with the same fields as TrainDeparture, as read back from a
+    DepartureBatch for code that wants a row at a time.
+    """
+
+    origin_station_code: str
+    destination_station_code: str
+    origin_expected_departure_time: datetime
+    origin_expected_arrival_time: datetime
+    destination_aimed_arrival_time: datetime
+    train_uid: Optional[str] = None
+
+
+class DepartureBatch:
+    """
+    A board's departures from one origin, stored column-wise: times as int32 epoch
+    minutes in arrays and destinations as interned station codes. A 1000 departure board
+    takes a few tens of KB rather than a list of objects each holding several datetimes,
+    and it pickles to little more than its raw bytes, so it is cheap to send back from an
+    offload worker. Iterating yields DepartureRecords built on demand.
+    """
+
+    __slots__ = (
+        "origin_station_code",
+        "destinations",
+        "departures",
+        "origin_arrivals",
+        "destination_arrivals",
+        "train_uids",
+    )
+
+    def __init__(self, origin_station_code: str):
+        self.origin_station_code = sys.intern(origin_station_code)
+        self.destinations: List[str] = []
+        self.departures = array("i")
+        self.origin_arrivals = array("i")
+        self.destination_arrivals = array("i")
+        self.train_uids: List[Optional[str]] = []
+
+    def append(
+        self,
+        destination_station_code: str,
+        departure: int,
+        origin_arrival: int,
+        destination_arrival: int,
+        train_uid: Optional[str] = None,
+    ):
+        """Add a departure, with its times in epoch minutes."""
+        self.destinations.append(sys.intern(destination_station_code))
+        self.departures.append(departure)
+        self.origin_arrivals.append(origin_arrival)
+        self.destination_arrivals.append(destination_arrival)
+        self.train_uids.append(train_uid)
+
+    def __len__(self) -> int:
+        return len(self.departures)
+
+    def __getitem__(self, index: int) -> DepartureRecord:
+        return DepartureRecord(
+            self.origin_station_code,
+            self.destinations[index],
+            from_epoch_minutes(self.departures[index]),
+            from_epoch_minutes(self.origin_arrivals[index]),
+            from_epoch_minutes(self.destination_arrivals[index]),
+            self.train_uids[index],
+        )
+
+    def __iter__(self) -> Iterator[DepartureRecord]:
+        return (self[index] for index in range(len(self)))
+
+    def __eq__(self, other) -> bool:
+        if not isinstance(other, DepartureBatch):
+            return NotImplemented
+        return all(getattr(self, name) == getattr(other, name) for name in self.__slots__)
+
+    def by_destination(self) -> Dict[str, "DepartureBatch"]:
+        """Split into one batch per destination, keeping departure order."""
+        batches: Dict[str, DepartureBatch] = {}
+        for index, destination in enumerate(self.destinations):
+            batch = batches.get(destination)
+            if batch is None:
+                batch = batches[destination] = DepartureBatch(self.origin_station_code)
+            batch.append(
+                destination,
+                self.departures[index],
+                self.origin_arrivals[index],
+                self.destination_arrivals[index],
+                self.train_uids[index],
+            )
+        return batches
+
+    def snapshot_rows(self) -> List[Tuple[str, str, int, int, int]]:
+        """Rows for a day snapshot. The destination arrival doubles as the origin arrival, as it does in train_schedule."""
+        return list(
+            zip(
+                [self.origin_station_code] * len(self),
+                self.destinations,
+                self.departures,
+                self.destination_arrivals,
+                self.destination_arrivals,
+            )
+        )
 
 
 # Unsure if I need to worry about platform change time / train status i.e. cancelled
 # Keeping it simple, will just assume every train will depart and no bus replacement
 class TrainStationData(BaseModel):
+    model_config = ConfigDict(arbitrary_types_allowed=True)
+
     station_code: str
     request_time: str
-    departures: List[TrainDeparture]
+    departures: DepartureBatch
     date: str
+    # Trains on the board, before fanning out per calling point
+    train_count: int = 0
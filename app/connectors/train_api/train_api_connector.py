@@ -1,19 +1,22 @@
-from datetime import datetime, timedelta, timezone
+from datetime import datetime, timezone
 import json
 from urllib.parse import quote
 import httpx
 from app.utils.api_client import fetch_data
 from app.utils.config_loader import load_config
 from app.utils.date_helpers import (
-    adjust_arrival_date,
     format_datetime_ISO8601,
+    format_offset,
     get_start_window,
-    parse_time_with_date,
+    parse_minutes_of_day,
+    to_epoch_minutes,
 )
 from app.utils.error_handler import TrainServiceError
 from app.utils.logger import logger
-from app.connectors.train_api.models import TrainStationData, TrainDeparture
+from app.utils.offload import offloader
+from app.connectors.train_api.models import DepartureBatch, TrainStationData
 from dotenv import load_dotenv
+from typing import Optional, Tuple
 import os
 
 load_dotenv()
@@ -22,6 +25,9 @@ config = load_config()["connectors"]["train_times_api"]
 DEV_MODE = config.get("dev_mode", False)
 MOCK_DATA_PATH = config.get("mock_data_path", "")
 SAVE_RAW_DATA = config.get("save_raw_data", False)
+# Most departures the API returns per call, a board this long may have been cut short
+BOARD_LIMIT = 1000
+MINUTES_PER_DAY = 24 * 60
 
 
 def crs_me_please(code: str) -> str:
@@ -43,12 +49,62 @@ def fetch_mock_data():
 # Rate limiting/throttling?
 # Example URL: "https://transportapi.com/v3/uk/train/station_timetables/crs%3ALBG.json?datetime=2024-08-04T00%3A00%3A00%2B01%3A00&from_offset=PT00%3A00%3A00&to_offset=PT23%3A59%3A59&limit=1000&live=true&train_status=passenger&station_detail=destination&type=departure&destination=crs%3ADFD&app_key=97089d7ffa372eea52a6c828d9e2f18e&app_id=acbc2224"
 async def fetch_train_times(
-    origin_station_code: str, destination_station_code: str, arrivaltime: str
+    origin_station_code: str,
+    destination_station_code: str,
+    arrivaltime: str,
+    window: Optional[Tuple[datetime, datetime]] = None,
 ):
+    """
+    Departures for the whole day of `arrivaltime`, or only those in [start, end) of
+    `window` when given, which must lie within a single day.
+    """
     if DEV_MODE:
         logger.info("Dev mode enabled. Fetching mock data from JSON file.")
         return fetch_mock_data()
 
+    response = await _fetch_station_timetable(
+        origin_station_code,
+        destination_station_code,
+        arrivaltime,
+        window,
+        {
+            "station_detail": "destination",
+            "destination": crs_me_please(destination_station_code),
+        },
+    )
+    return await offloader.run(
+        map_api_response_to_model, response, size=_board_size(response)
+    )
+
+
+async def fetch_departure_board(origin_station_code: str, arrivaltime: str):
+    """
+    Every departure from the origin on the day of `arrivaltime` with its calling points,
+    one TrainDeparture per (train, station it calls at). One call covers all destinations.
+    """
+    if DEV_MODE:
+        logger.info("Dev mode enabled. Fetching mock data from JSON file.")
+        return fetch_mock_data()
+
+    response = await _fetch_station_timetable(
+        origin_station_code, "ALL", arrivaltime, None, {"station_detail": "calling_at"}
+    )
+    return await offloader.run(
+        map_calling_points_to_model, response, size=_board_size(response)
+    )
+
+
+def _board_size(api_response: dict) -> int:
+    return len(api_response.get("departures", {}).get("all", []))
+
+
+async def _fetch_station_timetable(
+    origin_station_code: str,
+    destination_station_code: str,
+    arrivaltime: str,
+    window: Optional[Tuple[datetime, datetime]],
+    detail_params: dict,
+) -> dict:
     try:
         base_url = config["base_url"]
         app_key = os.getenv("TRAIN_API_APP_KEY")
@@ -58,16 +114,18 @@ async def fetch_train_times(
 
         url = f"{base_url}/station_timetables/{quote(station_param)}.json"
 
+        window_start = window[0] if window else get_start_window(arrivaltime)
         params = {
-            "datetime": format_datetime_ISO8601(get_start_window(arrivaltime)),
+            "datetime": format_datetime_ISO8601(window_start),
             "from_offset": "PT00:00:00",  # Was thinking of doing -24 for 48hr window but max limit is 1k and may have to implement pagination
-            "to_offset": "PT23:59:59",  # PT24:00:00 Errors?
-            "limit": 1000,
+            "to_offset": (
+                format_offset(window[1] - window[0]) if window else "PT23:59:59"
+            ),  # PT24:00:00 Errors?
+            "limit": BOARD_LIMIT,
             "live": "true",
             "train_status": "passenger",
-            "station_detail": "destination",
             "type": "departure",
-            "destination": crs_me_please(destination_station_code),
+            **detail_params,
             "app_key": app_key,
             "app_id": app_id,
         }
@@ -93,7 +151,7 @@ async def fetch_train_times(
             except Exception as e:
                 logger.error(f"Failed to save raw API response: {e}")
 
-        return map_api_response_to_model(response)
+        return response
 
     except httpx.HTTPStatusError as exc:
         logger.error(f"HTTP error while fetching train times: {exc}")
@@ -104,84 +162,100 @@ async def fetch_train_times(
 
 
 def map_api_response_to_model(api_response: dict) -> TrainStationData:
+    """Map a board fetched for one destination, where station_detail.destination is that destination."""
+    return _map_board(
+        api_response,
+        lambda train: [train.get("station_detail", {}).get("destination", {})],
+    )
+
+
+def map_calling_points_to_model(api_response: dict) -> TrainStationData:
+    """
+    Map a full departure board fetched with station_detail=calling_at into one departure
+    per (train, calling point), so every station a train stops at becomes a destination.
+    """
+    return _map_board(
+        api_response,
+        lambda train: [
+            stop
+            for stop in train.get("station_detail", {}).get("calling_at", [])
+            if stop.get("aimed_arrival_time")
+        ],
+    )
+
+
+def _map_board(api_response: dict, destinations_of) -> TrainStationData:
     station_code = api_response.get("station_code", "").replace("crs:", "")
     request_time = api_response.get("request_time", "")
     base_date = api_response.get("date", "")
 
-    departures = []
+    departures = DepartureBatch(station_code)
     departure_data = api_response.get("departures", {}).get("all", [])
 
-    for train in departure_data:
-        try:
-            origin_departure_time_str = train.get("expected_departure_time")
-            origin_arrival_time_str = train.get("expected_arrival_time")
-            destination_aimed_arrival_time_str = (
-                train.get("station_detail", {})
-                .get("destination", {})
-                .get("aimed_arrival_time")
-            )
-            train_status = train.get("status", "")
-
-            origin_departure_time_dt = parse_time_with_date(
-                base_date, origin_departure_time_str
-            )
-            origin_arrival_time_dt = None
-
-            if origin_arrival_time_str is None:
-                origin_arrival_time_dt = (
-                    origin_departure_time_dt - timedelta(minutes=10)
-                    if origin_departure_time_dt
-                    else None
-                )
-                if train_status == "STARTS HERE":
-                    logger.debug(
-                        f"Train {train.get('train_uid')} starts here, setting arrival time 10 minutes before departure."
-                    )
-                else:
-                    logger.error(
-                        f"Expected_arrival_time is missing for train {train.get('train_uid')}, status {train_status}. Setting arrival time 10 minutes before departure."
-                    )
-            else:
-                origin_arrival_time_dt = parse_time_with_date(
-                    base_date, origin_arrival_time_str
-                )
-
-            destination_aimed_arrival_time_dt = parse_time_with_date(
-                base_date, destination_aimed_arrival_time_str
-            )
-            if (
-                destination_aimed_arrival_time_dt.time()
-                < origin_departure_time_dt.time()
-            ):
-                logger.debug(
-                    f"Adjusting destination arrival date from {destination_aimed_arrival_time_dt} "
-                    f"because it arrives after midnight relative to departure {origin_departure_time_dt}."
-                )
-                destination_aimed_arrival_time_dt += timedelta(days=1)
-
-            if origin_departure_time_dt and origin_arrival_time_dt:
-                origin_arrival_time_dt = adjust_arrival_date(
-                    origin_departure_time_dt, origin_arrival_time_dt
-                )
-
-            departure = TrainDeparture(
-                origin_station_code=station_code,
-                destination_station_code=train.get("station_detail", {})
-                .get("destination", {})
-                .get("station_code", ""),
-                origin_expected_departure_time=origin_departure_time_dt,
-                origin_expected_arrival_time=origin_arrival_time_dt,
-                destination_aimed_arrival_time=destination_aimed_arrival_time_dt,
-            )
-
-            departures.append(departure)
+    try:
+        day_start = to_epoch_minutes(datetime.strptime(base_date, "%Y-%m-%d"))
+    except ValueError:
+        logger.error(f"Error mapping train data: invalid board date {base_date!r}")
+        departure_data = []
 
-        except Exception as e:
-            logger.error(f"Error mapping train data: {e}")
+    for train in departure_data:
+        for destination in destinations_of(train):
+            try:
+                _map_departure(train, destination, day_start, departures)
+            except Exception as e:
+                logger.error(f"Error mapping train data: {e}")
 
-    return TrainStationData(
+    # Built from records the mapper made itself, so validating them again is wasted work
+    return TrainStationData.model_construct(
         station_code=station_code,
         request_time=request_time,
         departures=departures,
         date=base_date,
+        train_count=len(departure_data),
+    )
+
+
+def _map_departure(
+    train: dict, destination: dict, day_start: int, departures: DepartureBatch
+):
+    """Append one (train, destination) to `departures`, working in epoch minutes throughout."""
+    departure_minute = parse_minutes_of_day(train.get("expected_departure_time"))
+    destination_minute = parse_minutes_of_day(destination.get("aimed_arrival_time"))
+    if departure_minute is None or destination_minute is None:
+        raise ValueError(
+            f"train {train.get('train_uid')} has no usable departure or destination arrival time"
+        )
+    departure = day_start + departure_minute
+
+    origin_arrival_minute = parse_minutes_of_day(train.get("expected_arrival_time"))
+    if origin_arrival_minute is None:
+        origin_arrival = departure - 10
+        train_status = train.get("status", "")
+        if train_status == "STARTS HERE":
+            logger.debug(
+                f"Train {train.get('train_uid')} starts here, setting arrival time 10 minutes before departure."
+            )
+        else:
+            logger.error(
+                f"Expected_arrival_time is missing for train {train.get('train_uid')}, status {train_status}. Setting arrival time 10 minutes before departure."
+            )
+    else:
+        origin_arrival = day_start + origin_arrival_minute
+        # An arrival after the departure time belongs to the previous day, e.g. 23:59 for 00:01
+        if origin_arrival > departure:
+            origin_arrival -= MINUTES_PER_DAY
+
+    destination_arrival = day_start + destination_minute
+    if destination_minute < departure_minute:
+        logger.debug(
+            f"Train {train.get('train_uid')} arrives after midnight, moving its destination arrival to the next day."
+        )
+        destination_arrival += MINUTES_PER_DAY
+
+    departures.append(
+        destination.get("station_code", ""),
+        departure,
+        origin_arrival,
+        destination_arrival,
+        train.get("train_uid"),
     )
@@ -1,6 +1,11 @@
-from datetime import datetime
-from typing import List
-from pydantic import BaseModel, Field, field_validator, model_serializer
+import base64
+import binascii
+from datetime import datetime, timedelta
+from typing import List, Optional, Tuple
+from pydantic import BaseModel, Field, field_validator, model_serializer, model_validator
+
+from app.connectors.stations.station_registry import station_registry
+from app.utils.date_helpers import format_datetime_seconds, from_epoch_minutes, to_epoch_minutes
 
 
 class TrainTimeRequest(BaseModel):
@@ -32,9 +37,7 @@ class TrainTimeRequest(BaseModel):
     @field_validator("station_codes", mode="before")
     @classmethod
     def validate_station_codes(cls, station_codes):
-        if not all(len(code) == 3 and code.isalpha() for code in station_codes):
-            raise ValueError("Each station code must be exactly 3 letters.")
-        return [code.upper() for code in station_codes]
+        return validated_station_codes(station_codes)
 
 
 class TrainTimeResponse(BaseModel):
@@ -42,4 +45,254 @@ class TrainTimeResponse(BaseModel):
 
     @model_serializer
     def serialize_model(self):
-        return {"arrival_time": self.arrival_time.strftime("%Y-%m-%d %H:%M:%S")}
+        return {"arrival_time": format_datetime_seconds(self.arrival_time)}
+
+
+class TrainLegResult(BaseModel):
+    """One leg of a journey, as the train found for it."""
+
+    origin_station_code: str
+    destination_station_code: str
+    departure_time: datetime
+    arrival_time: datetime
+    # Answered from cached data, without fetching from TransportAPI
+    cached: bool
+
+    @model_serializer
+    def serialize_model(self):
+        return {
+            "type": "leg",
+            "origin_station_code": self.origin_station_code,
+            "destination_station_code": self.destination_station_code,
+            "departure_time": format_datetime_seconds(self.departure_time),
+            "arrival_time": format_datetime_seconds(self.arrival_time),
+            "cached": self.cached,
+        }
+
+
+class TrainJourneyArrival(BaseModel):
+    """The last line of a streamed journey, the same arrival /traintimes returns."""
+
+    arrival_time: datetime
+
+    @model_serializer
+    def serialize_model(self):
+        return {"type": "arrival", "arrival_time": format_datetime_seconds(self.arrival_time)}
+
+
+# Start times a single profile request may sweep
+MAX_PROFILE_START_TIMES = 288
+
+
+class TrainProfileRequest(BaseModel):
+    station_codes: List[str] = Field(
+        ...,
+        min_length=2,
+        description="Must contain at least two station codes.",
+        examples=[["LBG", "DFD", "LUT"]],
+    )
+    earliest_start_time: str = Field(
+        ...,
+        pattern=r"\d{4}-\d{2}-\d{2} \d{2}:\d{2}",
+        description="First start time, format: YYYY-MM-DD HH:MM",
+        examples=["2024-08-04 06:00"],
+    )
+    latest_start_time: str = Field(
+        ...,
+        pattern=r"\d{4}-\d{2}-\d{2} \d{2}:\d{2}",
+        description="Last start time, format: YYYY-MM-DD HH:MM",
+        examples=["2024-08-04 10:00"],
+    )
+    step_minutes: int = Field(
+        ...,
+        ge=1,
+        le=1440,
+        description="Minutes between start times.",
+        examples=[5],
+    )
+    max_wait_time: int = Field(
+        ...,
+        ge=10,
+        le=9999,
+        description="Must be between 10 and 9999 minutes.",
+        examples=[120],
+    )
+    force_cache_refresh: bool = Field(
+        default=False,
+        description="Set to true to force refresh from API.",
+        examples=[False],
+    )
+
+    @field_validator("station_codes", mode="before")
+    @classmethod
+    def validate_station_codes(cls, station_codes):
+        return validated_station_codes(station_codes)
+
+    @model_validator(mode="after")
+    def validate_start_times(self):
+        earliest = datetime.fromisoformat(self.earliest_start_time)
+        latest = datetime.fromisoformat(self.latest_start_time)
+        if latest < earliest:
+            raise ValueError("latest_start_time must not be before earliest_start_time.")
+        if len(self.start_times()) > MAX_PROFILE_START_TIMES:
+            raise ValueError(
+                f"At most {MAX_PROFILE_START_TIMES} start times per profile, use a larger step."
+            )
+        return self
+
+    def start_times(self) -> List[datetime]:
+        earliest = datetime.fromisoformat(self.earliest_start_time)
+        latest = datetime.fromisoformat(self.latest_start_time)
+        count = int((latest - earliest).total_seconds() // 60) // self.step_minutes + 1
+        return [earliest + timedelta(minutes=self.step_minutes * step) for step in range(count)]
+
+    def as_train_time_request(self) -> TrainTimeRequest:
+        """The /traintimes request for the first start time."""
+        return TrainTimeRequest(
+            station_codes=self.station_codes,
+            start_time=self.earliest_start_time,
+            max_wait_time=self.max_wait_time,
+            force_cache_refresh=self.force_cache_refresh,
+        )
+
+
+class TrainProfileEntry(BaseModel):
+    start_time: datetime
+    # None when some leg has no train within max_wait_time
+    arrival_time: Optional[datetime] = None
+
+
+class TrainProfileResponse(BaseModel):
+    profile: List[TrainProfileEntry]
+
+    @model_serializer
+    def serialize_model(self):
+        return {
+            "profile": [
+                {
+                    "start_time": format_datetime_seconds(entry.start_time),
+                    "arrival_time": (
+                        format_datetime_seconds(entry.arrival_time)
+                        if entry.arrival_time is not None
+                        else None
+                    ),
+                }
+                for entry in self.profile
+            ]
+        }
+
+
+# Departures a single page may hold
+MAX_DEPARTURES_PAGE = 100
+
+
+class TrainDeparturesRequest(BaseModel):
+    station_codes: List[str] = Field(
+        ...,
+        min_length=2,
+        max_length=2,
+        description="The leg's origin and destination station codes.",
+        examples=[["LBG", "DFD"]],
+    )
+    start_time: str = Field(
+        ...,
+        pattern=r"\d{4}-\d{2}-\d{2} \d{2}:\d{2}",
+        description="Format: YYYY-MM-DD HH:MM",
+        examples=["2024-08-04 15:30"],
+    )
+    max_wait_time: int = Field(
+        ...,
+        ge=10,
+        le=9999,
+        description="Departures up to this many minutes after start_time are listed.",
+        examples=[120],
+    )
+    limit: int = Field(
+        default=10,
+        ge=1,
+        le=MAX_DEPARTURES_PAGE,
+        description=f"Departures per page, at most {MAX_DEPARTURES_PAGE}.",
+        examples=[10],
+    )
+    cursor: Optional[str] = Field(
+        default=None,
+        description="next_cursor from the previous page, to continue after it.",
+    )
+    force_cache_refresh: bool = Field(
+        default=False,
+        description="Set to true to force refresh from API.",
+        examples=[False],
+    )
+
+    @field_validator("station_codes", mode="before")
+    @classmethod
+    def validate_station_codes(cls, station_codes):
+        return validated_station_codes(station_codes)
+
+    @field_validator("cursor")
+    @classmethod
+    def validate_cursor(cls, cursor):
+        if cursor is not None:
+            decode_departures_cursor(cursor)
+        return cursor
+
+    def after(self) -> Optional[Tuple[datetime, int]]:
+        """(departure, row id) of the last departure of the previous page, if any."""
+        return decode_departures_cursor(self.cursor) if self.cursor is not None else None
+
+    def as_train_time_request(self) -> TrainTimeRequest:
+        return TrainTimeRequest(
+            station_codes=self.station_codes,
+            start_time=self.start_time,
+            max_wait_time=self.max_wait_time,
+            force_cache_refresh=self.force_cache_refresh,
+        )
+
+
+class TrainDepartureEntry(BaseModel):
+    departure_time: datetime
+    arrival_time: datetime
+
+
+class TrainDeparturesResponse(BaseModel):
+    departures: List[TrainDepartureEntry]
+    # None on the last page
+    next_cursor: Optional[str] = None
+
+    @model_serializer
+    def serialize_model(self):
+        return {
+            "departures": [
+                {
+                    "departure_time": format_datetime_seconds(entry.departure_time),
+                    "arrival_time": format_datetime_seconds(entry.arrival_time),
+                }
+                for entry in self.departures
+            ],
+            "next_cursor": self.next_cursor,
+        }
+
+
+def encode_departures_cursor(departure: datetime, row_id: int) -> str:
+    """An opaque cursor for the keyset (departure, row id) the next page starts after."""
+    keyset = f"{to_epoch_minutes(departure)}:{row_id}".encode()
+    return base64.urlsafe_b64encode(keyset).decode().rstrip("=")
+
+
+def decode_departures_cursor(cursor: str) -> Tuple[datetime, int]:
+    try:
+        keyset = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+        minute, row_id = (int(part) for part in keyset.split(":"))
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        raise ValueError("Invalid cursor, use next_cursor from the previous page.")
+    return from_epoch_minutes(minute), row_id
+
+
+def validated_station_codes(station_codes) -> List[str]:
+    if not all(len(code) == 3 and code.isalpha() for code in station_codes):
+        raise ValueError("Each station code must be exactly 3 letters.")
+    station_codes = [code.upper() for code in station_codes]
+    unknown = [code for code in station_codes if station_registry.rejects(code)]
+    if unknown:
+        raise ValueError(f"Unknown station code: {', '.join(unknown)}")
+    return station_codes
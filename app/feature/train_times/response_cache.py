@@ -0,0 +1,185 @@
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Iterable, NamedTuple, Optional, Tuple
+
+from app.feature.train_times.models import TrainTimeRequest, TrainTimeResponse
+from app.utils.config_loader import load_config
+
+DayKey = Tuple[str, str, object]
+# (origin, destination, first epoch minute, end epoch minute)
+RangeKey = Tuple[str, str, int, int]
+
+
+class CachedResponse(NamedTuple):
+    response: TrainTimeResponse
+    # (origin, destination, day) tracker entries the answer was computed from, and
+    # their last_fetched values at the time
+    versions: Dict[DayKey, object]
+    # Each leg's departures from its start to its arrival, and the latest departure
+    # change inside them at the time
+    ranges: Dict[RangeKey, int]
+    etag: str
+    validated_at: float
+
+
+def request_key(request: TrainTimeRequest) -> tuple:
+    """Everything that determines the answer; force_cache_refresh only changes how it's found."""
+    return (tuple(request.station_codes), request.start_time, request.max_wait_time)
+
+
+def make_etag(key: tuple, versions: Dict[DayKey, object], ranges: Dict[RangeKey, int]) -> str:
+    """Strong ETag over the request and the timetable versions, identical on every worker."""
+    digest = hashlib.blake2b(
+        repr((key, sorted(versions.items()), sorted(ranges.items()))).encode(), digest_size=16
+    ).hexdigest()
+    return f'"{digest}"'
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    candidates = [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]
+    return "*" in candidates or etag in candidates
+
+
+class ResponseCache:
+    """
+    LRU of /traintimes answers keyed on the normalised request. An entry stays valid while
+    the tracker rows of the days it was computed from are unchanged, so a re-ingest of any
+    of those days (by any worker) or its removal by retention invalidates it. It also
+    holds the departure range each leg read, and stays valid while no departure in them
+    changes, so a windowed refresh only invalidates the answers it could have changed.
+    Entries are indexed by day and by leg, so a worker that changes a day or some
+    departures drops the answers built on them straight away instead of on their next
+    lookup.
+    """
+
+    def __init__(
+        self, enabled: bool = True, max_entries: int = 4096, revalidate_seconds: float = 0
+    ):
+        self.enabled = enabled
+        self.max_entries = max_entries
+        self.revalidate_seconds = revalidate_seconds
+        self._entries = OrderedDict()
+        # day -> keys of the entries computed from it
+        self._by_day: Dict[DayKey, set] = {}
+        # (origin, destination) -> keys of the entries with a departure range on the leg
+        self._by_leg: Dict[Tuple[str, str], set] = {}
+        self._lock = threading.Lock()
+
+    def get(self, key: tuple, current_versions, current_ranges) -> Optional[CachedResponse]:
+        """
+        The cached answer if still current. `current_versions` looks up the tracker versions
+        for an entry's days and `current_ranges` the latest change in its departure ranges;
+        they're skipped for entries checked within revalidate_seconds.
+        """
+        if not self.enabled:
+            return None
+        with self._lock:
+            entry = self._entries.get(key)
+        if entry is None:
+            return None
+
+        now = time.monotonic()
+        if now - entry.validated_at < self.revalidate_seconds:
+            return entry
+        if (
+            current_versions(list(entry.versions)) != entry.versions
+            or current_ranges(list(entry.ranges)) != entry.ranges
+        ):
+            with self._lock:
+                self._discard(key)
+            return None
+
+        entry = entry._replace(validated_at=now)
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+        return entry
+
+    def contains(self, key: tuple) -> bool:
+        """Whether there's an entry for the key, without checking it's still current."""
+        return self.enabled and key in self._entries
+
+    def put(
+        self,
+        key: tuple,
+        response: TrainTimeResponse,
+        versions: Dict[DayKey, object],
+        ranges: Dict[RangeKey, int],
+    ) -> CachedResponse:
+        entry = CachedResponse(
+            response, versions, ranges, make_etag(key, versions, ranges), time.monotonic()
+        )
+        if self.enabled:
+            with self._lock:
+                self._discard(key)
+                self._entries[key] = entry
+                for day in versions:
+                    self._by_day.setdefault(day, set()).add(key)
+                for origin, destination, _, _ in ranges:
+                    self._by_leg.setdefault((origin, destination), set()).add(key)
+                while len(self._entries) > self.max_entries:
+                    self._discard(next(iter(self._entries)))
+        return entry
+
+    def invalidate_days(self, days: Iterable[DayKey]) -> int:
+        """Drop the entries computed from any of the (origin, destination, day) keys."""
+        dropped = 0
+        with self._lock:
+            for day in days:
+                for key in list(self._by_day.get(day, ())):
+                    dropped += self._discard(key)
+        return dropped
+
+    def invalidate_departures(
+        self, origin: str, destination: str, minutes: Iterable[int]
+    ) -> int:
+        """Drop the entries with a departure range on the leg holding any of the epoch minutes."""
+        minutes = list(minutes)
+        dropped = 0
+        with self._lock:
+            for key in list(self._by_leg.get((origin, destination), ())):
+                ranges = self._entries[key].ranges
+                if any(
+                    start <= minute < end
+                    for leg_origin, leg_destination, start, end in ranges
+                    if (leg_origin, leg_destination) == (origin, destination)
+                    for minute in minutes
+                ):
+                    dropped += self._discard(key)
+        return dropped
+
+    def _discard(self, key: tuple) -> bool:
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return False
+        for day in entry.versions:
+            _unindex(self._by_day, day, key)
+        for origin, destination, _, _ in entry.ranges:
+            _unindex(self._by_leg, (origin, destination), key)
+        return True
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._by_day.clear()
+            self._by_leg.clear()
+
+
+def _unindex(index: dict, name, key: tuple):
+    keys = index.get(name)
+    if keys is not None:
+        keys.discard(key)
+        if not keys:
+            del index[name]
+
+
+response_cache_config = load_config().get("response_cache", {})
+response_cache = ResponseCache(
+    enabled=response_cache_config.get("enabled", True),
+    max_entries=response_cache_config.get("max_entries", 4096),
+    revalidate_seconds=response_cache_config.get("revalidate_seconds", 0),
+)
@@ -1,7 +1,21 @@
-from fastapi import APIRouter, HTTPException, Depends
-from app.feature.train_times.models import TrainTimeResponse, TrainTimeRequest
+from contextlib import AsyncExitStack
+from typing import Optional
+
+from fastapi import APIRouter, HTTPException, Depends, Header, Request, Response
+from app.feature.train_times.models import (
+    TrainDeparturesRequest,
+    TrainDeparturesResponse,
+    TrainProfileRequest,
+    TrainProfileResponse,
+    TrainTimeResponse,
+    TrainTimeRequest,
+)
+from app.feature.train_times.response_cache import etag_matches, response_cache_config
 from app.feature.train_times.services import TrainTimeService
+from app.utils.admission import COLD, WARM, admission_controller
 from app.utils.logger import logger
+from app.utils.request_trace import trace_writer
+from app.utils.responses import json_response, ndjson_response
 from app.connectors.db.db_connector import (
     db_connector,
 )
@@ -23,14 +37,106 @@ def get_train_time_service():
 )
 async def train_time(
     request: TrainTimeRequest,
+    if_none_match: Optional[str] = Header(default=None),
     train_time_service: TrainTimeService = Depends(get_train_time_service),
 ):
     logger.info("Request received for Train times")
     logger.debug(f"Received request: {request}")
+    trace_writer.record(request)
+
+    priority = WARM if train_time_service.is_warm(request) else COLD
+    async with admission_controller.admit(priority):
+        result, etag = await train_time_service.get_train_destination_arrival(request)
 
-    result = await train_time_service.calculate_train_destination_arrival(request)
+    headers = None
+    if etag:
+        headers = {
+            "ETag": etag,
+            "Cache-Control": response_cache_config.get("cache_control", "private, no-cache"),
+        }
+        if etag_matches(if_none_match, etag):
+            logger.info("Train times unchanged, returning 304")
+            return Response(status_code=304, headers=headers)
 
     logger.info("Result generated for train times")
     logger.debug(f"Result: {result}")
 
-    return result
+    return json_response(result, headers=headers)
+
+
+@router.post(
+    "/traintimes/stream",
+    summary="Stream a journey's legs as they are resolved",
+    description=(
+        "The same journey as /traintimes, streamed as newline-delimited JSON: a 'leg' line "
+        "with departure, arrival and whether it was cached as each leg is resolved, then an "
+        "'arrival' line. Disconnecting cancels the fetches still pending for it"
+    ),
+    response_class=Response,
+    responses={200: {"content": {"application/x-ndjson": {}}}},
+    tags=["Train Times"],
+)
+async def train_time_stream(
+    request: TrainTimeRequest,
+    http_request: Request,
+    train_time_service: TrainTimeService = Depends(get_train_time_service),
+):
+    logger.info("Request received for streamed train times")
+    logger.debug(f"Received request: {request}")
+
+    events = train_time_service.stream_train_destination_arrival(request)
+    # The slot is held until the stream ends, not just until this returns
+    slot = AsyncExitStack()
+    priority = WARM if train_time_service.is_warm(request) else COLD
+    await slot.enter_async_context(admission_controller.admit(priority))
+    return ndjson_response(events, http_request, on_close=slot.aclose)
+
+
+@router.post(
+    "/traintimes/profile",
+    response_model=TrainProfileResponse,
+    summary="Get arrival times across a range of start times",
+    description=(
+        "Arrival time at the final station for every start time from earliest_start_time "
+        "to latest_start_time, step_minutes apart, as /traintimes would give for each"
+    ),
+    tags=["Train Times"],
+)
+async def train_time_profile(
+    request: TrainProfileRequest,
+    train_time_service: TrainTimeService = Depends(get_train_time_service),
+):
+    logger.info("Request received for a train times profile")
+    logger.debug(f"Received request: {request}")
+
+    priority = WARM if train_time_service.is_warm(request.as_train_time_request()) else COLD
+    async with admission_controller.admit(priority):
+        result = await train_time_service.calculate_train_arrival_profile(request)
+
+    logger.info(f"Profile generated for {len(result.profile)} start times")
+    return json_response(result)
+
+
+@router.post(
+    "/traintimes/departures",
+    response_model=TrainDeparturesResponse,
+    summary="List the next departures for a leg",
+    description=(
+        "A page of departures between two stations from start_time, up to max_wait_time "
+        "after it. Pass next_cursor back as cursor to get the following page"
+    ),
+    tags=["Train Times"],
+)
+async def train_departures(
+    request: TrainDeparturesRequest,
+    train_time_service: TrainTimeService = Depends(get_train_time_service),
+):
+    logger.info("Request received for next departures")
+    logger.debug(f"Received request: {request}")
+
+    priority = WARM if train_time_service.is_warm(request.as_train_time_request()) else COLD
+    async with admission_controller.admit(priority):
+        result = await train_time_service.get_next_departures(request)
+
+    logger.info(f"Returning {len(result.departures)} departures")
+    return json_response(result)
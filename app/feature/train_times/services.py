@@ -1,15 +1,81 @@
 import asyncio
-from datetime import datetime, timedelta
+import math
+from array import array
+from bisect import bisect_left
+from contextvars import ContextVar
+from datetime import datetime, timedelta, timezone
+from functools import partial
+from typing import AsyncIterator, Dict, List, Optional, Tuple
 from fastapi import Depends
+from pydantic import BaseModel
 from sqlalchemy.orm import Session
 from app.connectors.db.models import TrainSchedule
-from app.feature.train_times.models import TrainTimeResponse, TrainTimeRequest
-from app.connectors.train_api.train_api_connector import fetch_train_times
-from app.utils.error_handler import TrainServiceError
+from app.connectors.shared_cache.factory import shared_cache, shared_cache_config
+from app.connectors.snapshot.day_snapshot import rows_from_schedule_rows
+from app.connectors.snapshot.snapshot_store import MISSING, snapshot_store
+from app.connectors.stations.station_registry import station_registry
+from app.feature.train_times.models import (
+    TrainDepartureEntry,
+    TrainDeparturesRequest,
+    TrainDeparturesResponse,
+    TrainJourneyArrival,
+    TrainLegResult,
+    TrainProfileEntry,
+    TrainProfileRequest,
+    TrainProfileResponse,
+    TrainTimeResponse,
+    TrainTimeRequest,
+    encode_departures_cursor,
+)
+from app.feature.train_times.response_cache import request_key, response_cache
+from app.feature.train_times.write_behind import PendingDepartures, write_behind
+from app.connectors.train_api.train_api_connector import (
+    BOARD_LIMIT,
+    fetch_departure_board,
+    fetch_train_times,
+)
+from app.connectors.train_api.models import DepartureBatch
+from app.utils.config_loader import load_config
+from app.utils.date_helpers import from_epoch_minutes, get_start_window, to_epoch_minutes
+from app.utils.error_handler import TrainServiceError, UpstreamUnavailableError
 from app.utils.logger import logger
+from app.utils.metrics import metrics, route_history
 from app.connectors.db.db_connector import DatabaseConnector
 
 
+
+class _InflightFetch:
+    __slots__ = ("task", "fetched", "waiters")
+
+    def __init__(self, task: asyncio.Task, fetched: asyncio.Future):
+        self.task = task
+        self.fetched = fetched
+        # Requests currently waiting on the fetch
+        self.waiters = 0
+
+
+# Upstream fetches in flight in this worker, keyed by (origin, destination, day, window)
+_inflight_fetches: Dict[tuple, _InflightFetch] = {}
+
+
+def _forget_fetch(key: tuple, inflight: _InflightFetch, _task=None):
+    if _inflight_fetches.get(key) is inflight:
+        del _inflight_fetches[key]
+
+incremental_refresh_config = load_config().get("incremental_refresh", {})
+interval_coverage_config = load_config().get("interval_coverage", {})
+
+# "destination" fetches one (origin, destination) pair per call, "origin" fetches the
+# origin's whole board once and stores every destination its trains call at
+fetch_mode = load_config()["connectors"]["train_times_api"].get("fetch_mode", "destination")
+ALL_DESTINATIONS = "*"
+
+# (origin, destination, day) keys the current calculation read, for the response cache
+_days_read: ContextVar[Optional[list]] = ContextVar("days_read", default=None)
+# and the departure range of each leg, from its start time to its arrival, in epoch minutes
+_ranges_read: ContextVar[Optional[list]] = ContextVar("ranges_read", default=None)
+
+
 class TrainTimeService:
     def __init__(self, db_connector: DatabaseConnector):
         self.db_connector = db_connector
@@ -25,6 +91,7 @@ class TrainTimeService:
             f"Fetching live data from API for {origin_station_code}, to {destination_station_code} at {start_time}"
         )
 
+        metrics.increment("upstream_fetch")
         api_data = await fetch_train_times(
             origin_station_code, destination_station_code, start_time
         )
@@ -32,24 +99,240 @@ class TrainTimeService:
         logger.debug("Fetched and transformed API data")
 
         if not api_data or not api_data.departures:
+            station_registry.record_empty(origin_station_code, destination_station_code)
             raise TrainServiceError(
                 f"No train data available for {origin_station_code} at {start_time}"
             )
+        station_registry.forget_empty(origin_station_code, destination_station_code)
+
+        await write_behind.submit(
+            [
+                PendingDepartures(
+                    origin_station_code,
+                    destination_station_code,
+                    day_window(start_time),
+                    api_data.departures,
+                )
+            ],
+            partial(
+                self._store_day,
+                origin_station_code,
+                destination_station_code,
+                start_time,
+                api_data.departures,
+            ),
+        )
 
+    def _store_day(
+        self,
+        origin_station_code: str,
+        destination_station_code: str,
+        start_time: datetime,
+        departures: DepartureBatch,
+    ):
         logger.debug("Loading API data into DB")
-        for train in api_data.departures:
-            self.db_connector.add_train_schedule(
+        inserted, updated, deleted, _ = self.db_connector.store_departures(
+            origin_station_code, destination_station_code, start_time, departures
+        )
+        logger.debug(f"Stored day: {inserted} inserted, {updated} updated, {deleted} deleted")
+
+        if snapshot_store.enabled:
+            snapshot_store.write(
                 origin_station_code,
-                train.destination_station_code,
-                train.origin_expected_departure_time,
-                train.destination_aimed_arrival_time,
-                train.destination_aimed_arrival_time,
+                destination_station_code,
+                start_time,
+                departures.snapshot_rows(),
             )
 
         logger.info("Adding API data into tracker for caching")
         self.db_connector.add_api_call_tracker(
             origin_station_code, destination_station_code, start_time
         )
+        response_cache.invalidate_days(
+            [(origin_station_code, destination_station_code, get_start_window(start_time))]
+        )
+
+    async def fetch_and_store_origin_data(
+        self, origin_station_code: str, start_time: datetime
+    ) -> List[str]:
+        """
+        Fetch the origin's departure board for the day with calling points and store it
+        for every destination the trains call at, so one API call covers them all.
+        Returns the destinations now cached.
+        """
+        logger.info(
+            f"Fetching the {origin_station_code} departure board for {start_time.date()}"
+        )
+        metrics.increment("upstream_fetch")
+        board = await fetch_departure_board(origin_station_code, start_time)
+
+        if not board or not board.departures:
+            raise TrainServiceError(
+                f"No train data available for {origin_station_code} at {start_time}"
+            )
+        if board.train_count >= BOARD_LIMIT:
+            # The day may have been cut short, so no destination can be marked complete
+            raise TrainServiceError(
+                f"{origin_station_code} board for {start_time.date()} hit the {BOARD_LIMIT} departure limit"
+            )
+
+        by_destination = board.departures.by_destination()
+        for destination_station_code in by_destination:
+            station_registry.forget_empty(origin_station_code, destination_station_code)
+        await write_behind.submit(
+            [
+                PendingDepartures(
+                    origin_station_code,
+                    destination_station_code,
+                    day_window(start_time),
+                    departures,
+                )
+                for destination_station_code, departures in by_destination.items()
+            ],
+            partial(self._store_board, origin_station_code, start_time, by_destination),
+        )
+        return list(by_destination)
+
+    def _store_board(
+        self,
+        origin_station_code: str,
+        start_time: datetime,
+        by_destination: Dict[str, DepartureBatch],
+    ):
+        for destination_station_code, departures in by_destination.items():
+            self.db_connector.store_departures(
+                origin_station_code, destination_station_code, start_time, departures
+            )
+            if snapshot_store.enabled:
+                snapshot_store.write(
+                    origin_station_code,
+                    destination_station_code,
+                    start_time,
+                    departures.snapshot_rows(),
+                )
+
+        logger.info(
+            f"Adding {len(by_destination)} destinations from {origin_station_code} into tracker for caching"
+        )
+        self.db_connector.add_api_call_trackers(
+            origin_station_code, by_destination, start_time
+        )
+        response_cache.invalidate_days(
+            (origin_station_code, destination_station_code, get_start_window(start_time))
+            for destination_station_code in by_destination
+        )
+
+    async def fetch_and_store_day(
+        self,
+        origin_station_code: str,
+        destination_station_code: str,
+        start_time: datetime,
+    ):
+        """Fetch a day the configured way, falling back to the single pair if the board can't be used."""
+        if fetch_mode != "origin":
+            await self.fetch_and_store_train_data(
+                origin_station_code, destination_station_code, start_time
+            )
+            return
+        try:
+            destinations = await self.fetch_and_store_origin_data(
+                origin_station_code, start_time
+            )
+        except TrainServiceError as e:
+            if isinstance(e, UpstreamUnavailableError):
+                raise
+            logger.warning(f"{e}, fetching {destination_station_code} on its own")
+            metrics.increment("board_fetch_fallback")
+            await self.fetch_and_store_train_data(
+                origin_station_code, destination_station_code, start_time
+            )
+            return
+        if destination_station_code not in destinations:
+            # The whole day's board has no train calling there
+            station_registry.record_empty(origin_station_code, destination_station_code)
+
+    async def refresh_train_data_window(
+        self,
+        origin_station_code: str,
+        destination_station_code: str,
+        window: Tuple[datetime, datetime],
+    ):
+        """
+        Fetch only the departures in `window` and update the stored rows that changed,
+        instead of downloading the whole day. For a day that isn't fully cached the window
+        is recorded as covered, and the day becomes cached once its windows cover it.
+        """
+        logger.info(
+            f"Refreshing {origin_station_code} to {destination_station_code} between {window[0]} and {window[1]}"
+        )
+        metrics.increment("upstream_window_fetch")
+        api_data = await fetch_train_times(
+            origin_station_code, destination_station_code, window[0], window=window
+        )
+        departures = api_data.departures if api_data else DepartureBatch(origin_station_code)
+
+        await write_behind.submit(
+            [PendingDepartures(origin_station_code, destination_station_code, window, departures)],
+            partial(
+                self._store_window,
+                origin_station_code,
+                destination_station_code,
+                window,
+                departures,
+            ),
+        )
+
+    def _store_window(
+        self,
+        origin_station_code: str,
+        destination_station_code: str,
+        window: Tuple[datetime, datetime],
+        departures: DepartureBatch,
+    ):
+        inserted, updated, deleted, changed = self.db_connector.store_departures(
+            origin_station_code, destination_station_code, window[0], departures, window
+        )
+        logger.debug(
+            f"Refreshed window: {inserted} inserted, {updated} updated, {deleted} deleted"
+        )
+        day_cached = self.db_connector.has_recent_api_call(
+            origin_station_code, destination_station_code, window[0]
+        )
+        if day_cached:
+            if not inserted and not updated and not deleted:
+                return
+        elif not self.db_connector.add_coverage_interval(
+            origin_station_code, destination_station_code, *window
+        ):
+            # Still only part of the day, which has no tracker entry or snapshot to update
+            return
+
+        if snapshot_store.enabled:
+            snapshot_store.write(
+                origin_station_code,
+                destination_station_code,
+                window[0],
+                rows_from_schedule_rows(
+                    self.db_connector.get_day_schedule_rows(
+                        origin_station_code, destination_station_code, window[0]
+                    )
+                ),
+            )
+        if day_cached:
+            # The day's version is left alone: the changed departures are logged with the
+            # rows, which moves only the ranges holding them, in every worker
+            response_cache.invalidate_departures(
+                origin_station_code, destination_station_code, changed
+            )
+        else:
+            # Marks a day its windows now cover as cached, bumping the version of any
+            # expired entry it had
+            self.db_connector.add_api_call_tracker(
+                origin_station_code, destination_station_code, window[0]
+            )
+            response_cache.invalidate_days(
+                [(origin_station_code, destination_station_code, get_start_window(window[0]))]
+            )
 
     def fetch_train_schedule(
         self,
@@ -58,9 +341,32 @@ class TrainTimeService:
         start_datetime: datetime,
         max_wait_time: int,
     ) -> TrainSchedule:
-        """Fetch a train schedule from the database."""
-        train_schedule = self.db_connector.get_train_schedule(
-            origin_station_code, destination_station_code, start_datetime, max_wait_time
+        """
+        Fetch a train schedule. Departures still queued for writing answer for the windows
+        they were fetched over; the rest of the wait comes from the day snapshots, falling
+        back to the database.
+        """
+        end_datetime = start_datetime + timedelta(minutes=max_wait_time)
+        candidates = [
+            self._find_in_pending_writes(
+                origin_station_code, destination_station_code, start_datetime, max_wait_time
+            )
+        ]
+        for gap_start, gap_end in write_behind.gaps(
+            origin_station_code, destination_station_code, start_datetime, end_datetime
+        ):
+            candidates.append(
+                self._find_stored(
+                    origin_station_code,
+                    destination_station_code,
+                    gap_start,
+                    math.ceil((gap_end - gap_start).total_seconds() / 60),
+                )
+            )
+        train_schedule = min(
+            (candidate for candidate in candidates if candidate),
+            key=lambda candidate: candidate.origin_expected_departure_time,
+            default=None,
         )
 
         if not train_schedule:
@@ -70,29 +376,547 @@ class TrainTimeService:
 
         return train_schedule
 
+    def _find_in_pending_writes(
+        self,
+        origin_station_code: str,
+        destination_station_code: str,
+        start_datetime: datetime,
+        max_wait_time: int,
+    ):
+        record = write_behind.find_first_departure(
+            origin_station_code, destination_station_code, start_datetime, max_wait_time
+        )
+        if record is None:
+            return None
+        return TrainSchedule(
+            origin_station_code=record.origin_station_code,
+            destination_station_code=record.destination_station_code,
+            origin_expected_departure_time=record.origin_expected_departure_time,
+            origin_expected_arrival_time=record.origin_expected_arrival_time,
+            destination_aimed_arrival_time=record.destination_aimed_arrival_time,
+            train_uid=record.train_uid,
+        )
+
+    def _find_stored(
+        self,
+        origin_station_code: str,
+        destination_station_code: str,
+        start_datetime: datetime,
+        max_wait_time: int,
+    ) -> Optional[TrainSchedule]:
+        """From the day snapshots, falling back to the database."""
+        train_schedule = self._find_in_snapshots(
+            origin_station_code, destination_station_code, start_datetime, max_wait_time
+        )
+        if train_schedule is MISSING:
+            train_schedule = self.db_connector.get_train_schedule(
+                origin_station_code,
+                destination_station_code,
+                start_datetime,
+                max_wait_time,
+            )
+        return train_schedule
+
+    def _find_in_snapshots(
+        self,
+        origin_station_code: str,
+        destination_station_code: str,
+        start_datetime: datetime,
+        max_wait_time: int,
+    ):
+        row = snapshot_store.find_first_departure(
+            origin_station_code, destination_station_code, start_datetime, max_wait_time
+        )
+        if row is MISSING or row is None:
+            return row
+        return TrainSchedule(
+            origin_station_code=row[0],
+            destination_station_code=row[1],
+            origin_expected_departure_time=row[2],
+            origin_expected_arrival_time=row[3],
+            destination_aimed_arrival_time=row[4],
+        )
+
     async def _handle_train_schedule_check(
         self,
         request: TrainTimeRequest,
         current_stn_code: str,
         destination_stn_code: str,
         arrival_time: datetime,
+        search_window: Optional[Tuple[datetime, datetime]] = None,
+        coverage: Optional[dict] = None,
     ):
-        """Helper method to check cache and fetch train data if necessary."""
-        if not request.force_cache_refresh and self.db_connector.has_recent_api_call(
-            current_stn_code, destination_stn_code, arrival_time
-        ):
+        """
+        Helper method to check cache and fetch train data if necessary.
+        search_window is the span of departures the leg looks at. For a day that isn't
+        cached only the uncovered parts of it are fetched, and a forced refresh re-fetches
+        it instead of the whole day. coverage is the journey's prefetched get_coverage
+        result; days missing from it are looked up on their own.
+        Returns True when the day was served from cached data, without a fetch.
+        """
+        search_window = search_window or (
+            arrival_time,
+            arrival_time + timedelta(minutes=request.max_wait_time),
+        )
+        gaps = None
+        if not request.force_cache_refresh:
+            if self._is_cached(
+                current_stn_code, destination_stn_code, arrival_time, coverage
+            ) or write_behind.covers(
+                current_stn_code, destination_stn_code, *day_window(arrival_time)
+            ):
+                gaps = []
+            else:
+                needed = needed_window(arrival_time, search_window)
+                if needed is not None:
+                    gaps = self._coverage_gaps(current_stn_code, destination_stn_code, needed)
+
+        if gaps == []:
             logger.info(
                 f"Fetching cached data for {current_stn_code}, to {destination_stn_code} at {arrival_time}"
             )
+            metrics.increment("cache_hit")
+            return True
+        if gaps:
+            metrics.increment("cache_miss")
+            await asyncio.gather(
+                *(
+                    self._fetch_once(
+                        current_stn_code, destination_stn_code, gap[0], False, gap=gap
+                    )
+                    for gap in gaps
+                )
+            )
         else:
-            await self.fetch_and_store_train_data(
-                current_stn_code, destination_stn_code, arrival_time
+            metrics.increment("cache_miss")
+            await self._fetch_once(
+                current_stn_code,
+                destination_stn_code,
+                arrival_time,
+                request.force_cache_refresh,
+                search_window,
+            )
+        return False
+
+    def _is_cached(
+        self,
+        origin_station_code: str,
+        destination_station_code: str,
+        day: datetime,
+        coverage: Optional[dict] = None,
+    ) -> bool:
+        key = (origin_station_code, destination_station_code, get_start_window(day))
+        if coverage is not None and key in coverage:
+            return coverage[key] is not None
+        return self.db_connector.has_recent_api_call(
+            origin_station_code, destination_station_code, day
+        )
+
+    def _coverage_gaps(
+        self,
+        origin_station_code: str,
+        destination_station_code: str,
+        window: Tuple[datetime, datetime],
+    ) -> List[Tuple[datetime, datetime]]:
+        """The parts of `window` neither stored intervals nor queued writes cover."""
+        return [
+            gap
+            for pending_gap in write_behind.gaps(
+                origin_station_code, destination_station_code, *window
+            )
+            for gap in self.db_connector.get_coverage_gaps(
+                origin_station_code, destination_station_code, *pending_gap
+            )
+        ]
+
+    async def _fetch_once(
+        self,
+        origin_station_code: str,
+        destination_station_code: str,
+        start_time: datetime,
+        force_refresh: bool,
+        search_window: Optional[Tuple[datetime, datetime]] = None,
+        gap: Optional[Tuple[datetime, datetime]] = None,
+    ):
+        """
+        Join a fetch of the same day (or of the same `gap` in a partly fetched day)
+        already running in this worker, or start one. Returns once the departures can be
+        read, which with write-behind is before the fetch has finished storing them.
+        """
+        window = gap
+        if window is None and force_refresh and search_window is not None:
+            window = refresh_window(start_time, search_window)
+        key = (
+            origin_station_code,
+            fetch_scope(destination_station_code, window),
+            get_start_window(start_time),
+            window,
+        )
+        inflight = _inflight_fetches.get(key)
+        if inflight is None:
+            fetched = asyncio.get_running_loop().create_future()
+            task = asyncio.ensure_future(
+                self._fetch_with_shared_lock(
+                    origin_station_code,
+                    destination_station_code,
+                    start_time,
+                    force_refresh,
+                    window,
+                    fetched,
+                )
             )
+            inflight = _inflight_fetches[key] = _InflightFetch(task, fetched)
+            task.add_done_callback(partial(_forget_fetch, key, inflight))
+        else:
+            metrics.increment("fetch_coalesced")
+        inflight.waiters += 1
+        try:
+            # asyncio.wait doesn't cancel what it waits on, so one cancelled request doesn't
+            # cancel the fetch the others are waiting on
+            await asyncio.wait(
+                (inflight.task, inflight.fetched), return_when=asyncio.FIRST_COMPLETED
+            )
+        finally:
+            inflight.waiters -= 1
+            if not inflight.waiters and not inflight.fetched.done() and not inflight.task.done():
+                # Every request waiting on it was cancelled, e.g. streaming clients that
+                # disconnected, so stop the upstream call rather than spend quota on it
+                logger.info(
+                    f"Abandoning fetch of {origin_station_code} to {destination_station_code} from {start_time}, nobody is waiting for it"
+                )
+                metrics.increment("fetch_abandoned")
+                _forget_fetch(key, inflight)
+                inflight.task.cancel()
+        if not inflight.fetched.done():
+            inflight.task.result()
+
+    async def fetch_day_once(
+        self,
+        origin_station_code: str,
+        destination_station_code: str,
+        day: datetime,
+    ):
+        """
+        Fetch the whole day the way a request does: joining a fetch of it already running
+        in this worker, under the node-wide fetch lock, and not at all if another worker
+        fetched it meanwhile.
+        """
+        await self._fetch_once(origin_station_code, destination_station_code, day, False)
+
+    async def _fetch_with_shared_lock(
+        self,
+        origin_station_code: str,
+        destination_station_code: str,
+        start_time: datetime,
+        force_refresh: bool,
+        window: Optional[Tuple[datetime, datetime]] = None,
+        fetched: Optional[asyncio.Future] = None,
+    ):
+        """
+        Fetch a day under the node-wide lock, unless another worker fetched it while we
+        waited. A forced refresh of a day that is already cached only fetches `window`,
+        as does filling a gap in a day that is only partly fetched.
+        `fetched` is resolved as soon as the departures can be read, but the lock is held
+        until write-behind has stored them, so other workers find them in the database.
+        """
+        waiting_since = datetime.now(timezone.utc).replace(tzinfo=None)
+        day = get_start_window(start_time)
+        async with shared_cache.lock(
+            f"fetch:{origin_station_code}:{fetch_scope(destination_station_code, window)}:{day:%Y-%m-%d}",
+            ttl_seconds=shared_cache_config.get("lock_ttl_seconds", 30),
+            wait_seconds=shared_cache_config.get("lock_wait_seconds", 20),
+        ):
+            last_fetched = self.db_connector.get_api_call_last_fetched(
+                origin_station_code, destination_station_code, start_time
+            )
+            if last_fetched is not None and (
+                not force_refresh or last_fetched >= waiting_since
+            ):
+                logger.info(
+                    f"{origin_station_code} to {destination_station_code} on {day.date()} was fetched by another worker"
+                )
+                metrics.increment("fetch_coalesced")
+                return
+            if last_fetched is None and not force_refresh:
+                if window is None:
+                    # Only a fetch whose writes are still queued can cover a day without a tracker entry
+                    covered = write_behind.covers(
+                        origin_station_code, destination_station_code, *day_window(day)
+                    )
+                else:
+                    covered = not self._coverage_gaps(
+                        origin_station_code, destination_station_code, window
+                    )
+                if covered:
+                    logger.info(
+                        f"{origin_station_code} to {destination_station_code} window from {(window or day_window(day))[0]} was fetched by another worker"
+                    )
+                    metrics.increment("fetch_coalesced")
+                    return
+            incremental = window is not None and (
+                last_fetched is not None or interval_coverage_enabled()
+            )
+            if incremental and force_refresh:
+                refreshed_at = self.db_connector.get_window_refreshed_at(
+                    origin_station_code, destination_station_code, *window
+                )
+                if refreshed_at is not None and refreshed_at >= waiting_since:
+                    logger.info(
+                        f"{origin_station_code} to {destination_station_code} window from {window[0]} was refreshed by another worker"
+                    )
+                    metrics.increment("fetch_coalesced")
+                    return
+            try:
+                if incremental:
+                    await self.refresh_train_data_window(
+                        origin_station_code, destination_station_code, window
+                    )
+                else:
+                    await self.fetch_and_store_day(
+                        origin_station_code, destination_station_code, start_time
+                    )
+            except UpstreamUnavailableError:
+                if last_fetched is None:
+                    raise
+                # A forced refresh can still be answered from what we already have
+                logger.warning(
+                    f"Train API unavailable, serving {origin_station_code} to {destination_station_code} on {day.date()} from data fetched at {last_fetched}"
+                )
+                metrics.increment("stale_served")
+            if fetched is not None:
+                fetched.set_result(None)
+            # Only this fetch's own writes, the lock covers nothing else
+            if fetch_scope(destination_station_code, window) == ALL_DESTINATIONS:
+                await write_behind.wait_for(origin_station_code, window=day_window(day))
+            else:
+                await write_behind.wait_for(
+                    origin_station_code, destination_station_code, window or day_window(day)
+                )
+
+    def is_warm(self, request: TrainTimeRequest) -> bool:
+        """
+        Cheap guess at whether the request can be answered without calling the API,
+        used to prioritise it under load. Only checks each leg on the start day, and only
+        from memory, since it runs before the request is admitted: a day the tracker
+        mirror doesn't hold counts as cold rather than costing a query.
+        """
+        if request.force_cache_refresh:
+            return False
+        if response_cache.contains(request_key(request)):
+            return True
+        # Answered with an error straight away
+        if station_registry.first_known_empty(request.station_codes):
+            return True
+        start_datetime = datetime.fromisoformat(request.start_time)
+        day = get_start_window(start_datetime)
+        keys = [
+            (origin, destination, day)
+            for origin, destination in zip(request.station_codes, request.station_codes[1:])
+        ]
+        return all(
+            self.db_connector.tracker_mirror.get(key) is not None
+            or write_behind.covers(key[0], key[1], *day_window(day))
+            for key in keys
+        )
+
+    async def get_train_destination_arrival(
+        self, request: TrainTimeRequest
+    ) -> Tuple[TrainTimeResponse, Optional[str]]:
+        """
+        calculate_train_destination_arrival behind the response cache.
+        Returns the response and its ETag, which is None when the answer can't be cached.
+        Journeys with a leg TransportAPI recently had no trains for fail straight away.
+        """
+        key = request_key(request)
+        if not request.force_cache_refresh:
+            self._reject_known_empty(request.station_codes)
+            cached = response_cache.get(
+                key,
+                self.db_connector.get_api_call_versions,
+                self.db_connector.get_departure_change_ids,
+            )
+            if cached is not None:
+                metrics.increment("response_cache_hit")
+                return cached.response, cached.etag
+        metrics.increment("response_cache_miss")
+
+        days_read, ranges_read = [], []
+        days_token = _days_read.set(days_read)
+        ranges_token = _ranges_read.set(ranges_read)
+        try:
+            response = await self.calculate_train_destination_arrival(request)
+        finally:
+            _ranges_read.reset(ranges_token)
+            _days_read.reset(days_token)
+
+        versions = self.db_connector.get_api_call_versions(days_read)
+        if not days_read or len(versions) < len(set(days_read)):
+            return response, None
+        ranges = self.db_connector.get_departure_change_ids(ranges_read)
+        return response, response_cache.put(key, response, versions, ranges).etag
+
+    def _reject_known_empty(self, station_codes: List[str]):
+        empty_leg = station_registry.first_known_empty(station_codes)
+        if empty_leg:
+            metrics.increment("known_empty_rejected")
+            raise TrainServiceError(
+                f"No train data available for {empty_leg[0]} to {empty_leg[1]}, checked recently"
+            )
+
+    async def calculate_train_arrival_profile(
+        self, request: TrainProfileRequest
+    ) -> TrainProfileResponse:
+        """
+        Arrival time for every start time in the request's range, each the same as a
+        /traintimes request from that time would give. Every leg's timetable over the span
+        the start times can reach is fetched and loaded once as sorted epoch-minute arrays,
+        then all the start times are moved through it together.
+        """
+        if not request.force_cache_refresh:
+            self._reject_known_empty(request.station_codes)
+        start_times = request.start_times()
+        current: List[Optional[int]] = [to_epoch_minutes(start) for start in start_times]
+
+        for origin, destination in zip(request.station_codes, request.station_codes[1:]):
+            reached = [minute for minute in current if minute is not None]
+            if not reached:
+                break
+            route_history.record(origin, destination)
+            earliest = from_epoch_minutes(min(reached))
+            window = (
+                earliest,
+                from_epoch_minutes(max(reached)) + timedelta(minutes=request.max_wait_time),
+            )
+            await self._handle_train_schedule_check(
+                request, origin, destination, earliest, search_window=window
+            )
+            days_difference = (window[1].date() - earliest.date()).days
+            await asyncio.gather(
+                *(
+                    self._handle_train_schedule_check(
+                        request,
+                        origin,
+                        destination,
+                        earliest + timedelta(days=day),
+                        search_window=window,
+                    )
+                    for day in range(1, days_difference + 1)
+                )
+            )
+            departures, arrivals = self._leg_timetable(origin, destination, window)
+            current = sweep_leg(current, departures, arrivals, request.max_wait_time)
+
+        return TrainProfileResponse(
+            profile=[
+                TrainProfileEntry(
+                    start_time=start,
+                    arrival_time=from_epoch_minutes(minute) if minute is not None else None,
+                )
+                for start, minute in zip(start_times, current)
+            ]
+        )
+
+    def _leg_timetable(
+        self,
+        origin_station_code: str,
+        destination_station_code: str,
+        window: Tuple[datetime, datetime],
+    ) -> Tuple[array, array]:
+        """Departures in `window` and their destination arrivals, as epoch minutes in departure order."""
+        rows = write_behind.departure_minutes(
+            origin_station_code, destination_station_code, *window
+        )
+        for gap in write_behind.gaps(origin_station_code, destination_station_code, *window):
+            rows.extend(
+                (to_epoch_minutes(departure), to_epoch_minutes(arrival))
+                for departure, arrival in self.db_connector.get_departure_times(
+                    origin_station_code, destination_station_code, *gap
+                )
+            )
+        rows.sort()
+        return array("i", (row[0] for row in rows)), array("i", (row[1] for row in rows))
+
+    async def get_next_departures(
+        self, request: TrainDeparturesRequest
+    ) -> TrainDeparturesResponse:
+        """
+        A page of the leg's departures from start_time to max_wait_time after it, in
+        departure order, continuing after the request's cursor. Days are fetched as
+        /traintimes would fetch them, and only until the page is full, then the page is
+        one seek on the leg index.
+        """
+        origin, destination = request.station_codes
+        if not request.force_cache_refresh:
+            self._reject_known_empty(request.station_codes)
+        route_history.record(origin, destination)
+        start_time = datetime.fromisoformat(request.start_time)
+        end_time = start_time + timedelta(minutes=request.max_wait_time)
+        after = request.after()
+        window_start = max(start_time, after[0]) if after else start_time
+
+        # One row past the page tells whether there is another page
+        rows = []
+        while window_start < end_time and len(rows) <= request.limit:
+            window = (window_start, min(end_time, day_window(window_start)[1]))
+            await self._handle_train_schedule_check(
+                request, origin, destination, window_start, search_window=window
+            )
+            # Queued departures have no row id to page by yet, so let them land first
+            await write_behind.wait_for(origin, destination, window)
+            rows.extend(
+                self.db_connector.get_departures_page(
+                    origin, destination, *window, request.limit + 1 - len(rows), after
+                )
+            )
+            window_start = window[1]
+
+        page = rows[: request.limit]
+        next_cursor = None
+        if len(rows) > request.limit:
+            next_cursor = encode_departures_cursor(page[-1][1], page[-1][0])
+        return TrainDeparturesResponse(
+            departures=[
+                TrainDepartureEntry(departure_time=departure, arrival_time=arrival)
+                for _, departure, arrival in page
+            ],
+            next_cursor=next_cursor,
+        )
 
     async def calculate_train_destination_arrival(
         self, request: TrainTimeRequest
     ) -> TrainTimeResponse:
         """Calculate the arrival time at the final destination station."""
+        arrival_datetime = datetime.fromisoformat(request.start_time)
+        async for leg in self.iter_journey_legs(request):
+            arrival_datetime = leg.arrival_time
+        return TrainTimeResponse(arrival_time=arrival_datetime)
+
+    def stream_train_destination_arrival(
+        self, request: TrainTimeRequest
+    ) -> AsyncIterator[BaseModel]:
+        """
+        The journey a leg at a time: a TrainLegResult as each leg is resolved, then the
+        TrainJourneyArrival. Journeys with a leg TransportAPI recently had no trains for
+        fail before anything is streamed. Skips the response cache, which only holds
+        final arrivals.
+        """
+        if not request.force_cache_refresh:
+            self._reject_known_empty(request.station_codes)
+        return self._stream_journey(request)
+
+    async def _stream_journey(self, request: TrainTimeRequest) -> AsyncIterator[BaseModel]:
+        arrival_datetime = datetime.fromisoformat(request.start_time)
+        async for leg in self.iter_journey_legs(request):
+            arrival_datetime = leg.arrival_time
+            yield leg
+        yield TrainJourneyArrival(arrival_time=arrival_datetime)
+
+    async def iter_journey_legs(self, request: TrainTimeRequest) -> AsyncIterator[TrainLegResult]:
+        """
+        Resolve the journey a leg at a time, yielding each leg as soon as its train is
+        found. Cancelling the task iterating it cancels the fetches the current leg is
+        waiting on, unless another request is waiting on them too.
+        """
         station_codes = request.station_codes
         start_time = request.start_time
 
@@ -102,18 +926,39 @@ class TrainTimeService:
         start_datetime = datetime.fromisoformat(start_time)
         arrival_datetime = start_datetime
 
+        # Every day the legs are likely to read, checked in one go rather than per leg and day
+        coverage = None
+        if not request.force_cache_refresh:
+            coverage = self.db_connector.get_coverage(journey_keys(request))
+
         for i in range(len(station_codes) - 1):
             current_stn_code = station_codes[i]
             destination_stn_code = station_codes[i + 1]
+            route_history.record(current_stn_code, destination_stn_code)
 
             max_wait_delta = timedelta(minutes=request.max_wait_time)
             new_arrival_time = arrival_datetime + max_wait_delta
 
-            await self._handle_train_schedule_check(
-                request, current_stn_code, destination_stn_code, arrival_datetime
+            cached = await self._handle_train_schedule_check(
+                request,
+                current_stn_code,
+                destination_stn_code,
+                arrival_datetime,
+                search_window=(arrival_datetime, new_arrival_time),
+                coverage=coverage,
             )
 
             days_difference = (new_arrival_time.date() - arrival_datetime.date()).days
+            days_read = _days_read.get()
+            if days_read is not None:
+                days_read.extend(
+                    (
+                        current_stn_code,
+                        destination_stn_code,
+                        get_start_window(arrival_datetime + timedelta(days=day)),
+                    )
+                    for day in range(days_difference + 1)
+                )
 
             # Loop through each day difference and make a request for each day
             # Could potentially call a fetch_train_schedule after each api call to terminate earlier
@@ -123,6 +968,8 @@ class TrainTimeService:
                     current_stn_code,
                     destination_stn_code,
                     arrival_datetime + timedelta(days=day),
+                    search_window=(arrival_datetime, new_arrival_time),
+                    coverage=coverage,
                 )
                 for day in range(1, days_difference + 1)
             ]
@@ -131,7 +978,7 @@ class TrainTimeService:
                 logger.info(
                     f"Train arrival spans {days_difference} days. Checking all days in parallel."
                 )
-                await asyncio.gather(*tasks)
+                cached = all(await asyncio.gather(*tasks)) and cached
 
             train_schedule = self.fetch_train_schedule(
                 current_stn_code,
@@ -147,6 +994,124 @@ class TrainTimeService:
                 f"-----------------------"
             )
 
+            ranges_read = _ranges_read.get()
+            if ranges_read is not None:
+                ranges_read.append(
+                    (
+                        current_stn_code,
+                        destination_stn_code,
+                        to_epoch_minutes(arrival_datetime),
+                        to_epoch_minutes(train_schedule.destination_aimed_arrival_time),
+                    )
+                )
+
             arrival_datetime = train_schedule.destination_aimed_arrival_time
+            yield TrainLegResult(
+                origin_station_code=current_stn_code,
+                destination_station_code=destination_stn_code,
+                departure_time=train_schedule.origin_expected_departure_time,
+                arrival_time=arrival_datetime,
+                cached=cached,
+            )
 
-        return TrainTimeResponse(arrival_time=arrival_datetime)
+
+def journey_keys(request: TrainTimeRequest) -> List[Tuple[str, str, datetime]]:
+    """
+    (origin, destination, day) for every leg over the days its wait window can reach.
+    Later legs start wherever the previous one arrived, so multi-leg journeys also check
+    the following day; a leg that ends up later still is looked up on its own.
+    """
+    start_datetime = datetime.fromisoformat(request.start_time)
+    last_day = (start_datetime + timedelta(minutes=request.max_wait_time)).date()
+    days = (last_day - start_datetime.date()).days + 1
+    legs = list(zip(request.station_codes, request.station_codes[1:]))
+    if len(legs) > 1:
+        days += 1
+    return [
+        (origin, destination, get_start_window(start_datetime + timedelta(days=day)))
+        for origin, destination in legs
+        for day in range(days)
+    ]
+
+
+def sweep_leg(
+    start_minutes: List[Optional[int]],
+    departures: array,
+    arrivals: array,
+    max_wait_time: int,
+) -> List[Optional[int]]:
+    """
+    For each start (epoch minutes, or None if an earlier leg had no train) the arrival of
+    the first departure within max_wait_time, as DatabaseConnector.get_train_schedule picks
+    it, or None. Starts are visited in time order so each search resumes where the last
+    one stopped, making it one merge pass over the timetable rather than a lookup per start.
+    """
+    arrived: List[Optional[int]] = [None] * len(start_minutes)
+    index = 0
+    for minute, position in sorted(
+        (minute, position) for position, minute in enumerate(start_minutes) if minute is not None
+    ):
+        index = bisect_left(departures, minute, index)
+        if index < len(departures) and departures[index] < minute + max_wait_time:
+            arrived[position] = arrivals[index]
+    return arrived
+
+
+def day_window(day: datetime) -> Tuple[datetime, datetime]:
+    """The whole of `day`, midnight to midnight."""
+    day_start = get_start_window(day)
+    return day_start, day_start + timedelta(days=1)
+
+
+def interval_coverage_enabled() -> bool:
+    """Whether days are fetched in windows as requests need them, rather than whole."""
+    return fetch_mode != "origin" and interval_coverage_config.get("enabled", False)
+
+
+def needed_window(
+    day: datetime, search_window: Tuple[datetime, datetime]
+) -> Optional[Tuple[datetime, datetime]]:
+    """
+    The part of `day` a leg needs fetched when the day isn't cached: its search_window,
+    lengthened to at least min_fetch_minutes and widened out to block_minutes boundaries,
+    so nearby requests share one fetch, but never into the next day just for padding.
+    Can be empty when the window barely reaches the day. None when whole days are
+    fetched instead.
+    """
+    if not interval_coverage_enabled():
+        return None
+    block = timedelta(minutes=interval_coverage_config.get("block_minutes", 60))
+    min_fetch = timedelta(minutes=interval_coverage_config.get("min_fetch_minutes", 180))
+    day_start = get_start_window(day)
+    search_day_end = get_start_window(search_window[0]) + timedelta(days=1)
+
+    start = day_start + (max(day_start, search_window[0]) - day_start) // block * block
+    end = max(search_window[1], min(search_window[0] + min_fetch, search_day_end))
+    end = day_start - (day_start - end) // block * block
+    end = min(end, day_start + timedelta(days=1))
+    return start, max(start, end)
+
+
+def refresh_window(
+    day: datetime, search_window: Tuple[datetime, datetime]
+) -> Optional[Tuple[datetime, datetime]]:
+    """
+    The part of `day` a forced refresh re-fetches: the departures in search_window,
+    padded either side. None when incremental refresh is off or nothing of the
+    padded window falls on `day`.
+    """
+    if not incremental_refresh_config.get("enabled", True):
+        return None
+    day_start = get_start_window(day)
+    before = timedelta(minutes=incremental_refresh_config.get("before_minutes", 15))
+    after = timedelta(minutes=incremental_refresh_config.get("after_minutes", 30))
+    start = max(day_start, search_window[0] - before)
+    end = min(day_start + timedelta(days=1), search_window[1] + after)
+    return (start, end) if start < end else None
+
+
+def fetch_scope(destination_station_code: str, window) -> str:
+    """What a fetch covers: one destination, or every destination when whole boards are fetched."""
+    if fetch_mode == "origin" and window is None:
+        return ALL_DESTINATIONS
+    return destination_station_code
@@ -0,0 +1,314 @@
+import asyncio
+import time
+from collections import deque
+from datetime import datetime, timedelta
+from typing import Callable, Deque, Dict, Iterator, List, NamedTuple, Optional, Tuple
+
+from app.connectors.train_api.models import DepartureBatch, DepartureRecord
+from app.utils.config_loader import load_config
+from app.utils.date_helpers import to_epoch_minutes
+from app.utils.intervals import IntervalSet
+from app.utils.logger import logger
+from app.utils.metrics import metrics
+
+
+class PendingDepartures(NamedTuple):
+    """Departures fetched for a pair over `window`, authoritative there until persisted."""
+
+    origin_station_code: str
+    destination_station_code: str
+    window: Tuple[datetime, datetime]
+    departures: DepartureBatch
+
+
+class _Write:
+    __slots__ = ("pending", "persist", "done")
+
+    def __init__(self, pending: List[PendingDepartures], persist: Callable[[], None], done):
+        self.pending = pending
+        self.persist = persist
+        # Resolves to True once persisted, False if persisting failed
+        self.done = done
+
+
+class WriteBehind:
+    """
+    Lets a cache miss be answered from the departures it just fetched while a background
+    writer stores them, instead of the request waiting for the ingest.
+
+    Guarantees:
+    - A write's rows, snapshot and tracker entry are stored by one persist call, in that
+      order, so a crash before it runs loses the cache entry rather than leaving a tracker
+      row for rows that were never stored. Until then the departures are served from here.
+    - The writer lingers `linger_seconds` after a write arrives, so the request that fetched
+      it is answered first and writes arriving together are stored as one batch.
+    - The queue holds at most `max_queued_writes` fetches; submitting to a full queue waits
+      for the writer, so a slow disk slows fetches down instead of growing memory.
+    - `stop()` persists everything still queued before shutdown, within `shutdown_flush_seconds`.
+    - A write that fails is logged and dropped, and its departures stop being served, so
+      the next request fetches them again.
+
+    When the writer isn't running (scripts, benchmarks, tests) writes happen inline, as they
+    did before. Queued writes are only visible in this worker; the fetch lock is held until
+    they land, so other workers wait for them rather than fetching again.
+    """
+
+    def __init__(
+        self,
+        enabled: bool = True,
+        max_queued_writes: int = 256,
+        batch_size: int = 32,
+        linger_seconds: float = 0.05,
+        shutdown_flush_seconds: float = 30,
+    ):
+        self.enabled = enabled
+        self.max_queued_writes = max_queued_writes
+        self.batch_size = batch_size
+        self.linger_seconds = linger_seconds
+        self.shutdown_flush_seconds = shutdown_flush_seconds
+        self._queue: Optional[asyncio.Queue] = None
+        self._writer: Optional[asyncio.Task] = None
+        # Taken off the queue by the writer and not persisted yet
+        self._taken: List[_Write] = []
+        # (origin, destination) -> writes not yet persisted, oldest first
+        self._pending: Dict[Tuple[str, str], Deque[Tuple[PendingDepartures, _Write]]] = {}
+
+    @property
+    def running(self) -> bool:
+        return self._writer is not None and not self._writer.done()
+
+    async def start(self):
+        if not self.enabled or self.running:
+            return
+        self._queue = asyncio.Queue(maxsize=self.max_queued_writes)
+        self._writer = asyncio.create_task(self._run())
+        logger.info(f"Write-behind writer started, up to {self.max_queued_writes} queued writes")
+
+    async def stop(self):
+        """Stop taking writes and persist the ones already queued."""
+        if self._writer is None:
+            return
+        writer, self._writer = self._writer, None
+        writer.cancel()
+        try:
+            await writer
+        except asyncio.CancelledError:
+            pass
+        deadline = time.monotonic() + self.shutdown_flush_seconds
+        flushed = 0
+        flushed += self._persist_batch(self._taken)
+        self._taken = []
+        while not self._queue.empty() and time.monotonic() < deadline:
+            flushed += self._persist_batch(self._take_batch(self._queue.get_nowait()))
+        lost = self._queue.qsize()
+        if lost:
+            logger.error(f"Write-behind stopped with {lost} writes not persisted")
+            while not self._queue.empty():
+                self._finish(self._queue.get_nowait(), False)
+        logger.info(f"Write-behind writer stopped, flushed {flushed} writes on shutdown")
+
+    async def submit(self, pending: List[PendingDepartures], persist: Callable[[], None]):
+        """
+        Serve `pending` from memory and queue `persist` to store it. Persists inline, as
+        before, when the writer isn't running.
+        """
+        if not self.running:
+            persist()
+            return
+        write = _Write(pending, persist, asyncio.get_running_loop().create_future())
+        for entry in pending:
+            pair = (entry.origin_station_code, entry.destination_station_code)
+            self._pending.setdefault(pair, deque()).append((entry, write))
+        if self._queue.full():
+            metrics.increment("write_behind_backpressure")
+            logger.warning("Write-behind queue full, waiting for the writer")
+        await self._queue.put(write)
+        metrics.increment("write_behind_queued")
+        if not self.running:
+            # Stopped while we waited for room, nothing will pick the queue up now
+            while not self._queue.empty():
+                self._persist_batch([self._queue.get_nowait()])
+
+    async def _run(self):
+        while True:
+            self._taken = [await self._queue.get()]
+            if self.linger_seconds > 0:
+                await asyncio.sleep(self.linger_seconds)
+            self._taken = self._take_batch(self._taken[0])
+            started = time.perf_counter()
+            size = len(self._taken)
+            persisted = 0
+            while self._taken:
+                persisted += self._persist(self._taken[0])
+                del self._taken[0]
+                # Persisting is blocking DB work, like every query the service makes, so
+                # give requests a turn between writes
+                await asyncio.sleep(0)
+            logger.debug(
+                f"Write-behind persisted {persisted}/{size} writes in {time.perf_counter() - started:.3f}s"
+            )
+
+    def _take_batch(self, first: _Write) -> List[_Write]:
+        batch = [first]
+        while len(batch) < self.batch_size and not self._queue.empty():
+            batch.append(self._queue.get_nowait())
+        return batch
+
+    def _persist_batch(self, batch: List[_Write]) -> int:
+        return sum(self._persist(write) for write in batch)
+
+    def _persist(self, write: _Write) -> int:
+        """Persist a write in its own transactions, so one bad fetch doesn't roll back the rest."""
+        try:
+            write.persist()
+        except Exception as e:
+            logger.error(
+                f"Write-behind failed to persist departures for {len(write.pending)} pairs: {e}"
+            )
+            metrics.increment("write_behind_failed")
+            self._finish(write, False)
+            return 0
+        self._finish(write, True)
+        return 1
+
+    def _finish(self, write: _Write, persisted: bool):
+        for entry in write.pending:
+            pair = (entry.origin_station_code, entry.destination_station_code)
+            entries = self._pending.get(pair)
+            if entries is None:
+                continue
+            for item in list(entries):
+                if item[1] is write:
+                    entries.remove(item)
+            if not entries:
+                del self._pending[pair]
+        if not write.done.done():
+            write.done.set_result(persisted)
+
+    def _windows(self, origin_station_code: str, destination_station_code: str) -> IntervalSet:
+        return IntervalSet(
+            entry.window
+            for entry, _ in self._pending.get((origin_station_code, destination_station_code), ())
+        )
+
+    def gaps(
+        self,
+        origin_station_code: str,
+        destination_station_code: str,
+        start: datetime,
+        end: datetime,
+    ) -> List[Tuple[datetime, datetime]]:
+        """The parts of [start, end) no queued write covers for the pair."""
+        if (origin_station_code, destination_station_code) not in self._pending:
+            return [(start, end)] if start < end else []
+        return self._windows(origin_station_code, destination_station_code).gaps(start, end)
+
+    def covers(
+        self,
+        origin_station_code: str,
+        destination_station_code: str,
+        start: datetime,
+        end: datetime,
+    ) -> bool:
+        return not self.gaps(origin_station_code, destination_station_code, start, end)
+
+    def find_first_departure(
+        self,
+        origin_station_code: str,
+        destination_station_code: str,
+        start_time: datetime,
+        max_wait_time: int,
+    ) -> Optional[DepartureRecord]:
+        """
+        First queued departure in [start_time, start_time + max_wait_time), or None. Queued
+        writes only answer for their windows, the rest of the range (see `gaps`) is in the
+        stored data.
+        """
+        end_time = start_time + timedelta(minutes=max_wait_time)
+        best = min(
+            self._visible(origin_station_code, destination_station_code, start_time, end_time),
+            key=lambda found: found[0].departures[found[1]],
+            default=None,
+        )
+        if best is None:
+            return None
+        record = best[0][best[1]]
+        # Stored rows use the destination arrival for the origin arrival too
+        return record._replace(origin_expected_arrival_time=record.destination_aimed_arrival_time)
+
+    def departure_minutes(
+        self,
+        origin_station_code: str,
+        destination_station_code: str,
+        start_time: datetime,
+        end_time: datetime,
+    ) -> List[Tuple[int, int]]:
+        """(departure, destination arrival) in epoch minutes for queued departures in [start_time, end_time)."""
+        return [
+            (batch.departures[index], batch.destination_arrivals[index])
+            for batch, index in self._visible(
+                origin_station_code, destination_station_code, start_time, end_time
+            )
+        ]
+
+    def _visible(
+        self,
+        origin_station_code: str,
+        destination_station_code: str,
+        start_time: datetime,
+        end_time: datetime,
+    ) -> Iterator[Tuple[DepartureBatch, int]]:
+        """(batch, index) of the queued departures in range that would be stored."""
+        entries = self._pending.get((origin_station_code, destination_station_code))
+        if not entries:
+            return
+        start, end = to_epoch_minutes(start_time), to_epoch_minutes(end_time)
+        # Newest first, a departure only counts if no later fetch covers its time
+        newer = IntervalSet()
+        for entry, _ in reversed(entries):
+            window_start, window_end = (to_epoch_minutes(value) for value in entry.window)
+            batch = entry.departures
+            for index, departure in enumerate(batch.departures):
+                if not (start <= departure < end and window_start <= departure < window_end):
+                    continue
+                # Same rule as store_departures, which skips these rows
+                if not departure < batch.destination_arrivals[index]:
+                    continue
+                if newer.covers(departure, departure + 1):
+                    continue
+                yield batch, index
+            newer.add(window_start, window_end)
+
+    async def wait_for(
+        self,
+        origin_station_code: str,
+        destination_station_code: Optional[str] = None,
+        window: Optional[Tuple[datetime, datetime]] = None,
+    ):
+        """
+        Wait until the writes queued for the pair, or for every destination of the origin,
+        are persisted. With `window`, only writes overlapping it are waited for.
+        """
+        writes = {
+            id(write): write.done
+            for (origin, destination), entries in self._pending.items()
+            if origin == origin_station_code
+            and destination_station_code in (None, destination)
+            for entry, write in entries
+            if window is None or (entry.window[0] < window[1] and window[0] < entry.window[1])
+        }
+        if writes:
+            await asyncio.wait(list(writes.values()))
+
+    def __len__(self) -> int:
+        return self._queue.qsize() if self._queue is not None else 0
+
+
+write_behind_config = load_config().get("write_behind", {})
+write_behind = WriteBehind(
+    enabled=write_behind_config.get("enabled", True),
+    max_queued_writes=write_behind_config.get("max_queued_writes", 256),
+    batch_size=write_behind_config.get("batch_size", 32),
+    linger_seconds=write_behind_config.get("linger_seconds", 0.05),
+    shutdown_flush_seconds=write_behind_config.get("shutdown_flush_seconds", 30),
+)
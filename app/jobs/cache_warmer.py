@@ -0,0 +1,169 @@
+import argparse
+import asyncio
+import json
+import uuid
+from collections import defaultdict
+from datetime import datetime, timedelta
+from typing import List, Tuple
+
+import httpx
+
+from app.connectors.db.db_connector import DatabaseConnector, db_connector
+from app.connectors.shared_cache.factory import shared_cache
+from app.feature.train_times.services import TrainTimeService, day_window
+from app.feature.train_times.write_behind import write_behind
+from app.jobs.periodic import run_periodically
+from app.utils.config_loader import load_config
+from app.utils.date_helpers import get_start_window
+from app.utils.error_handler import TrainServiceError
+from app.utils.logger import logger
+from app.utils.metrics import RouteHistory, route_history
+
+
+class CacheWarmer:
+    """
+    Pre-fetches timetables for the hottest (origin, destination) routes for today and the
+    next `days_ahead` days, so user requests hit the cache instead of TransportAPI.
+
+    Routes are ranked by in-process request history (when running inside the app) plus
+    how many days each route was fetched recently according to the APICallTracker.
+    Fetches go through the same single-flight and node-wide lock as requests, and each
+    route-day is claimed for the interval, so with several workers it is warmed once.
+    """
+
+    def __init__(
+        self,
+        db_connector: DatabaseConnector,
+        settings: dict,
+        history: RouteHistory = route_history,
+    ):
+        self.db_connector = db_connector
+        self.service = TrainTimeService(db_connector)
+        self.history = history
+        self.interval_seconds = settings.get("interval_seconds", 900)
+        self.days_ahead = settings.get("days_ahead", 2)
+        self.top_routes = settings.get("top_routes", 10)
+        self.history_days = settings.get("history_days", 7)
+        self.max_calls_per_run = settings.get("max_calls_per_run", 20)
+        self.min_seconds_between_calls = settings.get("min_seconds_between_calls", 1.0)
+        self.last_report = None
+
+    def hot_routes(self) -> List[Tuple[str, str]]:
+        scores = defaultdict(float)
+        for route, score in self.history.top(self.top_routes * 2):
+            scores[route] += score
+
+        since = datetime.now() - timedelta(days=self.history_days)
+        for origin, destination, days_fetched in self.db_connector.get_popular_routes(
+            since, self.top_routes * 2
+        ):
+            scores[(origin, destination)] += days_fetched
+
+        ranked = sorted(scores.items(), key=lambda item: item[1], reverse=True)
+        return [route for route, _ in ranked[: self.top_routes]]
+
+    def target_keys(
+        self, routes: List[Tuple[str, str]], today: datetime
+    ) -> List[Tuple[str, str, datetime]]:
+        # Day-major order, so today's timetables are warmed before later days use budget
+        return [
+            (origin, destination, today + timedelta(days=day))
+            for day in range(self.days_ahead + 1)
+            for origin, destination in routes
+        ]
+
+    def is_warm(self, origin: str, destination: str, day: datetime) -> bool:
+        """Cached, or fetched and still queued for writing."""
+        return self.db_connector.has_recent_api_call(
+            origin, destination, day
+        ) or write_behind.covers(origin, destination, *day_window(day))
+
+    async def run_once(self) -> dict:
+        today = get_start_window(datetime.now())
+        routes = self.hot_routes()
+        keys = self.target_keys(routes, today)
+        missing = [key for key in keys if not self.is_warm(*key)]
+
+        fetched = failed = shared = claimed = 0
+        for origin, destination, day in missing:
+            if fetched and self.is_warm(origin, destination, day):
+                # Covered by an earlier board fetch for the same origin this run
+                shared += 1
+                continue
+            if fetched + failed >= self.max_calls_per_run:
+                logger.info("Cache warmer call budget used up for this run")
+                break
+            if not await self._claim(origin, destination, day):
+                claimed += 1
+                continue
+            if fetched + failed:
+                await asyncio.sleep(self.min_seconds_between_calls)
+            try:
+                await self.service.fetch_day_once(origin, destination, day)
+                fetched += 1
+            except (TrainServiceError, httpx.HTTPError) as e:
+                failed += 1
+                logger.warning(
+                    f"Cache warmer could not fetch {origin} to {destination} on {day.date()}: {e}"
+                )
+
+        covered = len(keys) - len(missing) + fetched + shared
+        report = {
+            "run_at": datetime.now().isoformat(timespec="seconds"),
+            "routes": [f"{origin}-{destination}" for origin, destination in routes],
+            "days": self.days_ahead + 1,
+            "keys": len(keys),
+            "already_warm": len(keys) - len(missing),
+            "fetched": fetched,
+            "covered_by_board": shared,
+            "warmed_elsewhere": claimed,
+            "failed": failed,
+            "coverage": covered / len(keys) if keys else 1.0,
+        }
+        self.last_report = report
+        logger.info(
+            f"Cache warmer: {covered}/{len(keys)} route-days warm "
+            f"({report['coverage']:.0%}), fetched {fetched}, {claimed} warmed by other "
+            f"workers, failed {failed}"
+        )
+        return report
+
+    async def _claim(self, origin: str, destination: str, day: datetime) -> bool:
+        """
+        Take the route-day for this interval. The claim is left to expire rather than
+        released, so other workers' warmers skip it until it is due again.
+        """
+        return await shared_cache.acquire_lock(
+            f"warm:{origin}:{destination}:{day:%Y-%m-%d}",
+            uuid.uuid4().hex,
+            ttl_seconds=self.interval_seconds * 0.9,
+        )
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Warm the timetable cache.")
+    parser.add_argument("--once", action="store_true", help="Run a single pass and exit")
+    parser.add_argument("--days-ahead", type=int)
+    parser.add_argument("--top-routes", type=int)
+    parser.add_argument("--max-calls-per-run", type=int)
+    options = parser.parse_args(argv)
+
+    settings = dict(load_config().get("jobs", {}).get("cache_warmer", {}))
+    for key in ("days_ahead", "top_routes", "max_calls_per_run"):
+        if getattr(options, key) is not None:
+            settings[key] = getattr(options, key)
+
+    warmer = CacheWarmer(db_connector, settings)
+    if options.once:
+        # The report is the CLI's output
+        print(json.dumps(asyncio.run(warmer.run_once()), indent=2))  # noqa: T201
+    else:
+        asyncio.run(
+            run_periodically(
+                "cache_warmer", warmer.run_once, settings.get("interval_seconds", 900)
+            )
+        )
+
+
+if __name__ == "__main__":
+    main()
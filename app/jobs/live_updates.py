@@ -0,0 +1,152 @@
+import asyncio
+import uuid
+from datetime import datetime, timedelta
+from typing import List, Optional, Tuple
+
+import httpx
+
+from app.connectors.db.db_connector import DatabaseConnector
+from app.connectors.shared_cache.factory import shared_cache, shared_cache_config
+from app.feature.train_times.services import TrainTimeService, fetch_scope
+from app.feature.train_times.write_behind import write_behind
+from app.utils.date_helpers import get_start_window, to_epoch_minutes
+from app.utils.error_handler import TrainServiceError, UpstreamUnavailableError
+from app.utils.logger import logger
+from app.utils.metrics import RouteHistory, metrics, route_history
+
+
+class LiveUpdatePoller:
+    """
+    Keeps today's timetables for the routes being asked for close to live, so delays reach
+    clients on the cached path without them forcing a refresh.
+
+    Each run takes the `top_routes` legs from recent request history that already have
+    departures for today near now, and re-fetches the departures between `before_minutes`
+    ago and `ahead_minutes` from now, merged like a forced refresh: only rows whose times
+    changed are written. The departure times they changed are logged with them, which
+    drops just the cached responses whose legs depart around those times, in every worker;
+    a day only partly fetched has no cached responses, and the poll covers its window for
+    the next request. A run makes at most `max_calls_per_run` upstream calls,
+    `min_seconds_between_calls` apart. Each leg is claimed node-wide for the interval,
+    so with several workers it is still polled once per interval.
+    """
+
+    def __init__(
+        self,
+        db_connector: DatabaseConnector,
+        settings: dict,
+        history: RouteHistory = route_history,
+    ):
+        self.db_connector = db_connector
+        self.service = TrainTimeService(db_connector)
+        self.history = history
+        self.interval_seconds = settings.get("interval_seconds", 60)
+        self.top_routes = settings.get("top_routes", 10)
+        self.before_minutes = settings.get("before_minutes", 15)
+        self.ahead_minutes = settings.get("ahead_minutes", 120)
+        self.max_calls_per_run = settings.get("max_calls_per_run", 10)
+        self.min_seconds_between_calls = settings.get("min_seconds_between_calls", 1.0)
+        self.last_report = None
+
+    def hot_keys(
+        self, today: datetime, window: Tuple[datetime, datetime]
+    ) -> List[Tuple[str, str, datetime]]:
+        """
+        Today's keys for the most requested legs, hottest first, that are cached or have
+        some of `window` fetched. The rest will be fetched by the next request for them.
+        """
+        keys = [
+            (origin, destination, today)
+            for (origin, destination), _ in self.history.top(self.top_routes)
+        ]
+        coverage = self.db_connector.get_coverage(keys)
+        return [
+            key
+            for key in keys
+            if coverage.get(key) is not None
+            or self.db_connector.get_coverage_gaps(key[0], key[1], *window) != [window]
+        ]
+
+    def poll_window(self, now: datetime) -> Tuple[datetime, datetime]:
+        day_start = get_start_window(now)
+        return (
+            max(day_start, now - timedelta(minutes=self.before_minutes)),
+            min(day_start + timedelta(days=1), now + timedelta(minutes=self.ahead_minutes)),
+        )
+
+    async def run_once(self, now: Optional[datetime] = None) -> dict:
+        now = now or datetime.now()
+        today = get_start_window(now)
+        window = self.poll_window(now)
+        keys = self.hot_keys(today, window)
+
+        polled = changed = claimed = failed = 0
+        for origin, destination, day in keys:
+            if polled + failed >= self.max_calls_per_run:
+                logger.info("Live update call budget used up for this run")
+                break
+            if not await self._claim(origin, destination, day):
+                claimed += 1
+                continue
+            if polled + failed:
+                await asyncio.sleep(self.min_seconds_between_calls)
+            try:
+                changed += await self._poll(origin, destination, day, window)
+                polled += 1
+            except UpstreamUnavailableError as e:
+                failed += 1
+                logger.warning(f"Live updates stopped for this run, train API unavailable: {e}")
+                break
+            except (TrainServiceError, httpx.HTTPError) as e:
+                failed += 1
+                logger.warning(f"Live update of {origin} to {destination} failed: {e}")
+
+        metrics.increment("live_update_polled", polled)
+        metrics.increment("live_update_changed", changed)
+        report = {
+            "run_at": now.isoformat(timespec="seconds"),
+            "window": [window[0].isoformat(), window[1].isoformat()],
+            "hot_keys": len(keys),
+            "polled": polled,
+            "changed": changed,
+            "polled_elsewhere": claimed,
+            "failed": failed,
+        }
+        self.last_report = report
+        logger.info(
+            f"Live updates: polled {polled}/{len(keys)} hot legs, {changed} changed, "
+            f"{claimed} polled by other workers, {failed} failed"
+        )
+        return report
+
+    async def _claim(self, origin: str, destination: str, day: datetime) -> bool:
+        """
+        Take the leg for this interval. The claim is left to expire rather than released,
+        so other workers skip the leg until it is due again.
+        """
+        return await shared_cache.acquire_lock(
+            f"live:{origin}:{destination}:{day:%Y-%m-%d}",
+            uuid.uuid4().hex,
+            ttl_seconds=self.interval_seconds * 0.9,
+        )
+
+    async def _poll(
+        self, origin: str, destination: str, day: datetime, window: Tuple[datetime, datetime]
+    ) -> bool:
+        """Refresh the leg's window, returning whether any of the day's departures changed."""
+        day_range = (
+            origin,
+            destination,
+            to_epoch_minutes(day),
+            to_epoch_minutes(day + timedelta(days=1)),
+        )
+        # The same lock a forced refresh of the window takes, so they don't both fetch it
+        async with shared_cache.lock(
+            f"fetch:{origin}:{fetch_scope(destination, window)}:{day:%Y-%m-%d}",
+            ttl_seconds=shared_cache_config.get("lock_ttl_seconds", 30),
+            wait_seconds=shared_cache_config.get("lock_wait_seconds", 20),
+        ):
+            version = self.db_connector.get_departure_change_ids([day_range])
+            await self.service.refresh_train_data_window(origin, destination, window)
+            await write_behind.wait_for(origin, destination, window)
+        return self.db_connector.get_departure_change_ids([day_range]) != version
@@ -0,0 +1,29 @@
+import asyncio
+from typing import Awaitable, Callable, List
+
+from app.utils.logger import logger
+
+
+async def run_periodically(
+    name: str,
+    job: Callable[[], Awaitable[object]],
+    interval_seconds: float,
+    initial_delay_seconds: float = 0,
+):
+    """Run a job every interval until cancelled. Failures are logged, not raised."""
+    await asyncio.sleep(initial_delay_seconds)
+    while True:
+        try:
+            await job()
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"Background job {name} failed: {e}")
+        await asyncio.sleep(interval_seconds)
+
+
+async def stop_tasks(tasks: List[asyncio.Task]):
+    """Cancel background tasks and wait for them to unwind."""
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
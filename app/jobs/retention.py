@@ -0,0 +1,165 @@
+import argparse
+import asyncio
+import csv
+import gzip
+import json
+import os
+from datetime import datetime, timedelta
+from typing import List, Optional
+
+from app.connectors.db.db_connector import DatabaseConnector, db_connector
+from app.connectors.snapshot.snapshot_store import snapshot_store
+from app.jobs.periodic import run_periodically
+from app.utils.config_loader import load_config
+from app.utils.date_helpers import get_start_window
+from app.utils.logger import logger
+
+
+class RetentionJob:
+    """
+    Removes expired days from train_schedule and api_call_tracker in small batches,
+    optionally archiving them to gzipped CSV first, then compacts the database.
+
+    Tracker rows are always removed before the schedule rows they vouch for, and never
+    outlive them, so the cache can not claim a day whose timetable has been deleted.
+    """
+
+    def __init__(self, db_connector: DatabaseConnector, settings: dict):
+        self.db_connector = db_connector
+        self.schedule_days = settings.get("train_schedule_days", 7)
+        self.tracker_days = settings.get("api_call_tracker_days", self.schedule_days)
+        self.batch_size = settings.get("batch_size", 2000)
+        self.pause_seconds = settings.get("pause_seconds_between_batches", 0.05)
+        self.max_batches_per_run = settings.get("max_batches_per_run", 500)
+        self.archive_dir = settings.get("archive_dir")
+        self.incremental_vacuum_pages = settings.get("incremental_vacuum_pages", 2000)
+        self.full_vacuum = settings.get("full_vacuum", False)
+
+    def cutoffs(self, now: datetime):
+        today = get_start_window(now)
+        schedule_cutoff = today - timedelta(days=self.schedule_days)
+        # A tracker entry must not outlive the rows it vouches for
+        tracker_cutoff = max(today - timedelta(days=self.tracker_days), schedule_cutoff)
+        return schedule_cutoff, tracker_cutoff
+
+    def _archive(self, table: str, rows: List[dict], run_date: str):
+        if not self.archive_dir or not rows:
+            return
+        os.makedirs(self.archive_dir, exist_ok=True)
+        path = os.path.join(self.archive_dir, f"{table}_{run_date}.csv.gz")
+        write_header = not os.path.exists(path)
+        with gzip.open(path, "at", newline="", encoding="utf-8") as file:
+            writer = csv.DictWriter(file, fieldnames=list(rows[0].keys()))
+            if write_header:
+                writer.writeheader()
+            writer.writerows(rows)
+
+    async def _purge(self, table: str, delete_batch, cutoff: datetime, run_date: str):
+        deleted = 0
+        for _ in range(self.max_batches_per_run):
+            rows = delete_batch(cutoff, self.batch_size)
+            self._archive(table, rows, run_date)
+            deleted += len(rows)
+            if len(rows) < self.batch_size:
+                break
+            # Yield between batches so queued writers and requests get the lock
+            await asyncio.sleep(self.pause_seconds)
+        return deleted
+
+    async def run_once(self, now: Optional[datetime] = None, dry_run: bool = False) -> dict:
+        now = now or datetime.now()
+        schedule_cutoff, tracker_cutoff = self.cutoffs(now)
+        report = {
+            "run_at": now.isoformat(timespec="seconds"),
+            "train_schedule_cutoff": schedule_cutoff.isoformat(),
+            "api_call_tracker_cutoff": tracker_cutoff.isoformat(),
+        }
+
+        if dry_run:
+            schedules, _ = self.db_connector.count_rows_before(schedule_cutoff)
+            _, trackers = self.db_connector.count_rows_before(tracker_cutoff)
+            report.update(
+                {"train_schedule_expired": schedules, "api_call_tracker_expired": trackers}
+            )
+            return report
+
+        run_date = now.strftime("%Y%m%d")
+        report["api_call_tracker_deleted"] = await self._purge(
+            "api_call_tracker",
+            self.db_connector.delete_api_call_trackers_before,
+            tracker_cutoff,
+            run_date,
+        )
+        report["refresh_window_deleted"] = await self._purge(
+            "refresh_window",
+            self.db_connector.delete_refresh_windows_before,
+            tracker_cutoff,
+            run_date,
+        )
+        report["departure_change_deleted"] = await self._purge(
+            "departure_change",
+            self.db_connector.delete_departure_changes_before,
+            tracker_cutoff,
+            run_date,
+        )
+        report["coverage_interval_deleted"] = await self._purge(
+            "coverage_interval",
+            self.db_connector.delete_coverage_intervals_before,
+            tracker_cutoff,
+            run_date,
+        )
+        report["train_schedule_deleted"] = await self._purge(
+            "train_schedule",
+            self.db_connector.delete_train_schedules_before,
+            schedule_cutoff,
+            run_date,
+        )
+
+        report["snapshots_deleted"] = snapshot_store.purge_before(schedule_cutoff)
+        self.db_connector.compact(self.incremental_vacuum_pages, self.full_vacuum)
+
+        logger.info(
+            f"Retention removed {report['train_schedule_deleted']} schedule rows before {schedule_cutoff.date()} "
+            f"and {report['api_call_tracker_deleted']} tracker rows before {tracker_cutoff.date()}"
+        )
+        return report
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Delete or archive expired timetable days.")
+    parser.add_argument("--loop", action="store_true", help="Keep running on the configured interval")
+    parser.add_argument("--dry-run", action="store_true", help="Only count what would be removed")
+    parser.add_argument("--train-schedule-days", type=int)
+    parser.add_argument("--api-call-tracker-days", type=int)
+    parser.add_argument("--archive-dir")
+    parser.add_argument("--full-vacuum", action="store_true")
+    parser.add_argument(
+        "--enable-incremental-vacuum",
+        action="store_true",
+        help="Convert an existing database to auto_vacuum=INCREMENTAL (one-off full VACUUM)",
+    )
+    options = parser.parse_args(argv)
+
+    settings = dict(load_config().get("jobs", {}).get("retention", {}))
+    for key in ("train_schedule_days", "api_call_tracker_days", "archive_dir"):
+        if getattr(options, key) is not None:
+            settings[key] = getattr(options, key)
+    if options.full_vacuum:
+        settings["full_vacuum"] = True
+
+    if options.enable_incremental_vacuum:
+        db_connector.enable_incremental_vacuum()
+
+    job = RetentionJob(db_connector, settings)
+    if options.loop:
+        asyncio.run(
+            run_periodically("retention", job.run_once, settings.get("interval_seconds", 3600))
+        )
+    else:
+        report = asyncio.run(job.run_once(dry_run=options.dry_run))
+        # The report is the CLI's output
+        print(json.dumps(report, indent=2))  # noqa: T201
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,40 @@
+import asyncio
+from typing import List
+
+from app.connectors.db.db_connector import db_connector
+from app.jobs.cache_warmer import CacheWarmer
+from app.jobs.live_updates import LiveUpdatePoller
+from app.jobs.periodic import run_periodically
+from app.jobs.retention import RetentionJob
+from app.utils.logger import logger
+
+JOBS = {
+    "cache_warmer": CacheWarmer,
+    "retention": RetentionJob,
+    "live_updates": LiveUpdatePoller,
+}
+
+
+def start_background_jobs(config: dict) -> List[asyncio.Task]:
+    """Start the background jobs enabled under `jobs` in config.json."""
+    jobs_config = config.get("jobs", {})
+    tasks = []
+
+    for name, job_class in JOBS.items():
+        settings = jobs_config.get(name, {})
+        if not settings.get("enabled"):
+            continue
+        job = job_class(db_connector, settings)
+        tasks.append(
+            asyncio.create_task(
+                run_periodically(
+                    name,
+                    job.run_once,
+                    settings.get("interval_seconds", 900),
+                    settings.get("initial_delay_seconds", 5),
+                )
+            )
+        )
+        logger.info(f"Background job {name} started")
+
+    return tasks
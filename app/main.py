@@ -1,9 +1,20 @@
+from contextlib import asynccontextmanager
+from datetime import datetime
+
 from fastapi import FastAPI
 from fastapi.exceptions import HTTPException
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import ORJSONResponse
 
+from app.connectors.db.db_connector import db_connector
+from app.connectors.snapshot.snapshot_store import snapshot_store
 from app.feature.train_times.routes import router as train_times_router
+from app.feature.train_times.write_behind import write_behind
+from app.jobs.periodic import stop_tasks
+from app.jobs.runner import start_background_jobs
 from app.utils.config_loader import load_config
+from app.utils.logger import logger
+from app.utils.offload import offloader
 from app.utils.error_handler import (
     TrainServiceError,
     train_service_error,
@@ -16,7 +27,25 @@ config = load_config()
 
 origins = config["app"]["cors_origins"]
 
-app = FastAPI()
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Creates missing tables and columns, so databases from older releases keep working
+    db_connector.create_db()
+    if snapshot_store.enabled:
+        loaded = snapshot_store.preload(db_connector.get_api_call_keys(datetime.now()))
+        logger.info(f"Mapped {loaded} timetable snapshots")
+    await offloader.start()
+    await write_behind.start()
+    background_tasks = start_background_jobs(config)
+    yield
+    await stop_tasks(background_tasks)
+    # Stores fetches still queued, so shutting down doesn't lose them
+    await write_behind.stop()
+    offloader.shutdown()
+
+
+app = FastAPI(lifespan=lifespan, default_response_class=ORJSONResponse)
 
 app.add_middleware(
     CORSMiddleware,
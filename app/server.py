@@ -0,0 +1,248 @@
+"""
+Production launcher: `python -m app.server` (or `make serve`).
+
+The listening socket is bound, the app imported (which loads config and the station
+registry), tables created and the tracker rows of cached days from today mirrored in this
+process, then `workers` uvicorn servers are forked from it. Workers start with all of that
+already in memory, shared copy-on-write, instead of each importing and warming up on its
+own, and a worker that dies is replaced by a fresh fork. `make run` stays the reloading
+development server.
+"""
+
+import argparse
+import multiprocessing
+import os
+import signal
+import socket
+import sys
+import time
+from datetime import datetime
+from importlib.util import find_spec
+from itertools import islice
+from typing import Dict
+
+import uvicorn
+
+from app.utils.config_loader import load_config
+from app.utils.logger import logger
+
+# Exit status of a worker whose lifespan startup failed, as uvicorn's own CLI uses
+STARTUP_FAILURE = 3
+PRELOAD_BATCH = 200
+
+
+def worker_count(settings: dict) -> int:
+    """`workers` from the settings, one per core when it isn't set."""
+    return settings.get("workers") or os.cpu_count() or 1
+
+
+def build_config(settings: dict, app) -> uvicorn.Config:
+    return uvicorn.Config(
+        app,
+        # Loopback unless a public bind is asked for, in config or with --host
+        host=settings.get("host", "127.0.0.1"),
+        port=settings.get("port", 8000),
+        # "auto" uses uvloop and httptools when they are installed, asyncio and h11 otherwise
+        loop=settings.get("loop", "auto"),
+        http=settings.get("http", "auto"),
+        backlog=settings.get("backlog", 2048),
+        timeout_keep_alive=settings.get("timeout_keep_alive", 5),
+        timeout_graceful_shutdown=settings.get("timeout_graceful_shutdown", 30),
+        limit_concurrency=settings.get("limit_concurrency"),
+        access_log=settings.get("access_log", False),
+    )
+
+
+def preload():
+    """
+    Import the app and warm what forked workers can share, returning the app. Nothing
+    started here may hold a connection, thread or event loop, since workers inherit it;
+    the shared cache backends only connect on first use, so each worker opens its own.
+    """
+    from app import main
+    from app.connectors.snapshot.snapshot_store import snapshot_store
+    from app.connectors.stations.station_registry import station_registry
+
+    db = main.db_connector
+    # Once here rather than racing in every worker's lifespan, where it is then a no-op
+    db.create_db()
+    keys = iter(db.get_api_call_keys(datetime.now()))
+    mirrored = mapped = 0
+    while batch := list(islice(keys, PRELOAD_BATCH)):
+        # Fills the tracker mirror, so workers answer coverage checks for these days from memory
+        mirrored += len(db.get_api_call_versions(batch))
+        if snapshot_store.enabled:
+            mapped += snapshot_store.preload(batch)
+    db.close()
+    # Pooled SQLite connections must not be shared across the fork, workers open their own
+    db.engine.dispose()
+    logger.info(
+        f"Preloaded {len(station_registry.codes)} station codes, {mirrored} cached days "
+        f"and {mapped} snapshots"
+    )
+    return main.app
+
+
+class WorkerSupervisor:
+    """
+    Forks `workers` uvicorn servers accepting on one listening socket and keeps that many
+    running. SIGTERM or SIGINT stops them gracefully: each finishes its requests within
+    uvicorn's `timeout_graceful_shutdown` and runs its lifespan shutdown, and any still
+    running after `kill_timeout` seconds is killed. If a worker fails to start, the rest
+    are stopped too rather than restarted in a loop.
+    """
+
+    def __init__(
+        self, config: uvicorn.Config, sock: socket.socket, workers: int, kill_timeout: float
+    ):
+        self.config = config
+        self.sock = sock
+        self.workers = workers
+        self.kill_timeout = kill_timeout
+        # pid -> monotonic time it was started
+        self._children: Dict[int, float] = {}
+        self._stopping = False
+        self._failed = False
+
+    def run(self) -> int:
+        signal.signal(signal.SIGTERM, self._handle_signal)
+        signal.signal(signal.SIGINT, self._handle_signal)
+        for _ in range(self.workers):
+            self._spawn()
+        while not self._stopping:
+            self._reap()
+            time.sleep(0.2)
+        return self._shutdown()
+
+    def _handle_signal(self, signum, frame):
+        self._stopping = True
+
+    def _spawn(self):
+        pid = os.fork()
+        if pid == 0:
+            self._run_worker()
+        self._children[pid] = time.monotonic()
+        logger.info(f"Started worker {pid}")
+
+    def _run_worker(self):
+        status = 1
+        try:
+            # uvicorn re-raises the stop signal once it has shut down, which would kill the
+            # worker before its offload pool processes exit
+            signal.signal(signal.SIGTERM, _exit_worker)
+            signal.signal(signal.SIGINT, _exit_worker)
+            server = uvicorn.Server(self.config)
+            server.run(sockets=[self.sock])
+            status = 0 if server.started else STARTUP_FAILURE
+        except SystemExit:
+            status = 0
+        except BaseException as e:
+            logger.error(f"Worker {os.getpid()} failed: {e}")
+        finally:
+            # The lifespan shuts the offload pool down without waiting for it
+            for child in multiprocessing.active_children():
+                child.join(5)
+                if child.is_alive():
+                    child.terminate()
+            sys.stdout.flush()
+            sys.stderr.flush()
+            # Never return into the supervisor's loop
+            os._exit(status)
+
+    def _reap(self):
+        while self._children:
+            try:
+                pid, status = os.waitpid(-1, os.WNOHANG)
+            except ChildProcessError:
+                return
+            if pid == 0:
+                return
+            started = self._children.pop(pid, None)
+            if started is None or self._stopping:
+                continue
+            code = os.waitstatus_to_exitcode(status)
+            if code == STARTUP_FAILURE:
+                logger.error(f"Worker {pid} failed to start, stopping the server")
+                self._failed = self._stopping = True
+                return
+            logger.warning(f"Worker {pid} exited with status {code}, starting a replacement")
+            if time.monotonic() - started < 1:
+                # Don't spin if workers die as soon as they start
+                time.sleep(1)
+            self._spawn()
+
+    def _shutdown(self) -> int:
+        logger.info(f"Stopping {len(self._children)} workers")
+        for pid in self._children:
+            _signal(pid, signal.SIGTERM)
+        deadline = time.monotonic() + self.kill_timeout
+        while self._children and time.monotonic() < deadline:
+            self._reap()
+            time.sleep(0.1)
+        for pid in list(self._children):
+            logger.error(f"Worker {pid} still running after {self.kill_timeout}s, killing it")
+            _signal(pid, signal.SIGKILL)
+            os.waitpid(pid, 0)
+            del self._children[pid]
+        self.sock.close()
+        return STARTUP_FAILURE if self._failed else 0
+
+
+def _exit_worker(signum, frame):
+    raise SystemExit(0)
+
+
+def _signal(pid: int, signum: int):
+    try:
+        os.kill(pid, signum)
+    except ProcessLookupError:
+        pass
+
+
+def _resolved(choice: str, preferred: str, fallback: str) -> str:
+    if choice != "auto":
+        return choice
+    return preferred if find_spec(preferred) else fallback
+
+
+def serve(settings: dict) -> int:
+    """Bind, preload and run the workers until stopped, returning the exit status."""
+    config = load_config()
+    workers = worker_count(settings)
+    if workers > 1 and config.get("shared_cache", {}).get("backend", "local") == "local":
+        logger.warning(
+            "Several workers with the local shared cache backend, fetches are only "
+            "de-duplicated within each worker"
+        )
+    uvicorn_config = build_config(settings, app=None)
+    # Bound first, so a port in use fails before any preloading
+    sock = uvicorn_config.bind_socket()
+    uvicorn_config.app = preload()
+    # Workers get their graceful shutdown plus the write-behind flush before being killed
+    kill_timeout = uvicorn_config.timeout_graceful_shutdown + config.get(
+        "write_behind", {}
+    ).get("shutdown_flush_seconds", 30)
+    logger.info(
+        f"Serving on {uvicorn_config.host}:{uvicorn_config.port} with {workers} workers "
+        f"(loop {_resolved(uvicorn_config.loop, 'uvloop', 'asyncio')}, "
+        f"http {_resolved(uvicorn_config.http, 'httptools', 'h11')})"
+    )
+    return WorkerSupervisor(uvicorn_config, sock, workers, kill_timeout).run()
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Serve the API with preloaded, forked workers.")
+    parser.add_argument("--host")
+    parser.add_argument("--port", type=int)
+    parser.add_argument("--workers", type=int, help="Defaults to one per core")
+    options = parser.parse_args(argv)
+
+    settings = dict(load_config().get("server", {}))
+    for key in ("host", "port", "workers"):
+        if getattr(options, key) is not None:
+            settings[key] = getattr(options, key)
+    return serve(settings)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,133 @@
+import asyncio
+from collections import deque
+from contextlib import asynccontextmanager
+
+from app.utils.config_loader import load_config
+from app.utils.error_handler import OverloadedError
+from app.utils.logger import logger
+from app.utils.metrics import metrics
+
+WARM = "warm"
+COLD = "cold"
+
+
+class AdmissionController:
+    """
+    Caps the requests doing work at once and queues a bounded number behind them.
+
+    Warm requests (answerable from cached data) are admitted ahead of cold ones that need
+    upstream calls, and cold requests get at most `max_cold_in_flight` of the slots so a
+    burst of them can't starve cheap warm traffic. When the queue is full a warm arrival
+    displaces the newest queued cold request. Requests that can't be queued, or wait
+    longer than the queue deadline, are rejected straight away with OverloadedError so
+    clients can back off.
+    """
+
+    def __init__(
+        self,
+        max_in_flight: int = 32,
+        max_cold_in_flight: int = 8,
+        max_queue: int = 128,
+        queue_timeout_seconds: float = 2.0,
+        retry_after_seconds: float = 1.0,
+        enabled: bool = True,
+    ):
+        self.max_in_flight = max_in_flight
+        self.max_cold_in_flight = max_cold_in_flight
+        self.max_queue = max_queue
+        self.queue_timeout_seconds = queue_timeout_seconds
+        self.retry_after_seconds = retry_after_seconds
+        self.enabled = enabled
+        self.running = {WARM: 0, COLD: 0}
+        self._waiters = {WARM: deque(), COLD: deque()}
+
+    @property
+    def in_flight(self) -> int:
+        return self.running[WARM] + self.running[COLD]
+
+    @property
+    def queued(self) -> int:
+        return len(self._waiters[WARM]) + len(self._waiters[COLD])
+
+    @asynccontextmanager
+    async def admit(self, priority: str = COLD):
+        if not self.enabled:
+            yield
+            return
+        await self._acquire(priority)
+        try:
+            yield
+        finally:
+            self._release(priority)
+
+    def _has_slot(self, priority: str) -> bool:
+        if self.in_flight >= self.max_in_flight:
+            return False
+        return priority == WARM or self.running[COLD] < self.max_cold_in_flight
+
+    def _reject(self, reason: str) -> OverloadedError:
+        metrics.increment("admission_rejected")
+        logger.warning(f"Shedding /traintimes request: {reason}")
+        return OverloadedError(
+            "Service is busy, try again shortly", retry_after=self.retry_after_seconds
+        )
+
+    async def _acquire(self, priority: str):
+        ahead = self._waiters[WARM] if priority == WARM else self.queued
+        if not ahead and self._has_slot(priority):
+            self.running[priority] += 1
+            return
+
+        if self.queued >= self.max_queue:
+            if priority == WARM and self._waiters[COLD]:
+                displaced = self._waiters[COLD].pop()
+                displaced.set_exception(self._reject("displaced by a warm request"))
+            else:
+                raise self._reject("queue full")
+
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters[priority].append(waiter)
+        metrics.increment("admission_queued")
+        try:
+            await asyncio.wait({waiter}, timeout=self.queue_timeout_seconds)
+        except asyncio.CancelledError:
+            self._abandon(waiter, priority)
+            raise
+        if not waiter.done():
+            self._abandon(waiter, priority)
+            raise self._reject("queue deadline passed")
+        # Raises if the request was displaced while queued
+        waiter.result()
+
+    def _abandon(self, waiter: asyncio.Future, priority: str):
+        if waiter.done() and not waiter.cancelled() and waiter.exception() is None:
+            # The slot was handed over just as we gave up, pass it on
+            self._release(priority)
+            return
+        try:
+            self._waiters[priority].remove(waiter)
+        except ValueError:
+            pass
+        waiter.cancel()
+
+    def _release(self, priority: str):
+        self.running[priority] -= 1
+        # Hand free slots to waiters, warm first
+        for waiting in (WARM, COLD):
+            waiters = self._waiters[waiting]
+            while waiters and self._has_slot(waiting):
+                waiter = waiters.popleft()
+                if not waiter.done():
+                    self.running[waiting] += 1
+                    waiter.set_result(None)
+
+
+admission_config = load_config().get("admission", {})
+admission_controller = AdmissionController(
+    max_in_flight=admission_config.get("max_in_flight", 32),
+    max_cold_in_flight=admission_config.get("max_cold_in_flight", 8),
+    max_queue=admission_config.get("max_queue", 128),
+    queue_timeout_seconds=admission_config.get("queue_timeout_seconds", 2.0),
+    retry_after_seconds=admission_config.get("retry_after_seconds", 1.0),
+    enabled=admission_config.get("enabled", True),
+)
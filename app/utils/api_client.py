@@ -1,8 +1,175 @@
+import asyncio
+import time
+from typing import Optional
+
 import httpx
 
+from app.utils.config_loader import load_config
+from app.utils.error_handler import UpstreamUnavailableError
+from app.utils.logger import logger
+from app.utils.metrics import metrics
+from app.utils.resilience import CircuitBreaker, LatencyTracker, backoff_delay
 
-async def fetch_data(url: str, params: dict = None):
-    async with httpx.AsyncClient() as client:
-        response = await client.get(url, params=params)
+RETRY_STATUS_CODES = {429, 500, 502, 503, 504}
+
+
+class RetryableStatusError(httpx.HTTPStatusError):
+    """A status the upstream may not return on a second try (5xx, 429)."""
+
+    @property
+    def retry_after(self) -> Optional[float]:
+        try:
+            return float(self.response.headers.get("Retry-After"))
+        except (TypeError, ValueError):
+            return None
+
+
+RETRYABLE_ERRORS = (httpx.TransportError, RetryableStatusError)
+
+
+class UpstreamClient:
+    """
+    GETs JSON from the upstream with adaptive per-attempt timeouts, bounded retries with
+    jittered backoff, optional hedging of slow attempts and a circuit breaker.
+    Only used for idempotent GETs, so retrying and hedging are safe.
+    """
+
+    def __init__(
+        self,
+        max_attempts: int = 3,
+        backoff_base_seconds: float = 0.2,
+        backoff_max_seconds: float = 2.0,
+        timeout_min_seconds: float = 2.0,
+        timeout_max_seconds: float = 15.0,
+        hedge_enabled: bool = False,
+        hedge_min_delay_seconds: float = 1.0,
+        breaker: Optional[CircuitBreaker] = None,
+    ):
+        self.max_attempts = max_attempts
+        self.backoff_base_seconds = backoff_base_seconds
+        self.backoff_max_seconds = backoff_max_seconds
+        self.hedge_enabled = hedge_enabled
+        self.hedge_min_delay_seconds = hedge_min_delay_seconds
+        self.latency = LatencyTracker(timeout_min_seconds, timeout_max_seconds)
+        self.breaker = breaker or CircuitBreaker()
+
+    async def get_json(self, url: str, params: dict = None):
+        if not self.breaker.allow():
+            metrics.increment("upstream_short_circuit")
+            raise UpstreamUnavailableError(
+                "Train times API is unavailable, try again shortly",
+                retry_after=self.breaker.retry_after(),
+            )
+
+        try:
+            data = await self._get_with_retries(url, params)
+        except RETRYABLE_ERRORS as e:
+            self.breaker.record_failure()
+            raise UpstreamUnavailableError(
+                f"Train times API failed after {self.max_attempts} attempts: {e!r}",
+                retry_after=self.breaker.retry_after(),
+            ) from e
+        except httpx.HTTPStatusError:
+            # A 4xx means the upstream is up and answering, just not to this request
+            self.breaker.record_success()
+            raise
+        except Exception:
+            # e.g. a body that isn't JSON
+            self.breaker.record_failure()
+            raise
+        except BaseException:
+            # Cancelled: no verdict on the upstream, but a half-open trial must not keep
+            # its slot, or every later call would fail fast
+            self.breaker.release()
+            raise
+        self.breaker.record_success()
+        return data
+
+    async def _get_with_retries(self, url: str, params: dict):
+        """The JSON of the first attempt that succeeds, or the last attempt's error."""
+        async with httpx.AsyncClient() as client:
+            for attempt in range(1, self.max_attempts + 1):
+                try:
+                    return await self._attempt(client, url, params)
+                except RETRYABLE_ERRORS as e:
+                    if attempt == self.max_attempts:
+                        raise
+                    delay = backoff_delay(
+                        attempt,
+                        self.backoff_base_seconds,
+                        self.backoff_max_seconds,
+                        getattr(e, "retry_after", None),
+                    )
+                    logger.warning(
+                        f"Upstream attempt {attempt} failed ({e!r}), retrying in {delay:.2f}s"
+                    )
+                    metrics.increment("upstream_retry")
+                    await asyncio.sleep(delay)
+
+    async def _attempt(self, client: httpx.AsyncClient, url: str, params: dict):
+        if not self.hedge_enabled:
+            return await self._get(client, url, params)
+
+        first = asyncio.create_task(self._get(client, url, params))
+        try:
+            done, _ = await asyncio.wait(
+                {first}, timeout=self.latency.hedge_delay(self.hedge_min_delay_seconds)
+            )
+        except asyncio.CancelledError:
+            # The caller gave up, don't leave the request running on its own
+            first.cancel()
+            raise
+        if done:
+            return first.result()
+
+        metrics.increment("upstream_hedge")
+        pending = {first, asyncio.create_task(self._get(client, url, params))}
+        error = None
+        try:
+            while pending:
+                done, pending = await asyncio.wait(
+                    pending, return_when=asyncio.FIRST_COMPLETED
+                )
+                for task in done:
+                    if task.exception() is None:
+                        return task.result()
+                    error = task.exception()
+            raise error
+        finally:
+            for task in pending:
+                task.cancel()
+
+    async def _get(self, client: httpx.AsyncClient, url: str, params: dict):
+        started = time.monotonic()
+        response = await client.get(url, params=params, timeout=self.latency.timeout())
+        if response.status_code in RETRY_STATUS_CODES:
+            raise RetryableStatusError(
+                f"Upstream returned {response.status_code}",
+                request=response.request,
+                response=response,
+            )
         response.raise_for_status()
+        self.latency.observe(time.monotonic() - started)
         return response.json()
+
+
+resilience_config = (
+    load_config()["connectors"]["train_times_api"].get("resilience", {})
+)
+upstream_client = UpstreamClient(
+    max_attempts=resilience_config.get("max_attempts", 3),
+    backoff_base_seconds=resilience_config.get("backoff_base_seconds", 0.2),
+    backoff_max_seconds=resilience_config.get("backoff_max_seconds", 2.0),
+    timeout_min_seconds=resilience_config.get("timeout_min_seconds", 2.0),
+    timeout_max_seconds=resilience_config.get("timeout_max_seconds", 15.0),
+    hedge_enabled=resilience_config.get("hedge_enabled", False),
+    hedge_min_delay_seconds=resilience_config.get("hedge_min_delay_seconds", 1.0),
+    breaker=CircuitBreaker(
+        failure_threshold=resilience_config.get("breaker_failure_threshold", 5),
+        reset_timeout_seconds=resilience_config.get("breaker_reset_seconds", 30),
+    ),
+)
+
+
+async def fetch_data(url: str, params: dict = None):
+    return await upstream_client.get_json(url, params=params)
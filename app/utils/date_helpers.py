@@ -1,4 +1,5 @@
 from datetime import datetime, timedelta
+from typing import Optional
 from zoneinfo import ZoneInfo
 
 
@@ -25,6 +26,25 @@ def format_datetime_ISO8601(
     return start_time.isoformat()
 
 
+def format_offset(duration: timedelta) -> str:
+    """
+    Formats a non-negative duration as a TransportAPI offset, PTHH:MM:SS, capped at
+    PT23:59:59 which is the longest offset the API accepts.
+    """
+    seconds = min(max(int(duration.total_seconds()), 0), 24 * 60 * 60 - 1)
+    return f"PT{seconds // 3600:02d}:{seconds % 3600 // 60:02d}:{seconds % 60:02d}"
+
+
+def format_datetime_seconds(value: datetime) -> str:
+    """
+    Formats as YYYY-MM-DD HH:MM:SS, ignoring any timezone. Same output as strftime but
+    around 3x faster, which matters on the response path.
+    """
+    if value.tzinfo is not None:
+        value = value.replace(tzinfo=None)
+    return value.isoformat(" ", "seconds")
+
+
 def parse_time_with_date(base_date: str, time_str: str) -> datetime:
     """Convert 'HH:MM' train times to full datetime objects."""
     try:
@@ -34,6 +54,19 @@ def parse_time_with_date(base_date: str, time_str: str) -> datetime:
         return None
 
 
+def parse_minutes_of_day(time_str: str) -> Optional[int]:
+    """Minutes since midnight for an 'HH:MM' train time, or None if it isn't one."""
+    if not time_str or len(time_str) != 5 or time_str[2] != ":":
+        return None
+    hours, minutes = time_str[:2], time_str[3:]
+    if not (hours.isdigit() and minutes.isdigit()):
+        return None
+    hours, minutes = int(hours), int(minutes)
+    if hours > 23 or minutes > 59:
+        return None
+    return hours * 60 + minutes
+
+
 def adjust_arrival_date(departure_time: datetime, arrival_time: datetime) -> datetime:
     """
     Adjust arrival time to the correct day based on the departure time.
@@ -44,3 +77,16 @@ def adjust_arrival_date(departure_time: datetime, arrival_time: datetime) -> dat
     if arrival_time and arrival_time > departure_time:
         return arrival_time - timedelta(days=1)
     return arrival_time
+
+
+EPOCH = datetime(1970, 1, 1)
+
+
+def to_epoch_minutes(value: datetime) -> int:
+    """Whole minutes since 1970-01-01 for a naive (local wall clock) datetime."""
+    return int((value.replace(tzinfo=None) - EPOCH).total_seconds()) // 60
+
+
+def from_epoch_minutes(minutes: int) -> datetime:
+    """Inverse of to_epoch_minutes."""
+    return EPOCH + timedelta(minutes=minutes)
@@ -1,6 +1,7 @@
+import math
 import traceback
 from fastapi import HTTPException, Request
-from fastapi.responses import JSONResponse
+from fastapi.responses import ORJSONResponse
 from pydantic import ValidationError
 
 from app.utils.logger import logger
@@ -12,9 +13,29 @@ class TrainServiceError(Exception):
         self.status_code = status_code
 
 
+class UpstreamUnavailableError(TrainServiceError):
+    """TransportAPI is down or failing; the circuit is open or retries ran out."""
+
+    def __init__(self, message: str, retry_after: float = 0.0):
+        super().__init__(message, status_code=503)
+        self.retry_after = retry_after
+
+
+class OverloadedError(TrainServiceError):
+    """The request was shed by admission control because the service is saturated."""
+
+    def __init__(self, message: str, retry_after: float = 1.0):
+        super().__init__(message, status_code=503)
+        self.retry_after = retry_after
+
+
 async def http_exception_handler(request: Request, exc: HTTPException):
     logger.error(f"HTTP error: {exc.detail}")
-    return JSONResponse(status_code=exc.status_code, content={"message": exc.detail})
+    return ORJSONResponse(
+        status_code=exc.status_code,
+        content={"message": exc.detail},
+        headers=getattr(exc, "headers", None),
+    )
 
 
 async def pydantic_validation_error_handler(request: Request, exc: ValidationError):
@@ -30,7 +51,7 @@ async def pydantic_validation_error_handler(request: Request, exc: ValidationErr
 
     logger.error(f"Validation error details: {error_details}")
 
-    return JSONResponse(
+    return ORJSONResponse(
         status_code=400, content={"message": "Validation error, check logs for details"}
     )
 
@@ -40,7 +61,7 @@ async def general_exception_handler(request: Request, exc: Exception):
         traceback.format_exception(type(exc), exc, exc.__traceback__)
     )
     logger.error(f"Unexpected error: {error_message}")
-    return JSONResponse(
+    return ORJSONResponse(
         status_code=500,
         content={"message": "An unexpected error occurred. Please try again later."},
     )
@@ -48,4 +69,10 @@ async def general_exception_handler(request: Request, exc: Exception):
 
 async def train_service_error(request: Request, exc: TrainServiceError):
     logger.error(f"Train Service Error: {exc.message}")
-    return JSONResponse(status_code=exc.status_code, content={"message": exc.message})
+    headers = None
+    retry_after = getattr(exc, "retry_after", None)
+    if retry_after is not None:
+        headers = {"Retry-After": str(max(1, math.ceil(retry_after)))}
+    return ORJSONResponse(
+        status_code=exc.status_code, content={"message": exc.message}, headers=headers
+    )
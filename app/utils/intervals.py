@@ -0,0 +1,62 @@
+from bisect import bisect_left, bisect_right
+from typing import Iterable, Iterator, List, Tuple
+
+
+class IntervalSet:
+    """
+    Disjoint half-open [start, end) intervals kept sorted in two parallel lists, so
+    adding, checking coverage and finding the uncovered parts of a range are a bisect
+    plus a walk over the intervals that overlap it. Touching intervals are merged.
+    Works with anything ordered, in practice datetimes.
+    """
+
+    __slots__ = ("starts", "ends")
+
+    def __init__(self, intervals: Iterable[Tuple] = ()):
+        self.starts: list = []
+        self.ends: list = []
+        for start, end in intervals:
+            self.add(start, end)
+
+    def add(self, start, end):
+        if not start < end:
+            return
+        # Every interval that overlaps or touches [start, end) is folded into one
+        first = bisect_left(self.ends, start)
+        last = bisect_right(self.starts, end)
+        if first < last:
+            start = min(start, self.starts[first])
+            end = max(end, self.ends[last - 1])
+        self.starts[first:last] = [start]
+        self.ends[first:last] = [end]
+
+    def gaps(self, start, end) -> List[Tuple]:
+        """The parts of [start, end) no interval covers, in order."""
+        gaps = []
+        cursor = start
+        index = bisect_right(self.ends, start)
+        while cursor < end and index < len(self.starts):
+            if self.starts[index] >= end:
+                break
+            if self.starts[index] > cursor:
+                gaps.append((cursor, self.starts[index]))
+            cursor = max(cursor, self.ends[index])
+            index += 1
+        if cursor < end:
+            gaps.append((cursor, end))
+        return gaps
+
+    def covers(self, start, end) -> bool:
+        return not self.gaps(start, end)
+
+    def discard_before(self, point):
+        """Drop intervals that end at or before `point`."""
+        index = bisect_right(self.ends, point)
+        del self.starts[:index]
+        del self.ends[:index]
+
+    def __iter__(self) -> Iterator[Tuple]:
+        return zip(self.starts, self.ends)
+
+    def __len__(self) -> int:
+        return len(self.starts)
@@ -0,0 +1,64 @@
+import threading
+import time
+from collections import Counter
+from typing import List, Tuple
+
+
+class Metrics:
+    """In-process counters (cache hits, upstream calls etc.) for diagnostics and load tests."""
+
+    def __init__(self):
+        self._counters = Counter()
+        self._lock = threading.Lock()
+
+    def increment(self, name: str, amount: int = 1):
+        with self._lock:
+            self._counters[name] += amount
+
+    def get(self, name: str) -> int:
+        return self._counters[name]
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return dict(self._counters)
+
+    def reset(self):
+        with self._lock:
+            self._counters.clear()
+
+
+metrics = Metrics()
+
+
+class RouteHistory:
+    """
+    Request counts per (origin, destination) leg, decayed so that recent traffic
+    dominates. Used by the cache warmer to find the hottest routes.
+    """
+
+    def __init__(self, half_life_seconds: float = 6 * 60 * 60):
+        self.half_life_seconds = half_life_seconds
+        self._scores = {}
+        self._lock = threading.Lock()
+
+    def _decayed(self, score: float, updated: float, now: float) -> float:
+        return score * 0.5 ** ((now - updated) / self.half_life_seconds)
+
+    def record(self, origin_station_code: str, destination_station_code: str):
+        now = time.monotonic()
+        key = (origin_station_code, destination_station_code)
+        with self._lock:
+            score, updated = self._scores.get(key, (0.0, now))
+            self._scores[key] = (self._decayed(score, updated, now) + 1, now)
+
+    def top(self, limit: int) -> List[Tuple[Tuple[str, str], float]]:
+        now = time.monotonic()
+        with self._lock:
+            scores = [
+                (key, self._decayed(score, updated, now))
+                for key, (score, updated) in self._scores.items()
+            ]
+        return sorted(scores, key=lambda item: item[1], reverse=True)[:limit]
+
+
+route_history = RouteHistory()
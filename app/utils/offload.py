@@ -0,0 +1,101 @@
+import asyncio
+import importlib
+import multiprocessing
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Callable, Iterable, Optional, TypeVar
+
+from app.utils.config_loader import load_config
+from app.utils.logger import logger
+from app.utils.metrics import metrics
+
+INLINE = "inline"
+THREAD = "thread"
+PROCESS = "process"
+
+T = TypeVar("T")
+
+
+class Offloader:
+    """
+    Runs CPU-heavy work, such as mapping a large API response, off the event loop.
+
+    Work smaller than `min_size` runs inline, since handing it to a pool costs more than
+    doing it. Larger work goes to a thread pool, where the loop still gets a turn every
+    GIL switch interval, or a process pool, where it runs in parallel and the loop is only
+    busy pickling the argument and the result. Functions sent to the process pool must be
+    importable top-level functions whose arguments and results pickle cheaply.
+    """
+
+    def __init__(
+        self,
+        mode: str = INLINE,
+        max_workers: int = 2,
+        min_size: int = 200,
+        preload_modules: Iterable[str] = (),
+    ):
+        if mode not in (INLINE, THREAD, PROCESS):
+            raise ValueError(f"Unknown offload mode: {mode}")
+        self.mode = mode
+        self.max_workers = max_workers
+        self.min_size = min_size
+        # Imported when each worker process starts, instead of on its first task
+        self.preload_modules = tuple(preload_modules)
+        self._executor: Optional[Executor] = None
+
+    def _get_executor(self) -> Executor:
+        if self._executor is None:
+            if self.mode == PROCESS:
+                # Spawned rather than forked, so workers don't inherit the loop, sockets or threads
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.max_workers,
+                    mp_context=multiprocessing.get_context("spawn"),
+                    initializer=_preload,
+                    initargs=(self.preload_modules,),
+                )
+            else:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=self.max_workers, thread_name_prefix="offload"
+                )
+        return self._executor
+
+    async def run(self, func: Callable[..., T], *args, size: int = 0) -> T:
+        """func(*args), in the pool when `size` (e.g. departures in the response) is large enough."""
+        if self.mode == INLINE or size < self.min_size:
+            return func(*args)
+        metrics.increment("offloaded")
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._get_executor(), func, *args)
+
+    async def start(self):
+        """Start the pool's workers ahead of traffic, so the first large response doesn't pay for it."""
+        if self.mode == INLINE:
+            return
+        loop = asyncio.get_running_loop()
+        executor = self._get_executor()
+        await asyncio.gather(
+            *(loop.run_in_executor(executor, _noop) for _ in range(self.max_workers))
+        )
+        logger.info(f"Offload {self.mode} pool ready with {self.max_workers} workers")
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+
+def _noop():
+    return None
+
+
+def _preload(modules):
+    for module in modules:
+        importlib.import_module(module)
+
+
+offload_config = load_config().get("offload", {})
+offloader = Offloader(
+    mode=offload_config.get("mode", INLINE),
+    max_workers=offload_config.get("max_workers", 2),
+    min_size=offload_config.get("min_departures", 200),
+    preload_modules=["app.connectors.train_api.train_api_connector"],
+)
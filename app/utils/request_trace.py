@@ -0,0 +1,33 @@
+import json
+import threading
+import time
+from typing import Optional
+
+from pydantic import BaseModel
+
+from app.utils.config_loader import load_config
+from app.utils.logger import logger
+
+
+class RequestTraceWriter:
+    """
+    Appends incoming requests to a JSONL trace ({"ts": epoch_seconds, "request": {...}})
+    which benchmarks/loadgen.py can replay. Disabled when no path is configured.
+    """
+
+    def __init__(self, path: Optional[str]):
+        self.path = path
+        self._lock = threading.Lock()
+
+    def record(self, request: BaseModel):
+        if not self.path:
+            return
+        line = json.dumps({"ts": time.time(), "request": request.model_dump()})
+        try:
+            with self._lock, open(self.path, "a", encoding="utf-8") as file:
+                file.write(line + "\n")
+        except OSError as e:
+            logger.error(f"Failed to write request trace: {e}")
+
+
+trace_writer = RequestTraceWriter(load_config()["app"].get("request_trace_path"))
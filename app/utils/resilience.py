@@ -0,0 +1,123 @@
+import random
+import threading
+import time
+from typing import Optional
+
+
+class LatencyTracker:
+    """
+    Smoothed upstream latency and its variation, estimated the way TCP estimates round
+    trip time. Drives per-attempt timeouts and the hedge delay so they follow what the
+    upstream is actually doing rather than a fixed guess.
+    """
+
+    def __init__(self, min_timeout_seconds: float, max_timeout_seconds: float):
+        self.min_timeout_seconds = min_timeout_seconds
+        self.max_timeout_seconds = max_timeout_seconds
+        self.smoothed: Optional[float] = None
+        self.variation = 0.0
+
+    def observe(self, seconds: float):
+        if self.smoothed is None:
+            self.smoothed = seconds
+            self.variation = seconds / 2
+        else:
+            self.variation = 0.75 * self.variation + 0.25 * abs(self.smoothed - seconds)
+            self.smoothed = 0.875 * self.smoothed + 0.125 * seconds
+
+    def timeout(self) -> float:
+        """Per-attempt timeout: the max until there are samples, then smoothed + 4 x variation."""
+        if self.smoothed is None:
+            return self.max_timeout_seconds
+        estimate = self.smoothed + 4 * self.variation
+        return min(max(estimate, self.min_timeout_seconds), self.max_timeout_seconds)
+
+    def hedge_delay(self, min_delay_seconds: float) -> float:
+        """How long to wait on an attempt before racing a second copy of it."""
+        if self.smoothed is None:
+            return max(min_delay_seconds, self.max_timeout_seconds / 2)
+        return max(min_delay_seconds, self.smoothed + 2 * self.variation)
+
+
+def backoff_delay(
+    attempt: int, base_seconds: float, max_seconds: float, retry_after: Optional[float] = None
+) -> float:
+    """
+    Exponential backoff with full jitter for the given (1-based) failed attempt, so
+    workers retrying the same outage spread out. A Retry-After hint is honoured up to
+    max_seconds.
+    """
+    # Jitter only spreads retries out, it doesn't need to be unpredictable
+    delay = random.uniform(0, min(max_seconds, base_seconds * 2 ** (attempt - 1)))  # noqa: S311
+    if retry_after is not None:
+        delay = max(delay, min(retry_after, max_seconds))
+    return delay
+
+
+class CircuitBreaker:
+    """
+    Stops calling an upstream after `failure_threshold` consecutive failures. While open
+    calls fail fast; after `reset_timeout_seconds` one trial call is let through and its
+    result closes the circuit again or re-opens it.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(
+        self,
+        failure_threshold: int = 5,
+        reset_timeout_seconds: float = 30,
+        clock=time.monotonic,
+    ):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout_seconds = reset_timeout_seconds
+        self.clock = clock
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self._trial_in_flight = False
+        self._lock = threading.Lock()
+
+    def allow(self) -> bool:
+        with self._lock:
+            if self.state == self.CLOSED:
+                return True
+            if self.state == self.OPEN:
+                if self.clock() - self.opened_at < self.reset_timeout_seconds:
+                    return False
+                self.state = self.HALF_OPEN
+                self._trial_in_flight = False
+            if self._trial_in_flight:
+                return False
+            self._trial_in_flight = True
+            return True
+
+    def retry_after(self) -> float:
+        """Seconds until the next trial call would be allowed."""
+        if self.state != self.OPEN:
+            return 0.0
+        return max(0.0, self.opened_at + self.reset_timeout_seconds - self.clock())
+
+    def record_success(self):
+        with self._lock:
+            self.state = self.CLOSED
+            self.failures = 0
+            self._trial_in_flight = False
+
+    def release(self):
+        """
+        Give back a trial call that ended without saying anything about the upstream, e.g.
+        because it was cancelled, so the next call can be the trial instead.
+        """
+        with self._lock:
+            self._trial_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            self._trial_in_flight = False
+            if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+                self.state = self.OPEN
+                self.opened_at = self.clock()
@@ -0,0 +1,101 @@
+import asyncio
+import traceback
+from typing import AsyncIterator, Optional
+
+import orjson
+from fastapi import Request
+from fastapi.responses import ORJSONResponse, StreamingResponse
+from pydantic import BaseModel
+
+from app.utils.error_handler import TrainServiceError
+from app.utils.logger import logger
+from app.utils.metrics import metrics
+
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+
+
+def json_response(
+    content, status_code: int = 200, headers: Optional[dict] = None
+) -> ORJSONResponse:
+    """
+    Render a result straight to an ORJSONResponse. Returning a Response from a route skips
+    FastAPI's re-validation against response_model, which is redundant when the service
+    already returns the typed model.
+    """
+    if isinstance(content, BaseModel):
+        content = content.model_dump()
+    return ORJSONResponse(content=content, status_code=status_code, headers=headers)
+
+
+def ndjson_response(
+    events: AsyncIterator,
+    request: Request,
+    on_close=None,
+    headers: Optional[dict] = None,
+) -> StreamingResponse:
+    """
+    Stream `events` as newline-delimited JSON, each line written as soon as it is produced.
+    The status is sent with the first line, so an error part way through ends the stream
+    with an {"type": "error"} line instead. If the client disconnects, the event being
+    worked on is cancelled, so the work behind it stops rather than running for nobody.
+    `on_close` is awaited once the stream ends, however it ends.
+    """
+    return StreamingResponse(
+        _ndjson_lines(events, request, on_close),
+        media_type=NDJSON_MEDIA_TYPE,
+        headers=headers,
+    )
+
+
+async def _ndjson_lines(events: AsyncIterator, request: Request, on_close=None):
+    disconnected = asyncio.ensure_future(_wait_for_disconnect(request))
+    step = None
+    try:
+        while True:
+            step = asyncio.ensure_future(anext(events))
+            await asyncio.wait((step, disconnected), return_when=asyncio.FIRST_COMPLETED)
+            if not step.done():
+                logger.info("Client disconnected, stream cancelled")
+                metrics.increment("stream_cancelled")
+                return
+            try:
+                event = step.result()
+            except StopAsyncIteration:
+                return
+            except TrainServiceError as e:
+                logger.error(f"Train Service Error while streaming: {e.message}")
+                yield _ndjson_line(
+                    {"type": "error", "status_code": e.status_code, "message": e.message}
+                )
+                return
+            except Exception as e:
+                error_message = "".join(traceback.format_exception(type(e), e, e.__traceback__))
+                logger.error(f"Unexpected error while streaming: {error_message}")
+                yield _ndjson_line(
+                    {
+                        "type": "error",
+                        "status_code": 500,
+                        "message": "An unexpected error occurred. Please try again later.",
+                    }
+                )
+                return
+            yield _ndjson_line(event)
+    finally:
+        disconnected.cancel()
+        if step is not None and not step.done():
+            step.cancel()
+            # Let the cancellation reach the work behind the event before the stream ends
+            await asyncio.wait((step,))
+        if on_close is not None:
+            await on_close()
+
+
+def _ndjson_line(event) -> bytes:
+    if isinstance(event, BaseModel):
+        event = event.model_dump()
+    return orjson.dumps(event) + b"\n"
+
+
+async def _wait_for_disconnect(request: Request):
+    while (await request.receive())["type"] != "http.disconnect":
+        pass
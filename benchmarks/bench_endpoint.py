@@ -0,0 +1,114 @@
+"""End-to-end POST /traintimes through ASGITransport with the upstream stubbed."""
+
+import asyncio
+from datetime import datetime, timedelta
+from typing import List
+from unittest.mock import patch
+
+from httpx import ASGITransport, AsyncClient
+
+from app.feature.train_times.response_cache import response_cache
+from app.feature.train_times.routes import get_train_time_service
+from app.feature.train_times.services import TrainTimeService, interval_coverage_config
+from app.main import app
+from benchmarks.common import measure_async, summarise, temp_database
+from benchmarks.upstream_stub import UpstreamStub
+
+STATION_CODES = ["LBG", "DFD", "LUT"]
+FIRST_DAY = datetime(2024, 9, 2, 7, 30)
+
+
+def _payload(start: datetime) -> dict:
+    return {
+        "station_codes": STATION_CODES,
+        "start_time": start.strftime("%Y-%m-%d %H:%M"),
+        "max_wait_time": 60,
+    }
+
+
+async def _run(options) -> List[dict]:
+    stub = UpstreamStub(departures=options.stub_departures)
+    results = []
+
+    # Whole cached days, so the warm suites and the ETag below are measured the same way
+    # whatever interval_coverage is set to
+    with temp_database() as db, stub.patch(), patch.dict(interval_coverage_config, {"enabled": False}):
+        app.dependency_overrides[get_train_time_service] = lambda: TrainTimeService(db)
+        try:
+            transport = ASGITransport(app=app)
+            async with AsyncClient(transport=transport, base_url="http://bench") as client:
+                day = iter(range(10_000))
+
+                async def cold_request():
+                    start = FIRST_DAY + timedelta(days=next(day))
+                    response = await client.post("/traintimes", json=_payload(start))
+                    response.raise_for_status()
+
+                samples = await measure_async(cold_request, options.iterations)
+                results.append(
+                    summarise(
+                        "endpoint.traintimes_cold",
+                        samples,
+                        {"legs": len(STATION_CODES) - 1, "departures": stub.departures},
+                        upstream_calls=stub.calls,
+                    )
+                )
+
+                warm_payload = _payload(FIRST_DAY)
+
+                async def warm_request():
+                    response = await client.post("/traintimes", json=warm_payload)
+                    response.raise_for_status()
+
+                samples = await measure_async(warm_request, options.iterations * 10)
+                results.append(
+                    summarise(
+                        "endpoint.traintimes_warm",
+                        samples,
+                        {"legs": len(STATION_CODES) - 1},
+                    )
+                )
+
+                # Same cached day but a new start minute each time, so the response
+                # cache misses and every leg is looked up again
+                minute = iter(range(10_000))
+
+                async def warm_uncached_request():
+                    start = FIRST_DAY + timedelta(minutes=next(minute) % 600)
+                    response = await client.post("/traintimes", json=_payload(start))
+                    response.raise_for_status()
+
+                response_cache.clear()
+                samples = await measure_async(warm_uncached_request, options.iterations * 10)
+                results.append(
+                    summarise(
+                        "endpoint.traintimes_warm_uncached",
+                        samples,
+                        {"legs": len(STATION_CODES) - 1},
+                    )
+                )
+
+                etag = (await client.post("/traintimes", json=warm_payload)).headers["ETag"]
+
+                async def not_modified_request():
+                    response = await client.post(
+                        "/traintimes", json=warm_payload, headers={"If-None-Match": etag}
+                    )
+                    assert response.status_code == 304
+
+                samples = await measure_async(not_modified_request, options.iterations * 10)
+                results.append(
+                    summarise(
+                        "endpoint.traintimes_not_modified",
+                        samples,
+                        {"legs": len(STATION_CODES) - 1},
+                    )
+                )
+        finally:
+            app.dependency_overrides.pop(get_train_time_service, None)
+
+    return results
+
+
+def run(options) -> List[dict]:
+    return asyncio.run(_run(options))
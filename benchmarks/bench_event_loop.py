@@ -0,0 +1,83 @@
+"""
+Event loop lag while large responses are mapped, inline and offloaded to each pool type.
+
+A probe coroutine sleeps 5 ms in a loop and records how late it wakes, which is the
+delay every other request on the worker would see, while concurrent cold fetches map
+full 1000-departure boards.
+"""
+
+import asyncio
+import time
+from datetime import datetime
+from typing import List
+from unittest.mock import patch
+
+from app.connectors.train_api.train_api_connector import fetch_train_times
+from app.utils.offload import INLINE, PROCESS, THREAD, Offloader
+from benchmarks.common import summarise
+from benchmarks.upstream_stub import FETCH_DATA_TARGET, build_station_timetable
+
+OFFLOADER_TARGET = "app.connectors.train_api.train_api_connector.offloader"
+PROBE_INTERVAL = 0.005
+BOARD_DEPARTURES = 1000
+
+
+async def _probe(lags: List[float], stop: asyncio.Event):
+    while not stop.is_set():
+        started = time.perf_counter()
+        await asyncio.sleep(PROBE_INTERVAL)
+        lags.append(time.perf_counter() - started - PROBE_INTERVAL)
+
+
+async def _mixed_traffic(mode: str, cold_requests: int, concurrency: int):
+    # Built once up front so only the mapping runs during the measurement
+    board = build_station_timetable("LBG", "DFD", "2024-08-04", departures=BOARD_DEPARTURES)
+
+    async def fetch_data(url, params=None):
+        return board
+
+    offloader = Offloader(
+        mode=mode, max_workers=2, min_size=200, preload_modules=[fetch_train_times.__module__]
+    )
+    await offloader.start()
+    lags, durations = [], []
+    limit = asyncio.Semaphore(concurrency)
+
+    async def cold_request():
+        async with limit:
+            started = time.perf_counter()
+            await fetch_train_times("LBG", "DFD", datetime(2024, 8, 4, 9, 0))
+            durations.append(time.perf_counter() - started)
+
+    try:
+        with patch(FETCH_DATA_TARGET, new=fetch_data), patch(OFFLOADER_TARGET, new=offloader):
+            stop = asyncio.Event()
+            probe = asyncio.create_task(_probe(lags, stop))
+            started = time.perf_counter()
+            await asyncio.gather(*(cold_request() for _ in range(cold_requests)))
+            wall = time.perf_counter() - started
+            stop.set()
+            await probe
+    finally:
+        offloader.shutdown()
+    return lags, durations, wall
+
+
+def run(options) -> List[dict]:
+    results = []
+    cold_requests = max(options.iterations, 8)
+    for mode in (INLINE, THREAD, PROCESS):
+        lags, durations, wall = asyncio.run(
+            _mixed_traffic(mode, cold_requests, concurrency=4)
+        )
+        params = {"mode": mode, "departures": BOARD_DEPARTURES, "cold_requests": cold_requests}
+        results.append(summarise(f"event_loop.lag_{mode}", lags, params))
+        results.append(
+            summarise(
+                f"event_loop.cold_fetch_{mode}",
+                durations,
+                params,
+                cold_fetches_per_sec=cold_requests / wall,
+            )
+        )
+    return results
@@ -0,0 +1,149 @@
+"""
+Ingestion into train_schedule: the per-row ORM path, bulk executemany, the service path,
+window refreshes and what a cold request waits for with and without write-behind.
+"""
+
+import asyncio
+import time
+from datetime import datetime
+from typing import List
+from unittest.mock import patch
+
+from app.feature.train_times.models import TrainTimeRequest
+from app.feature.train_times.services import TrainTimeService, interval_coverage_config
+from app.feature.train_times.write_behind import write_behind
+from app.utils.offload import offloader
+from benchmarks.common import (
+    bulk_insert_rows,
+    summarise,
+    synthetic_schedule_rows,
+    temp_database,
+)
+from benchmarks.upstream_stub import UpstreamStub
+
+SERVICE_DAY = datetime(2024, 8, 4, 6, 0)
+
+
+def _ingest_orm_rows(size: int) -> float:
+    with temp_database() as db:
+        rows = list(synthetic_schedule_rows(size))
+        started = time.perf_counter()
+        for row in rows:
+            db.add_train_schedule(
+                row["origin_station_code"],
+                row["destination_station_code"],
+                row["origin_expected_departure_time"],
+                row["origin_expected_arrival_time"],
+                row["destination_aimed_arrival_time"],
+            )
+        return time.perf_counter() - started
+
+
+def _ingest_bulk_rows(size: int) -> float:
+    with temp_database() as db:
+        started = time.perf_counter()
+        bulk_insert_rows(db, synthetic_schedule_rows(size))
+        return time.perf_counter() - started
+
+
+def _ingest_service(departures: int) -> float:
+    stub = UpstreamStub(departures=departures)
+    with temp_database() as db, stub.patch():
+        service = TrainTimeService(db)
+        started = time.perf_counter()
+        asyncio.run(service.fetch_and_store_train_data("LBG", "DFD", SERVICE_DAY))
+        return time.perf_counter() - started
+
+
+def _refresh_window(departures: int) -> float:
+    stub = UpstreamStub(departures=departures)
+    with temp_database() as db, stub.patch():
+        service = TrainTimeService(db)
+        asyncio.run(service.fetch_and_store_train_data("LBG", "DFD", SERVICE_DAY))
+        window = (SERVICE_DAY.replace(hour=9), SERVICE_DAY.replace(hour=10, minute=30))
+        started = time.perf_counter()
+        asyncio.run(service.refresh_train_data_window("LBG", "DFD", window))
+        return time.perf_counter() - started
+
+
+def _cold_miss(departures: int, queued: bool) -> float:
+    """One uncached request end to end, storing the day before answering or after it."""
+    stub = UpstreamStub(departures=departures)
+    request = TrainTimeRequest(
+        station_codes=["LBG", "DFD"], start_time="2024-08-04 09:00", max_wait_time=30
+    )
+
+    async def answer() -> float:
+        if queued:
+            await write_behind.start()
+        try:
+            started = time.perf_counter()
+            await service.calculate_train_destination_arrival(request)
+            return time.perf_counter() - started
+        finally:
+            await write_behind.stop()
+
+    # Whole days, so the request has the full ingest to wait for or not
+    with temp_database() as db, stub.patch(), patch.dict(interval_coverage_config, {"enabled": False}):
+        service = TrainTimeService(db)
+        return asyncio.run(answer())
+
+
+def run(options) -> List[dict]:
+    results = []
+    # Large boards are mapped in the offload pool, start it outside the timings
+    asyncio.run(offloader.start())
+
+    for size in options.sizes:
+        samples = [_ingest_bulk_rows(size) for _ in range(options.ingest_repeats)]
+        results.append(
+            summarise(
+                "ingest.bulk_executemany",
+                samples,
+                {"rows": size},
+                rows_per_sec=size / min(samples),
+            )
+        )
+
+    # add_train_schedule commits once per row, so it is capped to keep runs practical
+    row_size = min(options.row_limit, min(options.sizes))
+    samples = [_ingest_orm_rows(row_size) for _ in range(options.ingest_repeats)]
+    results.append(
+        summarise(
+            "ingest.orm_add_train_schedule",
+            samples,
+            {"rows": row_size},
+            rows_per_sec=row_size / min(samples),
+        )
+    )
+
+    samples = [_ingest_service(1000) for _ in range(options.ingest_repeats)]
+    results.append(
+        summarise(
+            "ingest.fetch_and_store_train_data",
+            samples,
+            {"departures": 1000},
+            rows_per_sec=1000 / min(samples),
+        )
+    )
+
+    # What a force_cache_refresh costs once the day is cached: one 90 minute window
+    samples = [_refresh_window(1000) for _ in range(options.ingest_repeats)]
+    results.append(
+        summarise(
+            "ingest.refresh_window",
+            samples,
+            {"departures": 1000, "window_minutes": 90},
+        )
+    )
+
+    for queued in (False, True):
+        samples = [_cold_miss(1000, queued) for _ in range(options.ingest_repeats)]
+        results.append(
+            summarise(
+                "ingest.cold_miss_write_behind" if queued else "ingest.cold_miss",
+                samples,
+                {"departures": 1000},
+            )
+        )
+    return results
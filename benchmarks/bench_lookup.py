@@ -0,0 +1,84 @@
+"""get_train_schedule and departure page latency against a seeded train_schedule table."""
+
+import random
+import time
+from datetime import datetime, timedelta
+from typing import List
+
+from benchmarks.common import (
+    STATION_PAIRS,
+    bulk_insert_rows,
+    summarise,
+    synthetic_schedule_rows,
+    temp_database,
+)
+
+SEED_START = datetime(2024, 8, 1)
+PAGE_SIZE = 20
+
+
+def run(options) -> List[dict]:
+    results = []
+    rng = random.Random(11)
+
+    for size in options.sizes:
+        with temp_database() as db:
+            bulk_insert_rows(db, synthetic_schedule_rows(size, start_date=SEED_START))
+            days = max(size // (len(STATION_PAIRS) * 1000), 1)
+
+            queries = []
+            for _ in range(options.lookups):
+                origin, destination = rng.choice(STATION_PAIRS)
+                start = SEED_START + timedelta(
+                    days=rng.randrange(days), minutes=rng.randrange(0, 24 * 60)
+                )
+                queries.append((origin, destination, start, rng.choice((30, 60, 120))))
+
+            for query in queries[:10]:
+                db.get_train_schedule(*query)
+
+            samples = []
+            hits = 0
+            for query in queries:
+                started = time.perf_counter()
+                found = db.get_train_schedule(*query)
+                samples.append(time.perf_counter() - started)
+                hits += found is not None
+
+            # Every page of one pair's first day, each seeking past the last
+            origin, destination = STATION_PAIRS[0]
+            day_end = SEED_START + timedelta(days=1)
+            page_samples = []
+            after = None
+            while True:
+                started = time.perf_counter()
+                page = db.get_departures_page(
+                    origin,
+                    destination,
+                    after[0] if after else SEED_START,
+                    day_end,
+                    PAGE_SIZE,
+                    after,
+                )
+                page_samples.append(time.perf_counter() - started)
+                if len(page) < PAGE_SIZE:
+                    break
+                after = (page[-1][1], page[-1][0])
+
+        results.append(
+            summarise(
+                "lookup.departures_page",
+                page_samples,
+                {"rows": size, "page_size": PAGE_SIZE},
+                pages=len(page_samples),
+            )
+        )
+        results.append(
+            summarise(
+                "lookup.get_train_schedule",
+                samples,
+                {"rows": size},
+                hit_ratio=hits / len(queries),
+            )
+        )
+    return results
@@ -0,0 +1,41 @@
+"""map_api_response_to_model over the saved captures and a full-size synthetic board."""
+
+from typing import List
+
+from app.connectors.train_api.train_api_connector import map_api_response_to_model
+from benchmarks.common import measure, summarise
+from benchmarks.upstream_stub import build_station_timetable, iter_raw_captures
+
+
+def run(options) -> List[dict]:
+    results = []
+
+    captures = [capture for _, _, capture in iter_raw_captures()]
+    departures = sum(len(c["departures"]["all"]) for c in captures)
+
+    def map_captures():
+        for capture in captures:
+            map_api_response_to_model(capture)
+
+    samples = measure(map_captures, options.iterations)
+    results.append(
+        summarise(
+            "mapping.api_raw_data",
+            samples,
+            {"responses": len(captures), "departures": departures},
+            departures_per_sec=departures / (sum(samples) / len(samples)),
+        )
+    )
+
+    # 1000 is the TransportAPI page limit, so this is the largest single response
+    large_board = build_station_timetable("LBG", "DFD", "2024-08-04", departures=1000)
+    samples = measure(lambda: map_api_response_to_model(large_board), options.iterations)
+    results.append(
+        summarise(
+            "mapping.synthetic_board",
+            samples,
+            {"departures": 1000},
+            departures_per_sec=1000 / (sum(samples) / len(samples)),
+        )
+    )
+    return results
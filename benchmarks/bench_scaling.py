@@ -0,0 +1,227 @@
+"""
+Requests/sec of the production launcher (app.server) as workers are added.
+
+For each worker count the launcher is forked off against a throwaway database seeded with
+cached days, so every request is answered without TransportAPI (which is stubbed anyway),
+and with the response cache defeated by a new start time per request. `--clients` load
+generator processes each keep `--concurrency` requests in flight for `--duration`
+seconds. The generators share the machine with the workers, so throughput stops scaling
+before the cores run out; the curve is cleanest on a box with cores to spare for them.
+
+Usage:
+    PYTHONPATH=. python -m benchmarks.bench_scaling
+    PYTHONPATH=. python -m benchmarks.bench_scaling --workers 1,2,4,8 --duration 20
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import multiprocessing
+import os
+import random
+import signal
+import socket
+import sys
+import time
+from contextlib import ExitStack
+from datetime import datetime, timedelta, timezone
+from typing import List, Tuple
+from unittest.mock import patch
+
+import httpx
+
+from app.connectors.db.timetable_bundle import BundleDay, import_days
+from app.utils.logger import logger
+from benchmarks.common import percentile, temp_database
+from benchmarks.upstream_stub import UpstreamStub
+
+JOURNEYS = [["LBG", "DFD", "LUT"], ["SEV", "TON"], ["CHX", "SEV"], ["VIC", "BTN"]]
+FIRST_DAY = datetime(2024, 9, 2)
+DAYS = 7
+DEPARTURES_PER_HOUR = 6
+
+
+def seed_days(days: int = DAYS) -> List[BundleDay]:
+    """Whole cached days for every leg of JOURNEYS, a train every ten minutes from 05:00."""
+    fetched = datetime.now(timezone.utc).replace(tzinfo=None)
+    legs = sorted({leg for codes in JOURNEYS for leg in zip(codes, codes[1:])})
+    seeded = []
+    for origin, destination in legs:
+        for offset in range(days):
+            day = FIRST_DAY + timedelta(days=offset)
+            departures = []
+            for index in range(19 * DEPARTURES_PER_HOUR):
+                departure = day + timedelta(hours=5, minutes=index * 60 // DEPARTURES_PER_HOUR)
+                arrival = departure + timedelta(minutes=38)
+                departures.append((departure, arrival, arrival, f"S{index:05d}"))
+            seeded.append(BundleDay(origin, destination, day, fetched, departures))
+    return seeded
+
+
+def _payload(rng: random.Random) -> dict:
+    start = FIRST_DAY + timedelta(
+        days=rng.randrange(DAYS), minutes=rng.randrange(6 * 60, 20 * 60)
+    )
+    return {
+        "station_codes": rng.choice(JOURNEYS),
+        "start_time": start.strftime("%Y-%m-%d %H:%M"),
+        "max_wait_time": 60,
+    }
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def _start_server(workers: int, port: int) -> int:
+    """Fork the launcher, which inherits the patched database, and return its pid."""
+    pid = os.fork()
+    if pid == 0:
+        from app.server import serve
+
+        status = 1
+        try:
+            status = serve(
+                {"host": "127.0.0.1", "port": port, "workers": workers, "access_log": False}
+            )
+        finally:
+            os._exit(status)
+    return pid
+
+
+def _wait_until_ready(base_url: str, timeout: float = 30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            if httpx.get(f"{base_url}/", timeout=1).status_code == 200:
+                return
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.1)
+    raise RuntimeError(f"Server at {base_url} didn't come up within {timeout}s")
+
+
+def _stop_server(pid: int):
+    os.kill(pid, signal.SIGTERM)
+    os.waitpid(pid, 0)
+
+
+async def _closed_loop(base_url: str, duration: float, concurrency: int, seed: int):
+    rng = random.Random(seed)
+    latencies, errors = [], 0
+    limits = httpx.Limits(max_connections=concurrency)
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=30) as client:
+        deadline = time.perf_counter() + duration
+
+        async def user():
+            nonlocal errors
+            while time.perf_counter() < deadline:
+                started = time.perf_counter()
+                try:
+                    response = await client.post("/traintimes", json=_payload(rng))
+                    ok = response.status_code == 200
+                except httpx.HTTPError:
+                    ok = False
+                if ok:
+                    latencies.append(time.perf_counter() - started)
+                else:
+                    errors += 1
+
+        await asyncio.gather(*(user() for _ in range(concurrency)))
+    return latencies, errors
+
+
+def _client(args: Tuple[str, float, int, int]):
+    return asyncio.run(_closed_loop(*args))
+
+
+def measure(workers: int, options) -> dict:
+    port = _free_port()
+    base_url = f"http://127.0.0.1:{port}"
+    pid = _start_server(workers, port)
+    try:
+        _wait_until_ready(base_url)
+        # Let every worker finish its lifespan startup before the clock starts
+        asyncio.run(_closed_loop(base_url, options.warmup, options.concurrency, seed=0))
+        context = multiprocessing.get_context("fork")
+        started = time.perf_counter()
+        with context.Pool(options.clients) as pool:
+            results = pool.map(
+                _client,
+                [
+                    (base_url, options.duration, options.concurrency, seed)
+                    for seed in range(1, options.clients + 1)
+                ],
+            )
+        elapsed = time.perf_counter() - started
+    finally:
+        _stop_server(pid)
+
+    latencies = sorted(latency for samples, _ in results for latency in samples)
+    return {
+        "workers": workers,
+        "requests": len(latencies),
+        "errors": sum(errors for _, errors in results),
+        "elapsed_s": elapsed,
+        "throughput_rps": len(latencies) / elapsed,
+        "latency_s": {
+            "p50": percentile(latencies, 50),
+            "p95": percentile(latencies, 95),
+            "p99": percentile(latencies, 99),
+        },
+    }
+
+
+def _default_workers() -> str:
+    cores = os.cpu_count() or 1
+    counts = sorted({2**power for power in range(cores.bit_length()) if 2**power <= cores} | {cores})
+    return ",".join(str(count) for count in counts)
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description="Throughput of app.server by worker count.")
+    parser.add_argument(
+        "--workers", default=_default_workers(), help="Comma separated worker counts"
+    )
+    parser.add_argument("--clients", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--concurrency", type=int, default=16, help="In-flight requests per client")
+    parser.add_argument("--duration", type=float, default=10.0)
+    parser.add_argument("--warmup", type=float, default=2.0)
+    parser.add_argument("--output", help="Also write the report to this JSON file")
+    parser.add_argument("--log-level", default="WARNING")
+    return parser
+
+
+def main(argv=None) -> dict:
+    options = build_parser().parse_args(argv)
+    logger.setLevel(getattr(logging, options.log_level.upper()))
+
+    runs = []
+    with ExitStack() as stack:
+        db = stack.enter_context(temp_database())
+        import_days(db, seed_days())
+        # Forked workers inherit these, so nothing reaches trains.db or TransportAPI
+        stack.enter_context(UpstreamStub().patch())
+        stack.enter_context(patch("app.main.db_connector", db))
+        stack.enter_context(patch("app.feature.train_times.routes.db_connector", db))
+        for workers in (int(count) for count in options.workers.split(",")):
+            runs.append(measure(workers, options))
+            logger.warning(f"{workers} workers: {runs[-1]['throughput_rps']:.0f} req/s")
+
+    baseline = runs[0]["throughput_rps"] if runs else 0
+    for run in runs:
+        run["speedup"] = run["throughput_rps"] / baseline if baseline else 0.0
+    report = {"cores": os.cpu_count(), "runs": runs, "options": vars(options)}
+    rendered = json.dumps(report, indent=2)
+    if options.output:
+        with open(options.output, "w", encoding="utf-8") as file:
+            file.write(rendered)
+    print(rendered, file=sys.stdout)
+    return report
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+"""Per-response cost of rendering TrainTimeResponse and error bodies."""
+
+import asyncio
+from datetime import datetime
+from typing import List
+
+from fastapi.responses import JSONResponse, ORJSONResponse
+from fastapi.routing import serialize_response
+from fastapi.utils import create_model_field
+
+from app.feature.train_times.models import TrainTimeResponse
+from app.utils.responses import json_response
+from benchmarks.common import measure, summarise
+
+BATCH = 1000
+ARRIVAL = datetime(2024, 8, 4, 17, 30)
+
+
+def run(options) -> List[dict]:
+    results = []
+    response = TrainTimeResponse(arrival_time=ARRIVAL)
+    field = create_model_field(
+        "Response_train_time", TrainTimeResponse, mode="serialization"
+    )
+
+    def strftime_dump():
+        return {"arrival_time": response.arrival_time.strftime("%Y-%m-%d %H:%M:%S")}
+
+    async def framework_path():
+        # What FastAPI does for a route returning a model with response_model set:
+        # validate the return value against the field, dump it, then encode with json
+        for _ in range(BATCH):
+            content = await serialize_response(
+                field=field, response_content=response, exclude_none=True
+            )
+            JSONResponse(content=content)
+
+    def direct_path():
+        for _ in range(BATCH):
+            json_response(response)
+
+    loop = asyncio.new_event_loop()
+    try:
+        cases = [
+            (
+                "serialization.response_model_json",
+                lambda: loop.run_until_complete(framework_path()),
+            ),
+            ("serialization.direct_orjson", direct_path),
+            (
+                "serialization.strftime_dump",
+                lambda: [strftime_dump() for _ in range(BATCH)],
+            ),
+            (
+                "serialization.model_dump",
+                lambda: [response.model_dump() for _ in range(BATCH)],
+            ),
+            (
+                "serialization.error_json",
+                lambda: [
+                    JSONResponse(status_code=500, content={"message": "x"})
+                    for _ in range(BATCH)
+                ],
+            ),
+            (
+                "serialization.error_orjson",
+                lambda: [
+                    ORJSONResponse(status_code=500, content={"message": "x"})
+                    for _ in range(BATCH)
+                ],
+            ),
+        ]
+        for name, case in cases:
+            samples = measure(case, options.iterations)
+            results.append(
+                summarise(
+                    name,
+                    samples,
+                    {"responses": BATCH},
+                    us_per_response=sorted(samples)[len(samples) // 2] / BATCH * 1e6,
+                )
+            )
+    finally:
+        loop.close()
+    return results
@@ -0,0 +1,76 @@
+"""Reloading a day's timetable: ORM hydration from train_schedule versus a mapped snapshot."""
+
+import tempfile
+from datetime import datetime, timedelta
+from typing import List
+
+from app.connectors.db.models import TrainSchedule
+from app.connectors.snapshot.snapshot_store import SnapshotStore
+from app.utils.date_helpers import to_epoch_minutes
+from benchmarks.common import bulk_insert_rows, measure, summarise, temp_database
+
+DAY = datetime(2024, 8, 4)
+
+
+def _day_rows(departures: int) -> List[dict]:
+    step = 24 * 60 / departures
+    rows = []
+    for i in range(departures):
+        departure = DAY + timedelta(minutes=int(i * step))
+        rows.append(
+            {
+                "origin_station_code": "LBG",
+                "destination_station_code": "DFD",
+                "origin_expected_departure_time": departure,
+                "origin_expected_arrival_time": departure + timedelta(minutes=38),
+                "destination_aimed_arrival_time": departure + timedelta(minutes=38),
+            }
+        )
+    return rows
+
+
+def run(options) -> List[dict]:
+    results = []
+    departures = 1000
+    rows = _day_rows(departures)
+
+    with temp_database() as db, tempfile.TemporaryDirectory() as directory:
+        bulk_insert_rows(db, rows)
+        store = SnapshotStore(directory, cache_size=0)
+        store.write(
+            "LBG",
+            "DFD",
+            DAY,
+            [
+                (
+                    row["origin_station_code"],
+                    row["destination_station_code"],
+                    to_epoch_minutes(row["origin_expected_departure_time"]),
+                    to_epoch_minutes(row["origin_expected_arrival_time"]),
+                    to_epoch_minutes(row["destination_aimed_arrival_time"]),
+                )
+                for row in rows
+            ],
+        )
+
+        def orm_day():
+            db.session.expunge_all()
+            return (
+                db.session.query(TrainSchedule)
+                .filter(
+                    TrainSchedule.origin_station_code == "LBG",
+                    TrainSchedule.destination_station_code == "DFD",
+                    TrainSchedule.origin_expected_departure_time >= DAY,
+                    TrainSchedule.origin_expected_departure_time < DAY + timedelta(days=1),
+                )
+                .order_by(TrainSchedule.origin_expected_departure_time)
+                .all()
+            )
+
+        samples = measure(orm_day, options.iterations)
+        results.append(summarise("snapshot.reload_orm", samples, {"departures": departures}))
+
+        samples = measure(lambda: store.get("LBG", "DFD", DAY), options.iterations)
+        results.append(summarise("snapshot.reload_mmap", samples, {"departures": departures}))
+
+    return results
@@ -0,0 +1,134 @@
+"""Timing, statistics and fixture helpers shared by the benchmark modules."""
+
+import os
+import random
+import statistics
+import tempfile
+import time
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from typing import Callable, Iterable, Iterator, List
+
+from sqlalchemy import insert
+
+from app.connectors.db.db_connector import DatabaseConnector
+from app.connectors.db.models import TrainSchedule
+
+STATION_PAIRS = [
+    ("LBG", "DFD"),
+    ("DFD", "LUT"),
+    ("LBG", "LUT"),
+    ("DFD", "LBG"),
+    ("LUT", "DFD"),
+    ("SEV", "TON"),
+    ("CHX", "SEV"),
+    ("VIC", "BTN"),
+]
+
+
+def percentile(sorted_samples: List[float], pct: float) -> float:
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_samples:
+        return 0.0
+    rank = max(int(round(pct / 100 * len(sorted_samples))) - 1, 0)
+    return sorted_samples[min(rank, len(sorted_samples) - 1)]
+
+
+def summarise(name: str, samples: List[float], params: dict = None, **extra) -> dict:
+    """Turn a list of per-iteration durations (seconds) into a result record."""
+    ordered = sorted(samples)
+    mean = statistics.fmean(ordered) if ordered else 0.0
+    result = {
+        "name": name,
+        "params": params or {},
+        "iterations": len(ordered),
+        "unit": "s",
+        "mean": mean,
+        "median": statistics.median(ordered) if ordered else 0.0,
+        "p95": percentile(ordered, 95),
+        "p99": percentile(ordered, 99),
+        "min": ordered[0] if ordered else 0.0,
+        "max": ordered[-1] if ordered else 0.0,
+        "stdev": statistics.stdev(ordered) if len(ordered) > 1 else 0.0,
+        "ops_per_sec": 1 / mean if mean else 0.0,
+    }
+    result.update(extra)
+    return result
+
+
+def measure(fn: Callable[[], object], iterations: int, warmup: int = 1) -> List[float]:
+    """Run fn warmup + iterations times and return the timed durations."""
+    for _ in range(warmup):
+        fn()
+    samples = []
+    for _ in range(iterations):
+        started = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - started)
+    return samples
+
+
+async def measure_async(fn, iterations: int, warmup: int = 1) -> List[float]:
+    """Async counterpart of measure, fn is a zero-argument coroutine function."""
+    for _ in range(warmup):
+        await fn()
+    samples = []
+    for _ in range(iterations):
+        started = time.perf_counter()
+        await fn()
+        samples.append(time.perf_counter() - started)
+    return samples
+
+
+@contextmanager
+def temp_database() -> Iterator[DatabaseConnector]:
+    """A DatabaseConnector backed by a throwaway SQLite file, so trains.db is never touched."""
+    handle, path = tempfile.mkstemp(prefix="bench_", suffix=".db")
+    os.close(handle)
+    db = DatabaseConnector(database_url=f"sqlite:///{path}")
+    db.create_db()
+    try:
+        yield db
+    finally:
+        db.close()
+        db.engine.dispose()
+        os.remove(path)
+
+
+def synthetic_schedule_rows(
+    count: int, start_date: datetime = datetime(2024, 8, 1), seed: int = 7
+) -> Iterator[dict]:
+    """Yield train_schedule rows spread over the station pairs, roughly 1000 per pair per day."""
+    rng = random.Random(seed)
+    per_day = 1000
+    for i in range(count):
+        origin, destination = STATION_PAIRS[i % len(STATION_PAIRS)]
+        day = (i // len(STATION_PAIRS)) // per_day
+        departure = start_date + timedelta(days=day, minutes=rng.randrange(0, 24 * 60))
+        arrival = departure + timedelta(minutes=rng.randrange(10, 90))
+        yield {
+            "origin_station_code": origin,
+            "destination_station_code": destination,
+            "origin_expected_departure_time": departure,
+            "origin_expected_arrival_time": arrival,
+            "destination_aimed_arrival_time": arrival,
+        }
+
+
+def bulk_insert_rows(
+    db: DatabaseConnector, rows: Iterable[dict], chunk_size: int = 10000
+) -> int:
+    """Insert rows with executemany in chunks inside a single transaction."""
+    inserted = 0
+    chunk = []
+    with db.engine.begin() as connection:
+        for row in rows:
+            chunk.append(row)
+            if len(chunk) >= chunk_size:
+                connection.execute(insert(TrainSchedule), chunk)
+                inserted += len(chunk)
+                chunk = []
+        if chunk:
+            connection.execute(insert(TrainSchedule), chunk)
+            inserted += len(chunk)
+    return inserted
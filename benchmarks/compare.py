@@ -0,0 +1,69 @@
+"""
+Compare two benchmark result files and flag regressions.
+
+Usage:
+    python -m benchmarks.compare baseline.json candidate.json --threshold 0.10
+
+Exits with status 1 when any benchmark's median got slower by more than the threshold.
+"""
+
+import argparse
+import json
+import sys
+
+
+def _key(result: dict) -> tuple:
+    return result["name"], json.dumps(result.get("params", {}), sort_keys=True)
+
+
+def compare(baseline: dict, candidate: dict, threshold: float) -> list:
+    """Return one row per benchmark present in both runs, with the median change ratio."""
+    baseline_results = {_key(result): result for result in baseline["results"]}
+    rows = []
+    for result in candidate["results"]:
+        previous = baseline_results.get(_key(result))
+        if previous is None or not previous["median"]:
+            continue
+        change = result["median"] / previous["median"] - 1
+        rows.append(
+            {
+                "name": result["name"],
+                "params": result.get("params", {}),
+                "baseline_median": previous["median"],
+                "candidate_median": result["median"],
+                "change": change,
+                "regression": change > threshold,
+            }
+        )
+    return rows
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Compare two benchmark runs.")
+    parser.add_argument("baseline")
+    parser.add_argument("candidate")
+    parser.add_argument("--threshold", type=float, default=0.10)
+    options = parser.parse_args(argv)
+
+    with open(options.baseline, encoding="utf-8") as file:
+        baseline = json.load(file)
+    with open(options.candidate, encoding="utf-8") as file:
+        candidate = json.load(file)
+
+    rows = compare(baseline, candidate, options.threshold)
+    print(
+        f"baseline {baseline['meta'].get('commit')} -> candidate {candidate['meta'].get('commit')}"
+    )
+    for row in rows:
+        flag = "REGRESSION" if row["regression"] else ""
+        print(
+            f"{row['name']:<40} {json.dumps(row['params']):<40} "
+            f"{row['baseline_median'] * 1000:10.3f} ms -> {row['candidate_median'] * 1000:10.3f} ms "
+            f"({row['change']:+.1%}) {flag}"
+        )
+
+    return 1 if any(row["regression"] for row in rows) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,176 @@
+"""
+Local HTTP stand-in for TransportAPI that injects faults: errors, slow responses, dropped
+connections and rate limiting. Serves synthetic station timetables for any request.
+
+Faults come from a script (one action per request, in order) and/or random rates:
+
+    PYTHONPATH=. python -m benchmarks.fault_server --port 8081 --error-rate 0.2 --delay-rate 0.1
+
+then point `connectors.train_times_api.base_url` at http://127.0.0.1:8081.
+
+Actions: "ok", "500", "503", "429", "404", "reset" (close without a response),
+"garbage" (a 200 whose body isn't JSON) and "delay:<seconds>" (respond normally after a
+pause).
+"""
+
+import argparse
+import asyncio
+import json
+import random
+from typing import List, Optional
+from urllib.parse import parse_qs, unquote, urlsplit
+
+from benchmarks.upstream_stub import build_station_timetable
+
+REASONS = {
+    200: "OK",
+    404: "Not Found",
+    429: "Too Many Requests",
+    500: "Internal Server Error",
+    503: "Service Unavailable",
+}
+
+
+class FaultInjectingServer:
+    def __init__(
+        self,
+        script: Optional[List[str]] = None,
+        error_rate: float = 0.0,
+        delay_rate: float = 0.0,
+        delay_seconds: float = 2.0,
+        departures: int = 100,
+        host: str = "127.0.0.1",
+        port: int = 0,
+        seed: int = 1,
+    ):
+        self.script = list(script or [])
+        self.error_rate = error_rate
+        self.delay_rate = delay_rate
+        self.delay_seconds = delay_seconds
+        self.departures = departures
+        self.host = host
+        self.port = port
+        self.requests = 0
+        self.actions: List[str] = []
+        self._rng = random.Random(seed)
+        self._server = None
+        self._handlers = set()
+
+    @property
+    def base_url(self) -> str:
+        return f"http://{self.host}:{self.port}"
+
+    async def start(self):
+        self._server = await asyncio.start_server(self._handle, self.host, self.port)
+        self.port = self._server.sockets[0].getsockname()[1]
+        return self
+
+    async def stop(self):
+        if self._server is not None:
+            self._server.close()
+            # Don't leave delayed responses sleeping past the end of the loop
+            for handler in list(self._handlers):
+                handler.cancel()
+            await asyncio.gather(*self._handlers, return_exceptions=True)
+            await self._server.wait_closed()
+
+    def next_action(self) -> str:
+        if self.script:
+            return self.script.pop(0)
+        roll = self._rng.random()
+        if roll < self.error_rate:
+            return self._rng.choice(["500", "503", "reset"])
+        if roll < self.error_rate + self.delay_rate:
+            return f"delay:{self.delay_seconds}"
+        return "ok"
+
+    def _payload(self, target: str) -> dict:
+        parts = urlsplit(target)
+        query = parse_qs(parts.query)
+        origin = (
+            unquote(parts.path.rsplit("/", 1)[-1])
+            .removesuffix(".json")
+            .replace("crs:", "")
+        )
+        destination = query.get("destination", [""])[0].replace("crs:", "")
+        date = query.get("datetime", ["2024-08-04"])[0][:10]
+        return build_station_timetable(
+            origin, destination, date, departures=self.departures
+        )
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        handler = asyncio.current_task()
+        self._handlers.add(handler)
+        try:
+            request_line = await reader.readline()
+            while (await reader.readline()) not in (b"\r\n", b"\n", b""):
+                pass
+            if not request_line:
+                return
+            target = request_line.decode().split(" ")[1]
+            self.requests += 1
+            action = self.next_action()
+            self.actions.append(action)
+
+            if action == "reset":
+                return
+            if action.startswith("delay:"):
+                await asyncio.sleep(float(action.split(":", 1)[1]))
+                action = "ok"
+
+            status = 200 if action in ("ok", "garbage") else int(action)
+            if action == "garbage":
+                body = b'{"departures": {"all": ['
+            elif status == 200:
+                body = json.dumps(self._payload(target)).encode()
+            else:
+                body = json.dumps({"error": REASONS.get(status, "Error")}).encode()
+            headers = [
+                f"HTTP/1.1 {status} {REASONS.get(status, 'Error')}",
+                "Content-Type: application/json",
+                f"Content-Length: {len(body)}",
+                "Connection: close",
+            ]
+            if status in (429, 503):
+                headers.append("Retry-After: 0")
+            writer.write(("\r\n".join(headers) + "\r\n\r\n").encode() + body)
+            await writer.drain()
+        except (ConnectionError, asyncio.CancelledError):
+            pass
+        finally:
+            self._handlers.discard(handler)
+            writer.close()
+
+
+async def _serve(options):
+    server = FaultInjectingServer(
+        error_rate=options.error_rate,
+        delay_rate=options.delay_rate,
+        delay_seconds=options.delay_seconds,
+        departures=options.departures,
+        port=options.port,
+        seed=options.seed,
+    )
+    await server.start()
+    print(f"Fault injecting upstream listening on {server.base_url}")
+    await asyncio.Event().wait()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Fault injecting TransportAPI stand-in."
+    )
+    parser.add_argument("--port", type=int, default=8081)
+    parser.add_argument("--error-rate", type=float, default=0.1)
+    parser.add_argument("--delay-rate", type=float, default=0.05)
+    parser.add_argument("--delay-seconds", type=float, default=5.0)
+    parser.add_argument("--departures", type=int, default=150)
+    parser.add_argument("--seed", type=int, default=1)
+    try:
+        asyncio.run(_serve(parser.parse_args(argv)))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
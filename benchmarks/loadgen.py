@@ -0,0 +1,304 @@
+"""
+Replay a JSONL trace of /traintimes requests and report latency, errors and cache hits.
+
+Each trace line is either a bare TrainTimeRequest payload, or {"ts": epoch_seconds,
+"request": {...}} as written by the app when `app.request_trace_path` is configured.
+
+Usage:
+    PYTHONPATH=. python -m benchmarks.loadgen benchmarks/traces/sample_trace.jsonl --concurrency 16
+    PYTHONPATH=. python -m benchmarks.loadgen trace.jsonl --arrival open --rate 200
+    PYTHONPATH=. python -m benchmarks.loadgen trace.jsonl --arrival open --time-compression 60
+
+By default the app runs in-process against a throwaway SQLite database with TransportAPI
+stubbed (or replayed from api_raw_data with --upstream replay), so nothing leaves the
+machine. --base-url points the generator at an already running build instead; cache
+counters are only available in-process.
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import random
+import sys
+import time
+from contextlib import ExitStack
+from typing import List, Optional, Tuple
+
+import httpx
+
+from app.utils.logger import logger
+from app.utils.metrics import metrics
+from benchmarks.common import percentile
+
+Entry = Tuple[Optional[float], dict]
+
+
+def load_trace(path: str) -> List[Entry]:
+    """Read a trace into (offset_seconds, payload) pairs, offsets relative to the first request."""
+    entries = []
+    first_ts = None
+    with open(path, "r", encoding="utf-8") as file:
+        for line_number, line in enumerate(file, start=1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError as e:
+                raise ValueError(f"{path}:{line_number} is not valid JSON: {e}")
+
+            if "request" in record:
+                ts = record.get("ts")
+                payload = record["request"]
+            else:
+                ts = None
+                payload = record
+
+            if ts is not None:
+                first_ts = ts if first_ts is None else first_ts
+                entries.append((ts - first_ts, payload))
+            else:
+                entries.append((None, payload))
+    return entries
+
+
+def schedule_arrivals(
+    entries: List[Entry], rate: Optional[float], time_compression: float, seed: int
+) -> List[Entry]:
+    """Assign each entry a send offset: Poisson at `rate`, or the recorded gaps compressed."""
+    if rate:
+        rng = random.Random(seed)
+        offset = 0.0
+        scheduled = []
+        for _, payload in entries:
+            scheduled.append((offset, payload))
+            offset += rng.expovariate(rate)
+        return scheduled
+
+    if any(offset is None for offset, _ in entries):
+        raise ValueError(
+            "Open-loop replay needs --rate when the trace has no timestamps"
+        )
+    return [(offset / time_compression, payload) for offset, payload in entries]
+
+
+async def _send(client: httpx.AsyncClient, payload: dict, started: float, samples):
+    try:
+        response = await client.post("/traintimes", json=payload)
+        status = response.status_code
+    except httpx.HTTPError as e:
+        logger.debug(f"Load generator request failed: {e}")
+        status = 0
+    samples.append((time.perf_counter() - started, status))
+
+
+async def run_closed_loop(client, entries: List[Entry], concurrency: int) -> list:
+    """`concurrency` virtual users each send their next request as soon as the last returns."""
+    samples = []
+    pending = iter(entries)
+
+    async def user():
+        for _, payload in pending:
+            await _send(client, payload, time.perf_counter(), samples)
+
+    await asyncio.gather(*(user() for _ in range(concurrency)))
+    return samples
+
+
+async def run_open_loop(client, arrivals: List[Entry], concurrency: int) -> list:
+    """
+    Send each request at its scheduled offset whether or not earlier ones finished.
+    Latency is measured from the scheduled time, so queueing behind `concurrency` counts.
+    """
+    samples = []
+    limit = asyncio.Semaphore(concurrency)
+    loop_start = time.perf_counter()
+
+    async def fire(scheduled_at: float, payload: dict):
+        async with limit:
+            await _send(client, payload, scheduled_at, samples)
+
+    tasks = []
+    for offset, payload in arrivals:
+        scheduled_at = loop_start + offset
+        delay = scheduled_at - time.perf_counter()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        tasks.append(asyncio.create_task(fire(scheduled_at, payload)))
+    await asyncio.gather(*tasks)
+    return samples
+
+
+def build_report(
+    samples: list,
+    elapsed: float,
+    counters: Optional[dict],
+    upstream_calls,
+    slo_seconds: Optional[float] = None,
+) -> dict:
+    latencies = sorted(latency for latency, _ in samples)
+    statuses = {}
+    for _, status in samples:
+        statuses[str(status)] = statuses.get(str(status), 0) + 1
+    errors = sum(1 for _, status in samples if status == 0 or status >= 500)
+    client_errors = sum(1 for _, status in samples if 400 <= status < 500)
+
+    report = {
+        "requests": len(samples),
+        "elapsed_s": elapsed,
+        "throughput_rps": len(samples) / elapsed if elapsed else 0.0,
+        "status_counts": statuses,
+        "error_rate": errors / len(samples) if samples else 0.0,
+        "client_error_rate": client_errors / len(samples) if samples else 0.0,
+        "latency_s": {
+            "p50": percentile(latencies, 50),
+            "p95": percentile(latencies, 95),
+            "p99": percentile(latencies, 99),
+            "max": latencies[-1] if latencies else 0.0,
+        },
+        "cache": None,
+        "upstream_calls": upstream_calls,
+    }
+    if slo_seconds is not None:
+        # Successful answers delivered within the SLO; under overload this should
+        # plateau rather than collapse
+        good = sum(
+            1
+            for latency, status in samples
+            if status in (200, 304) and latency <= slo_seconds
+        )
+        report["goodput_rps"] = good / elapsed if elapsed else 0.0
+        report["slo_s"] = slo_seconds
+    if counters is not None:
+        hits = counters.get("cache_hit", 0)
+        misses = counters.get("cache_miss", 0)
+        report["cache"] = {
+            "hits": hits,
+            "misses": misses,
+            "hit_ratio": hits / (hits + misses) if hits + misses else 0.0,
+        }
+    return report
+
+
+def _counter_delta(before: dict, after: dict) -> dict:
+    return {key: after.get(key, 0) - before.get(key, 0) for key in after}
+
+
+async def replay(options) -> dict:
+    entries = load_trace(options.trace) * options.repeat
+    if options.limit:
+        entries = entries[: options.limit]
+    warmup, measured = entries[: options.warmup], entries[options.warmup :]
+
+    with ExitStack() as stack:
+        upstream = None
+        if options.base_url:
+            transport = None
+            base_url = options.base_url
+        else:
+            from app.feature.train_times.routes import get_train_time_service
+            from app.feature.train_times.services import TrainTimeService
+            from app.main import app
+            from benchmarks.common import temp_database
+            from benchmarks.upstream_stub import UpstreamStub
+
+            upstream = UpstreamStub(
+                mode=options.upstream,
+                departures=options.stub_departures,
+                latency_ms=options.upstream_latency_ms,
+            )
+            stack.enter_context(upstream.patch())
+            db = stack.enter_context(temp_database())
+            app.dependency_overrides[get_train_time_service] = (
+                lambda: TrainTimeService(db)
+            )
+            stack.callback(app.dependency_overrides.pop, get_train_time_service, None)
+            transport = httpx.ASGITransport(app=app)
+            base_url = "http://loadgen"
+
+        limits = httpx.Limits(max_connections=options.concurrency)
+        async with httpx.AsyncClient(
+            transport=transport, base_url=base_url, limits=limits, timeout=60
+        ) as client:
+            if warmup:
+                await run_closed_loop(client, warmup, options.concurrency)
+
+            counters_before = metrics.snapshot()
+            upstream_before = upstream.calls if upstream else 0
+            started = time.perf_counter()
+            if options.arrival == "closed":
+                samples = await run_closed_loop(client, measured, options.concurrency)
+            else:
+                arrivals = schedule_arrivals(
+                    measured, options.rate, options.time_compression, options.seed
+                )
+                samples = await run_open_loop(client, arrivals, options.concurrency)
+            elapsed = time.perf_counter() - started
+
+    counters = None
+    if upstream is not None:
+        counters = _counter_delta(counters_before, metrics.snapshot())
+    report = build_report(
+        samples,
+        elapsed,
+        counters,
+        upstream.calls - upstream_before if upstream else None,
+        options.slo_ms / 1000,
+    )
+    report["options"] = vars(options)
+    return report
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description="Replay a /traintimes JSONL trace.")
+    parser.add_argument("trace")
+    parser.add_argument("--arrival", choices=["closed", "open"], default="closed")
+    parser.add_argument(
+        "--concurrency",
+        type=int,
+        default=8,
+        help="Virtual users (closed loop) or max in-flight requests (open loop)",
+    )
+    parser.add_argument(
+        "--rate", type=float, help="Open loop Poisson arrival rate in requests/sec"
+    )
+    parser.add_argument(
+        "--time-compression",
+        type=float,
+        default=1.0,
+        help="Open loop replay of recorded timestamps, N times faster than captured",
+    )
+    parser.add_argument("--repeat", type=int, default=1)
+    parser.add_argument("--limit", type=int, default=0)
+    parser.add_argument(
+        "--warmup", type=int, default=0, help="Leading requests sent but not measured"
+    )
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument(
+        "--slo-ms", type=float, default=1000.0, help="Latency bound counted towards goodput"
+    )
+    parser.add_argument("--base-url", help="Target a running server instead")
+    parser.add_argument("--upstream", choices=["synthetic", "replay"], default="synthetic")
+    parser.add_argument("--upstream-latency-ms", type=float, default=150.0)
+    parser.add_argument("--stub-departures", type=int, default=150)
+    parser.add_argument("--output", help="Also write the report to this JSON file")
+    parser.add_argument("--log-level", default="WARNING")
+    return parser
+
+
+def main(argv=None) -> dict:
+    options = build_parser().parse_args(argv)
+    logger.setLevel(getattr(logging, options.log_level.upper()))
+
+    report = asyncio.run(replay(options))
+    rendered = json.dumps(report, indent=2)
+    if options.output:
+        with open(options.output, "w", encoding="utf-8") as file:
+            file.write(rendered)
+    print(rendered, file=sys.stdout)
+    return report
+
+
+if __name__ == "__main__":
+    main()
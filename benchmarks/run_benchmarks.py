@@ -0,0 +1,125 @@
+"""
+Benchmark runner for the train-times pipeline.
+
+Usage:
+    PYTHONPATH=. python -m benchmarks.run_benchmarks --output bench_results.json
+    PYTHONPATH=. python -m benchmarks.run_benchmarks --suites ingest --sizes 10000,100000,1000000
+
+Results are written as JSON so runs from different commits can be diffed with
+benchmarks/compare.py.
+"""
+
+import argparse
+import importlib
+import json
+import logging
+import os
+import platform
+import subprocess
+import sys
+import time
+from datetime import datetime, timezone
+
+from app.utils.logger import logger
+
+SUITES = {
+    "mapping": "benchmarks.bench_mapping",
+    "ingest": "benchmarks.bench_ingest",
+    "lookup": "benchmarks.bench_lookup",
+    "endpoint": "benchmarks.bench_endpoint",
+    "snapshot": "benchmarks.bench_snapshot",
+    "serialization": "benchmarks.bench_serialization",
+    "event_loop": "benchmarks.bench_event_loop",
+}
+
+
+def _git_commit() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def _parse_sizes(value: str):
+    return [int(size.replace("_", "")) for size in value.split(",") if size]
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description="Run the train-times benchmarks.")
+    parser.add_argument(
+        "--suites",
+        default=",".join(SUITES),
+        help=f"Comma separated subset of: {', '.join(SUITES)}",
+    )
+    parser.add_argument("--output", default="bench_results.json")
+    parser.add_argument("--iterations", type=int, default=20)
+    parser.add_argument(
+        "--sizes",
+        type=_parse_sizes,
+        default=[10_000, 100_000],
+        help="train_schedule row counts for the ingest and lookup suites",
+    )
+    parser.add_argument("--ingest-repeats", type=int, default=3)
+    parser.add_argument(
+        "--row-limit",
+        type=int,
+        default=2_000,
+        help="Cap for the commit-per-row add_train_schedule ingest",
+    )
+    parser.add_argument("--lookups", type=int, default=2_000)
+    parser.add_argument("--stub-departures", type=int, default=150)
+    parser.add_argument("--log-level", default="WARNING")
+    return parser
+
+
+def main(argv=None) -> dict:
+    options = build_parser().parse_args(argv)
+    logger.setLevel(getattr(logging, options.log_level.upper()))
+
+    suites = [name for name in options.suites.split(",") if name]
+    unknown = set(suites) - set(SUITES)
+    if unknown:
+        raise SystemExit(f"Unknown benchmark suites: {', '.join(sorted(unknown))}")
+
+    results = []
+    for name in suites:
+        print(f"Running {name} benchmarks...", file=sys.stderr)
+        started = time.perf_counter()
+        module = importlib.import_module(SUITES[name])
+        results.extend(module.run(options))
+        print(f"  done in {time.perf_counter() - started:.1f}s", file=sys.stderr)
+
+    report = {
+        "meta": {
+            "commit": _git_commit(),
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "options": {
+                key: value for key, value in vars(options).items() if key != "output"
+            },
+        },
+        "results": results,
+    }
+
+    with open(options.output, "w", encoding="utf-8") as file:
+        json.dump(report, file, indent=2)
+
+    for result in results:
+        print(
+            f"{result['name']:<40} {json.dumps(result['params']):<40} "
+            f"median {result['median'] * 1000:10.3f} ms  p95 {result['p95'] * 1000:10.3f} ms",
+            file=sys.stderr,
+        )
+    print(f"Results written to {options.output}", file=sys.stderr)
+    return report
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,201 @@
+"""Offline stand-in for TransportAPI, used by the benchmarks and load tools."""
+
+import asyncio
+import glob
+import json
+import os
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+from unittest.mock import patch
+from urllib.parse import unquote
+
+RAW_DATA_GLOB = "api_raw_data/*.json"
+FETCH_DATA_TARGET = "app.connectors.train_api.train_api_connector.fetch_data"
+
+
+def build_station_timetable(
+    origin_station_code: str,
+    destination_station_code: str,
+    date: str,
+    departures: int = 100,
+    first_departure: str = "05:00",
+    journey_minutes: int = 38,
+    calling_at: Optional[List[str]] = None,
+) -> dict:
+    """
+    Build a TransportAPI-shaped station_timetables payload with evenly spread departures.
+    With `calling_at`, each train calls at those stations in turn (station_detail=calling_at)
+    instead of carrying a single destination.
+    """
+    day_start = datetime.strptime(f"{date} {first_departure}", "%Y-%m-%d %H:%M")
+    minutes_left = 24 * 60 - (day_start.hour * 60 + day_start.minute)
+    step = minutes_left / max(departures, 1)
+
+    trains = []
+    for i in range(departures):
+        departure = day_start + timedelta(minutes=int(i * step))
+        arrival = departure + timedelta(minutes=journey_minutes)
+        station_detail = {
+            "destination": {
+                "station_code": destination_station_code,
+                "aimed_arrival_time": arrival.strftime("%H:%M"),
+            }
+        }
+        if calling_at:
+            station_detail = {
+                "calling_at": [
+                    {
+                        "station_code": code,
+                        "aimed_arrival_time": (
+                            departure
+                            + timedelta(minutes=journey_minutes * (stop + 1) / len(calling_at))
+                        ).strftime("%H:%M"),
+                    }
+                    for stop, code in enumerate(calling_at)
+                ]
+            }
+        trains.append(
+            {
+                "mode": "train",
+                "train_uid": f"S{i:05d}",
+                "aimed_departure_time": departure.strftime("%H:%M"),
+                "expected_departure_time": departure.strftime("%H:%M"),
+                "expected_arrival_time": (departure - timedelta(minutes=2)).strftime(
+                    "%H:%M"
+                ),
+                "status": "ON TIME",
+                "station_detail": station_detail,
+            }
+        )
+
+    return {
+        "date": date,
+        "time_of_day": first_departure,
+        "request_time": datetime.now().isoformat(timespec="seconds"),
+        "station_code": f"crs:{origin_station_code}",
+        "departures": {"all": trains},
+    }
+
+
+def iter_raw_captures(pattern: str = RAW_DATA_GLOB):
+    """Yield (origin, destination, payload) for every saved api_raw_data capture."""
+    for path in sorted(glob.glob(pattern)):
+        name = os.path.basename(path)
+        origin, _, rest = name.partition("_TO_")
+        destination = rest.split("_AT_")[0]
+        with open(path, "r", encoding="utf-8") as file:
+            yield origin, destination, json.load(file)
+
+
+def load_raw_captures(pattern: str = RAW_DATA_GLOB) -> dict:
+    """Index the saved api_raw_data captures by (origin, destination), keeping the largest."""
+    captures = {}
+    for origin, destination, data in iter_raw_captures(pattern):
+        current = captures.get((origin, destination))
+        size = len(data.get("departures", {}).get("all", []))
+        if current is None or size > len(current["departures"]["all"]):
+            captures[(origin, destination)] = data
+    return captures
+
+
+def _within_offsets(payload: dict, params: dict) -> dict:
+    """Keep only departures between `datetime` and `datetime` + `to_offset`, like the API."""
+    start = str(params.get("datetime", ""))[11:16]
+    if not start:
+        return payload
+    hours, minutes, _ = str(params.get("to_offset", "PT23:59:59"))[2:].split(":")
+    end = datetime.strptime(start, "%H:%M") + timedelta(hours=int(hours), minutes=int(minutes))
+    # Windows stop at midnight, where the HH:MM comparison would wrap
+    end = "23:59" if end.day > 1 else end.strftime("%H:%M")
+    trains = [
+        train
+        for train in payload["departures"]["all"]
+        if start <= train["expected_departure_time"] <= end
+    ]
+    return {**payload, "departures": {"all": trains}}
+
+
+def _with_delays(payload: dict, delays: Dict[str, int]) -> dict:
+    trains = []
+    for train in payload["departures"]["all"]:
+        minutes = delays.get(train.get("train_uid"))
+        if minutes:
+            expected = datetime.strptime(train["aimed_departure_time"], "%H:%M")
+            expected += timedelta(minutes=minutes)
+            train = {
+                **train,
+                "expected_departure_time": expected.strftime("%H:%M"),
+                "status": "LATE",
+            }
+        trains.append(train)
+    return {**payload, "departures": {"all": trains}}
+
+
+class UpstreamStub:
+    """
+    Replaces `fetch_data` in the train API connector with a local responder.
+
+    mode="synthetic" generates a timetable for any station pair and day.
+    mode="replay" serves the matching api_raw_data capture re-dated to the requested
+    day, falling back to a synthetic timetable for pairs that were never captured.
+    Whole-board requests (station_detail=calling_at) always get a synthetic board whose
+    trains call at each of `calling_points`. `delay` makes later responses report a
+    train leaving later than timetabled, as live running information would.
+    """
+
+    def __init__(
+        self,
+        mode: str = "synthetic",
+        departures: int = 100,
+        latency_ms: float = 0.0,
+        calling_points: Optional[List[str]] = None,
+    ):
+        if mode not in ("synthetic", "replay"):
+            raise ValueError(f"Unknown upstream stub mode: {mode}")
+        self.mode = mode
+        self.departures = departures
+        self.latency_ms = latency_ms
+        # Stations every train calls at when a whole board (station_detail=calling_at) is asked for
+        self.calling_points = calling_points or ["DFD", "LUT", "SEV", "GRV"]
+        self.calls = 0
+        self.captures = load_raw_captures() if mode == "replay" else {}
+        # train_uid -> minutes its expected departure is moved by
+        self.delays: Dict[str, int] = {}
+
+    def delay(self, train_uid: str, minutes: int):
+        self.delays[train_uid] = minutes
+
+    def respond(self, url: str, params: Optional[dict] = None) -> dict:
+        params = params or {}
+        origin = unquote(url.rsplit("/", 1)[-1]).removesuffix(".json")
+        origin = origin.replace("crs:", "")
+        destination = str(params.get("destination", "")).replace("crs:", "")
+        date = str(params.get("datetime", ""))[:10]
+
+        capture = self.captures.get((origin, destination))
+        if params.get("station_detail") == "calling_at":
+            calling_at = [code for code in self.calling_points if code != origin]
+            payload = build_station_timetable(
+                origin, "", date, departures=self.departures, calling_at=calling_at
+            )
+        elif capture is not None:
+            payload = {**capture, "date": date}
+        else:
+            payload = build_station_timetable(
+                origin, destination, date, departures=self.departures
+            )
+        if self.delays:
+            payload = _with_delays(payload, self.delays)
+        return _within_offsets(payload, params)
+
+    async def fetch_data(self, url: str, params: dict = None):
+        self.calls += 1
+        if self.latency_ms:
+            await asyncio.sleep(self.latency_ms / 1000)
+        return self.respond(url, params)
+
+    @contextmanager
+    def patch(self):
+        with patch(FETCH_DATA_TARGET, new=self.fetch_data):
+            yield self
@@ -0,0 +1,21 @@
+import argparse
+from datetime import datetime, timedelta
+
+from app.connectors.db.db_connector import DatabaseConnector
+from app.connectors.snapshot.day_snapshot import rows_from_schedule_rows
+from app.connectors.snapshot.snapshot_store import snapshot_config, SnapshotStore
+
+parser = argparse.ArgumentParser(description="Build timetable snapshots from the database.")
+parser.add_argument("--days-back", type=int, default=1)
+parser.add_argument("--directory", default=snapshot_config.get("directory", "snapshots"))
+options = parser.parse_args()
+
+print("Building timetable snapshots")
+db_connector = DatabaseConnector()
+store = SnapshotStore(options.directory)
+keys = db_connector.get_api_call_keys(datetime.now() - timedelta(days=options.days_back))
+for origin, destination, day in keys:
+    rows = rows_from_schedule_rows(db_connector.get_day_schedule_rows(origin, destination, day))
+    store.write(origin, destination, day, rows)
+db_connector.close()
+print(f"Finished building {len(keys)} snapshots in {options.directory}")
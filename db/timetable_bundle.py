@@ -0,0 +1,54 @@
+import argparse
+from datetime import datetime, timedelta
+
+from app.connectors.db.db_connector import DatabaseConnector
+from app.connectors.db.timetable_bundle import (
+    days_from_captures,
+    export_bundle,
+    import_bundle,
+    write_bundle,
+)
+
+parser = argparse.ArgumentParser(
+    description="Export or import cached timetables as a portable bundle, to seed caches offline."
+)
+commands = parser.add_subparsers(dest="command", required=True)
+export_parser = commands.add_parser("export", help="Write every cached day to a bundle.")
+export_parser.add_argument("directory")
+export_parser.add_argument(
+    "--days-back", type=int, default=None, help="Only days from this many days ago onwards."
+)
+import_parser = commands.add_parser("import", help="Load a bundle into the database.")
+import_parser.add_argument("directory")
+import_parser.add_argument("--batch-days", type=int, default=500)
+captures_parser = commands.add_parser(
+    "convert-captures", help="Write a bundle from saved TransportAPI responses."
+)
+captures_parser.add_argument("directory")
+captures_parser.add_argument("--pattern", default="api_raw_data/*.json")
+options = parser.parse_args()
+
+if options.command == "convert-captures":
+    print(f"Converting captures matching {options.pattern}")
+    days, rows = write_bundle(options.directory, days_from_captures(options.pattern))
+    print(f"Finished writing {days} days, {rows} departures to {options.directory}")
+else:
+    db_connector = DatabaseConnector()
+    db_connector.create_db()
+    if options.command == "export":
+        since = None
+        if options.days_back is not None:
+            since = datetime.now() - timedelta(days=options.days_back)
+        print("Exporting cached timetables")
+        days, rows = export_bundle(db_connector, options.directory, since)
+        print(f"Finished exporting {days} days, {rows} departures to {options.directory}")
+    else:
+        print(f"Importing timetables from {options.directory}")
+        imported, skipped, rows = import_bundle(
+            db_connector, options.directory, options.batch_days
+        )
+        print(
+            f"Finished importing {imported} days, {rows} departures "
+            f"({skipped} days already fresher here)"
+        )
+    db_connector.close()
@@ -1,8 +1,18 @@
 import pytest
 from httpx import AsyncClient, ASGITransport
+from datetime import datetime
 from unittest.mock import AsyncMock, patch
 from app.main import app
-from app.feature.train_times.models import TrainTimeRequest
+from app.feature.train_times.models import (
+    TrainDepartureEntry,
+    TrainDeparturesResponse,
+    TrainJourneyArrival,
+    TrainLegResult,
+    TrainProfileEntry,
+    TrainProfileResponse,
+    TrainTimeRequest,
+)
+from app.utils.error_handler import OverloadedError
 
 mock_train_schedule = {
     "station_codes": ["LBG", "DFD"],
@@ -59,3 +69,194 @@ async def test_train_times_error(mock_calculate_train_destination_arrival):
     assert data["message"] == "An unexpected error occurred. Please try again later."
 
     mock_calculate_train_destination_arrival.assert_called_once()
+
+
+@pytest.mark.asyncio
+@patch(
+    "app.feature.train_times.services.TrainTimeService.get_train_destination_arrival",
+    new_callable=AsyncMock,
+)
+async def test_train_times_etag_not_modified(mock_get_train_destination_arrival):
+    """Test the /traintimes endpoint returns an ETag and answers If-None-Match with 304."""
+    mock_get_train_destination_arrival.return_value = (mock_train_response, '"abc123"')
+
+    transport = ASGITransport(app=app)
+    async with AsyncClient(transport=transport, base_url="http://test") as ac:
+        response = await ac.post("/traintimes", json=mock_train_schedule)
+        not_modified = await ac.post(
+            "/traintimes", json=mock_train_schedule, headers={"If-None-Match": '"abc123"'}
+        )
+
+    assert response.status_code == 200
+    assert response.headers["ETag"] == '"abc123"'
+    assert "Cache-Control" in response.headers
+    assert not_modified.status_code == 304
+    assert not_modified.headers["ETag"] == '"abc123"'
+    assert not_modified.content == b""
+
+
+@pytest.mark.asyncio
+@patch(
+    "app.feature.train_times.services.TrainTimeService.get_train_destination_arrival",
+    new_callable=AsyncMock,
+)
+async def test_train_times_overloaded_returns_503_with_retry_after(
+    mock_get_train_destination_arrival,
+):
+    """Test that requests shed by admission control get a fast 503 with Retry-After."""
+    mock_get_train_destination_arrival.side_effect = OverloadedError("busy", retry_after=2)
+
+    transport = ASGITransport(app=app)
+    async with AsyncClient(transport=transport, base_url="http://test") as ac:
+        response = await ac.post("/traintimes", json=mock_train_schedule)
+
+    assert response.status_code == 503
+    assert response.headers["Retry-After"] == "2"
+
+
+@pytest.mark.asyncio
+@patch(
+    "app.feature.train_times.services.TrainTimeService.get_train_destination_arrival",
+    new_callable=AsyncMock,
+)
+async def test_train_times_unknown_station_is_rejected(mock_get_train_destination_arrival):
+    """Test that with reject_unknown a well-formed but unknown station code never reaches the service."""
+    transport = ASGITransport(app=app)
+    with patch("app.connectors.stations.station_registry.station_registry.reject_unknown", True):
+        async with AsyncClient(transport=transport, base_url="http://test") as ac:
+            response = await ac.post(
+                "/traintimes", json={**mock_train_schedule, "station_codes": ["LBG", "XYZ"]}
+            )
+
+    assert response.status_code == 422
+    assert "XYZ" in response.text
+    mock_get_train_destination_arrival.assert_not_called()
+
+
+@pytest.mark.asyncio
+@patch(
+    "app.feature.train_times.services.TrainTimeService.get_train_destination_arrival",
+    new_callable=AsyncMock,
+)
+async def test_train_times_codes_missing_from_the_registry_are_accepted(
+    mock_get_train_destination_arrival,
+):
+    """Test that by default validation only normalises codes, as before the registry existed."""
+    mock_get_train_destination_arrival.return_value = (mock_train_response, None)
+    transport = ASGITransport(app=app)
+    async with AsyncClient(transport=transport, base_url="http://test") as ac:
+        response = await ac.post(
+            "/traintimes", json={**mock_train_schedule, "station_codes": ["lbg", "LBG", "EDN"]}
+        )
+
+    assert response.status_code == 200
+    request = mock_get_train_destination_arrival.await_args.args[0]
+    assert request.station_codes == ["LBG", "LBG", "EDN"]
+
+
+@pytest.mark.asyncio
+@patch(
+    "app.feature.train_times.services.TrainTimeService.calculate_train_arrival_profile",
+    new_callable=AsyncMock,
+)
+async def test_train_times_profile(mock_calculate_train_arrival_profile):
+    """Test the /traintimes/profile endpoint and its start time range validation."""
+    mock_calculate_train_arrival_profile.return_value = TrainProfileResponse(
+        profile=[
+            TrainProfileEntry(start_time="2024-08-04 06:00", arrival_time="2024-08-04 06:40"),
+            TrainProfileEntry(start_time="2024-08-04 06:05"),
+        ]
+    )
+    profile_request = {
+        "station_codes": ["LBG", "DFD"],
+        "earliest_start_time": "2024-08-04 06:00",
+        "latest_start_time": "2024-08-04 06:05",
+        "step_minutes": 5,
+        "max_wait_time": 30,
+    }
+
+    transport = ASGITransport(app=app)
+    async with AsyncClient(transport=transport, base_url="http://test") as ac:
+        response = await ac.post("/traintimes/profile", json=profile_request)
+        backwards = await ac.post(
+            "/traintimes/profile",
+            json={**profile_request, "latest_start_time": "2024-08-04 05:00"},
+        )
+
+    assert response.status_code == 200
+    assert response.json() == {
+        "profile": [
+            {"start_time": "2024-08-04 06:00:00", "arrival_time": "2024-08-04 06:40:00"},
+            {"start_time": "2024-08-04 06:05:00", "arrival_time": None},
+        ]
+    }
+    assert backwards.status_code == 422
+    mock_calculate_train_arrival_profile.assert_called_once()
+
+
+@pytest.mark.asyncio
+@patch(
+    "app.feature.train_times.services.TrainTimeService.get_next_departures",
+    new_callable=AsyncMock,
+)
+async def test_train_times_departures(mock_get_next_departures):
+    """Test the /traintimes/departures endpoint and its cursor validation."""
+    mock_get_next_departures.return_value = TrainDeparturesResponse(
+        departures=[
+            TrainDepartureEntry(departure_time="2024-08-04 15:40", arrival_time="2024-08-04 16:20")
+        ],
+        next_cursor="abc",
+    )
+    departures_request = {
+        "station_codes": ["LBG", "DFD"],
+        "start_time": "2024-08-04 15:30",
+        "max_wait_time": 120,
+        "limit": 1,
+    }
+
+    transport = ASGITransport(app=app)
+    async with AsyncClient(transport=transport, base_url="http://test") as ac:
+        response = await ac.post("/traintimes/departures", json=departures_request)
+        bad_cursor = await ac.post(
+            "/traintimes/departures", json={**departures_request, "cursor": "not a cursor"}
+        )
+
+    assert response.status_code == 200
+    assert response.json() == {
+        "departures": [
+            {"departure_time": "2024-08-04 15:40:00", "arrival_time": "2024-08-04 16:20:00"}
+        ],
+        "next_cursor": "abc",
+    }
+    assert bad_cursor.status_code == 422
+    mock_get_next_departures.assert_called_once()
+
+
+@pytest.mark.asyncio
+@patch("app.feature.train_times.services.TrainTimeService.stream_train_destination_arrival")
+async def test_train_times_stream(mock_stream):
+    """Test that /traintimes/stream writes one NDJSON line per leg and then the arrival."""
+
+    async def events():
+        yield TrainLegResult(
+            origin_station_code="LBG",
+            destination_station_code="DFD",
+            departure_time=datetime(2024, 8, 4, 15, 40),
+            arrival_time=datetime(2024, 8, 4, 16, 20),
+            cached=True,
+        )
+        yield TrainJourneyArrival(arrival_time=datetime(2024, 8, 4, 16, 20))
+
+    mock_stream.return_value = events()
+
+    transport = ASGITransport(app=app)
+    async with AsyncClient(transport=transport, base_url="http://test") as ac:
+        response = await ac.post("/traintimes/stream", json=mock_train_schedule)
+
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/x-ndjson"
+    assert response.text.splitlines() == [
+        '{"type":"leg","origin_station_code":"LBG","destination_station_code":"DFD",'
+        '"departure_time":"2024-08-04 15:40:00","arrival_time":"2024-08-04 16:20:00","cached":true}',
+        '{"type":"arrival","arrival_time":"2024-08-04 16:20:00"}',
+    ]
@@ -0,0 +1,277 @@
+import pytest
+from datetime import datetime, timedelta
+from sqlalchemy import event, inspect, text
+from app.connectors.db.db_connector import DatabaseConnector
+from app.connectors.db.models import TrainSchedule
+from app.connectors.train_api.models import TrainDeparture
+from app.utils.date_helpers import to_epoch_minutes
+
+DAY = datetime(2024, 8, 4)
+
+
+def departure(hour: int, minute: int = 0, uid: str = None, journey_minutes: int = 40):
+    departs = DAY.replace(hour=hour, minute=minute)
+    arrives = departs + timedelta(minutes=journey_minutes)
+    return TrainDeparture(
+        origin_station_code="LBG",
+        destination_station_code="DFD",
+        origin_expected_departure_time=departs,
+        origin_expected_arrival_time=arrives,
+        destination_aimed_arrival_time=arrives,
+        train_uid=uid,
+    )
+
+
+@pytest.fixture
+def db(tmp_path):
+    db = DatabaseConnector(database_url=f"sqlite:///{tmp_path / 'store.db'}")
+    db.create_db()
+    yield db
+    db.close()
+    db.engine.dispose()
+
+
+def minutes(*times):
+    return frozenset(to_epoch_minutes(DAY.replace(hour=hour, minute=minute)) for hour, minute in times)
+
+
+def departures_stored(db):
+    return [
+        (row.train_uid, row.origin_expected_departure_time.strftime("%H:%M"))
+        for row in db.session.query(TrainSchedule).order_by(
+            TrainSchedule.origin_expected_departure_time
+        )
+    ]
+
+
+def test_refetching_a_day_updates_rows_in_place(db):
+    """Test that a second full-day store updates changed trains instead of appending the day again."""
+    db.store_departures(
+        "LBG", "DFD", DAY, [departure(9, uid="A"), departure(10, uid="B")]
+    )
+
+    counts = db.store_departures(
+        "LBG", "DFD", DAY, [departure(9, 5, uid="A"), departure(11, uid="C")]
+    )
+
+    assert counts == (1, 1, 1, minutes((9, 0), (9, 5), (10, 0), (11, 0)))
+    assert departures_stored(db) == [("A", "09:05"), ("C", "11:00")]
+
+
+def test_window_store_only_touches_departures_on_the_board(db):
+    """Test that a window refresh leaves other departures alone and records the window."""
+    db.store_departures(
+        "LBG", "DFD", DAY, [departure(9, uid="A"), departure(18, uid="B")]
+    )
+    window = (DAY.replace(hour=8, minute=45), DAY.replace(hour=10))
+
+    counts = db.store_departures("LBG", "DFD", DAY, [departure(9, 2, uid="A")], window)
+
+    assert counts == (0, 1, 0, minutes((9, 0), (9, 2)))
+    assert departures_stored(db) == [("A", "09:02"), ("B", "18:00")]
+    assert db.get_window_refreshed_at(
+        "LBG", "DFD", DAY.replace(hour=9), DAY.replace(hour=10)
+    )
+    assert (
+        db.get_window_refreshed_at(
+            "LBG", "DFD", DAY.replace(hour=8), DAY.replace(hour=10)
+        )
+        is None
+    )
+
+
+def test_window_store_removes_departures_cancelled_inside_the_window(db):
+    """Test that a train missing from a window's board is removed, but only within the window."""
+    db.store_departures(
+        "LBG",
+        "DFD",
+        DAY,
+        [departure(8, 30, uid="A"), departure(9, uid="B"), departure(9, 30, uid="C")],
+    )
+    window = (DAY.replace(hour=8, minute=45), DAY.replace(hour=10))
+
+    # B was cancelled, and A departs before the window so isn't on its board
+    counts = db.store_departures("LBG", "DFD", DAY, [departure(9, 30, uid="C")], window)
+
+    assert counts == (0, 0, 1, minutes((9, 0)))
+    assert departures_stored(db) == [("A", "08:30"), ("C", "09:30")]
+
+
+def test_window_store_versions_only_the_ranges_holding_a_change(db):
+    """Test that the departure change log moves the ranges around a changed train and no others."""
+    db.store_departures("LBG", "DFD", DAY, [departure(9, uid="A"), departure(9, 30, uid="B")])
+    window = (DAY.replace(hour=8, minute=45), DAY.replace(hour=10))
+    around_a = ("LBG", "DFD", *sorted(minutes((8, 55), (9, 40))))
+    around_b = ("LBG", "DFD", *sorted(minutes((9, 25), (10, 10))))
+
+    # A full-day store leaves no change log, the day's tracker versions those
+    assert db.get_departure_change_ids([around_a, around_b]) == {around_a: 0, around_b: 0}
+
+    db.store_departures(
+        "LBG", "DFD", DAY, [departure(9, 5, uid="A"), departure(9, 30, uid="B")], window
+    )
+    changes = db.get_departure_change_ids([around_a, around_b])
+
+    assert changes[around_a] > 0
+    assert changes[around_b] == 0
+    # An unchanged board logs nothing
+    db.store_departures(
+        "LBG", "DFD", DAY, [departure(9, 5, uid="A"), departure(9, 30, uid="B")], window
+    )
+    assert db.get_departure_change_ids([around_a, around_b]) == changes
+
+
+def test_rows_without_uid_are_matched_by_time(db):
+    """Test that rows stored before train_uid existed are adopted rather than duplicated."""
+    db.add_train_schedule(
+        "LBG",
+        "DFD",
+        DAY.replace(hour=9),
+        DAY.replace(hour=9, minute=40),
+        DAY.replace(hour=9, minute=40),
+    )
+    db.add_train_schedule(
+        "LBG",
+        "DFD",
+        DAY.replace(hour=9),
+        DAY.replace(hour=9, minute=40),
+        DAY.replace(hour=9, minute=40),
+    )
+
+    counts = db.store_departures("LBG", "DFD", DAY, [departure(9, uid="A")])
+
+    # The duplicate from the old append-only ingest is dropped
+    assert counts[:3] == (0, 1, 1)
+    assert departures_stored(db) == [("A", "09:00")]
+
+
+def test_departures_arriving_before_they_leave_are_skipped(db):
+    """Test that a bad row is dropped instead of failing the whole transaction on the check constraint."""
+    counts = db.store_departures(
+        "LBG",
+        "DFD",
+        DAY,
+        [departure(9, uid="A", journey_minutes=0), departure(10, uid="B")],
+    )
+
+    assert counts == (1, 0, 0, minutes((10, 0)))
+    assert departures_stored(db) == [("B", "10:00")]
+
+
+def test_create_db_adds_columns_missing_from_older_databases(tmp_path):
+    """Test that an existing train_schedule table gains the train_uid column."""
+    db = DatabaseConnector(database_url=f"sqlite:///{tmp_path / 'old.db'}")
+    with db.engine.begin() as connection:
+        connection.execute(
+            text(
+                "CREATE TABLE train_schedule (id INTEGER PRIMARY KEY, origin_station_code VARCHAR NOT NULL, "
+                "destination_station_code VARCHAR NOT NULL, origin_expected_departure_time DATETIME NOT NULL, "
+                "origin_expected_arrival_time DATETIME NOT NULL, destination_aimed_arrival_time DATETIME NOT NULL)"
+            )
+        )
+
+    db.create_db()
+    db.store_departures("LBG", "DFD", DAY, [departure(9, uid="A")])
+
+    assert departures_stored(db) == [("A", "09:00")]
+    indexes = {index["name"] for index in inspect(db.engine).get_indexes("train_schedule")}
+    assert "ix_train_schedule_leg" in indexes
+    db.close()
+    db.engine.dispose()
+
+
+def test_add_api_call_trackers_marks_every_destination(db):
+    """Test that a board fetch marks each destination's day cached, refreshing existing rows."""
+    db.add_api_call_tracker("LBG", "DFD", DAY)
+    before = db.get_api_call_last_fetched("LBG", "DFD", DAY)
+
+    db.add_api_call_trackers("LBG", ["DFD", "LUT"], DAY.replace(hour=15))
+
+    assert db.has_recent_api_call("LBG", "LUT", DAY)
+    assert db.get_api_call_last_fetched("LBG", "DFD", DAY) >= before
+    assert not db.has_recent_api_call("LBG", "SEV", DAY)
+
+
+def count_queries(db):
+    statements = []
+    event.listen(db.engine, "before_cursor_execute", lambda *args: statements.append(args[2]))
+    return statements
+
+
+def test_coverage_of_a_journey_is_one_query_then_served_from_the_mirror(db):
+    """Test that coverage for many keys costs one query, and cached days none after that."""
+    db.add_api_call_trackers("LBG", ["DFD", "LUT"], DAY)
+    db.tracker_mirror.clear()
+    keys = [
+        (origin, destination, DAY + timedelta(days=day, hours=15))
+        for origin, destination in [("LBG", "DFD"), ("LBG", "LUT"), ("DFD", "LUT")]
+        for day in range(3)
+    ]
+    statements = count_queries(db)
+
+    coverage = db.get_coverage(keys)
+
+    assert len(statements) == 1
+    assert sorted(key for key, fetched in coverage.items() if fetched) == [
+        ("LBG", "DFD", DAY),
+        ("LBG", "LUT", DAY),
+    ]
+    assert len(coverage) == 9
+
+    statements.clear()
+    assert db.get_coverage(keys[:1]) == {("LBG", "DFD", DAY): coverage[("LBG", "DFD", DAY)]}
+    assert db.has_recent_api_call("LBG", "LUT", DAY.replace(hour=20))
+    assert statements == []
+
+
+def test_retention_drops_mirrored_days(db):
+    """Test that days removed by retention stop being reported as cached from the mirror."""
+    db.add_api_call_tracker("LBG", "DFD", DAY)
+    assert db.tracker_mirror.get(("LBG", "DFD", DAY)) is not None
+
+    db.delete_api_call_trackers_before(DAY + timedelta(days=1), limit=100)
+
+    assert not db.has_recent_api_call("LBG", "DFD", DAY)
+    assert db.get_coverage([("LBG", "DFD", DAY)]) == {("LBG", "DFD", DAY): None}
+
+
+def test_windows_are_merged_until_they_complete_the_day(db):
+    """Test that fetched windows merge per pair and report the fetch that covers the whole day."""
+    evening = (DAY.replace(hour=18), DAY + timedelta(days=1))
+
+    assert not db.add_coverage_interval("LBG", "DFD", *evening)
+    assert db.get_coverage_gaps("LBG", "DFD", DAY.replace(hour=17), DAY.replace(hour=23)) == [
+        (DAY.replace(hour=17), DAY.replace(hour=18))
+    ]
+    assert not db.add_coverage_interval("LBG", "DFD", DAY.replace(hour=6), DAY.replace(hour=18))
+    assert db.add_coverage_interval("LBG", "DFD", DAY, DAY.replace(hour=6))
+    assert not db.add_coverage_interval("LBG", "DFD", DAY, DAY.replace(hour=6))
+
+    # Read back by another worker, from the table
+    db.coverage_intervals.clear()
+    assert db.get_coverage_gaps("LBG", "DFD", DAY, DAY + timedelta(days=1)) == []
+    assert db.session.execute(text("SELECT count(*) FROM coverage_interval")).scalar() == 1
+
+
+def test_departure_pages_seek_past_the_previous_page(db):
+    """Test that keyset pages cover every departure once, ties included, via the leg index."""
+    db.store_departures(
+        "LBG",
+        "DFD",
+        DAY,
+        [departure(9, uid="A"), departure(9, uid="B"), departure(10, uid="C"), departure(11, uid="D")],
+    )
+    start, end = DAY.replace(hour=9), DAY.replace(hour=11)
+    queries = []
+    event.listen(db.engine, "before_cursor_execute", lambda *args: queries.append(args[2:4]))
+
+    first = db.get_departures_page("LBG", "DFD", start, end, 2)
+    last_id, last_departure, _ = first[-1]
+    second = db.get_departures_page("LBG", "DFD", start, end, 2, after=(last_departure, last_id))
+
+    assert [row[1].strftime("%H:%M") for row in first + second] == ["09:00", "09:00", "10:00"]
+    assert len({row[0] for row in first + second}) == 3
+    statement, parameters = queries[-1]
+    with db.engine.connect() as connection:
+        plan = connection.exec_driver_sql(f"EXPLAIN QUERY PLAN {statement}", parameters).all()
+    assert "ix_train_schedule_leg" in str(plan)
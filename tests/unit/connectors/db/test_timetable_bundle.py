@@ -0,0 +1,135 @@
+import gzip
+import json
+import pytest
+from datetime import datetime
+
+from app.connectors.db.db_connector import DatabaseConnector
+from app.connectors.db.timetable_bundle import (
+    SCHEDULE_FILE,
+    BundleDay,
+    BundleError,
+    days_from_captures,
+    export_bundle,
+    import_bundle,
+    read_bundle,
+    write_bundle,
+)
+
+DAY = datetime(2024, 8, 4)
+FETCHED = datetime(2024, 8, 4, 6, 30, 15, 250000)
+
+
+def departure(hour: int, minute: int = 0, uid: str = None):
+    departs = DAY.replace(hour=hour, minute=minute)
+    arrives = departs.replace(minute=minute + 40) if minute < 20 else departs.replace(hour=hour + 1)
+    return departs, arrives, arrives, uid
+
+
+def database(tmp_path, name: str) -> DatabaseConnector:
+    db = DatabaseConnector(database_url=f"sqlite:///{tmp_path / name}")
+    db.create_db()
+    return db
+
+
+@pytest.fixture
+def source(tmp_path):
+    db = database(tmp_path, "source.db")
+    db.import_days(
+        [
+            BundleDay("LBG", "DFD", DAY, FETCHED, [departure(9, uid="A"), departure(10)]),
+            BundleDay("DFD", "LUT", DAY, FETCHED, [departure(11, uid="C")]),
+        ]
+    )
+    yield db
+    db.close()
+    db.engine.dispose()
+
+
+def test_export_and_import_round_trip_cached_days(source, tmp_path):
+    """Test that a bundle carries each day's departures and last_fetched to a fresh database."""
+    assert export_bundle(source, str(tmp_path / "bundle")) == (2, 3)
+    target = database(tmp_path, "target.db")
+
+    assert import_bundle(target, str(tmp_path / "bundle")) == (2, 0, 3)
+
+    for origin, destination in [("LBG", "DFD"), ("DFD", "LUT")]:
+        assert target.get_day_departures(origin, destination, DAY) == source.get_day_departures(
+            origin, destination, DAY
+        )
+    assert target.get_api_call_versions([("LBG", "DFD", DAY)]) == {("LBG", "DFD", DAY): FETCHED}
+    assert target.has_recent_api_call("DFD", "LUT", DAY.replace(hour=15))
+    target.close()
+    target.engine.dispose()
+
+
+def test_import_keeps_days_fetched_more_recently_here(source, tmp_path):
+    """Test that a bundle replaces older local days but not ones fetched after it was made."""
+    export_bundle(source, str(tmp_path / "bundle"))
+    target = database(tmp_path, "target.db")
+    target.import_days(
+        [
+            BundleDay("LBG", "DFD", DAY, datetime(2024, 8, 5), [departure(9, 5, uid="A")]),
+            BundleDay("DFD", "LUT", DAY, datetime(2024, 8, 1), [departure(12)]),
+        ]
+    )
+
+    assert import_bundle(target, str(tmp_path / "bundle")) == (1, 1, 1)
+    assert [row[0] for row in target.get_day_departures("LBG", "DFD", DAY)] == [
+        DAY.replace(hour=9, minute=5)
+    ]
+    assert [row[0] for row in target.get_day_departures("DFD", "LUT", DAY)] == [
+        DAY.replace(hour=11)
+    ]
+    target.close()
+    target.engine.dispose()
+
+
+def test_departures_out_of_tracker_order_are_rejected(tmp_path):
+    """Test that a bundle whose departures don't line up with its trackers isn't half read."""
+    directory = str(tmp_path / "bundle")
+    write_bundle(directory, [BundleDay("LBG", "DFD", DAY, FETCHED, [departure(9)])])
+    with gzip.open(tmp_path / "bundle" / SCHEDULE_FILE, "at", encoding="utf-8") as file:
+        file.write("AAA,BBB,2024-08-04 09:00,2024-08-04 09:40,2024-08-04 09:40,\n")
+
+    with pytest.raises(BundleError):
+        list(read_bundle(directory))
+
+
+def test_captures_convert_to_the_latest_board_per_day(tmp_path):
+    """Test that saved API responses become whole days, latest capture first, empty boards skipped."""
+
+    def capture(name: str, trains: list):
+        board = {
+            "date": "2024-08-04",
+            "station_code": "crs:LBG",
+            "departures": {
+                "all": [
+                    {
+                        "train_uid": uid,
+                        "expected_departure_time": departs,
+                        "expected_arrival_time": departs,
+                        "station_detail": {
+                            "destination": {"station_code": "DFD", "aimed_arrival_time": arrives}
+                        },
+                    }
+                    for uid, departs, arrives in trains
+                ]
+            },
+        }
+        (tmp_path / name).write_text(json.dumps(board))
+
+    capture("LBG_TO_DFD_AT_2024-08-04 09:00:00_2025-03-12T01-00-00.000000_00-00.json", [("A", "09:00", "09:40")])
+    capture("LBG_TO_DFD_AT_2024-08-04 09:00:00_2025-03-12T02-00-00.000000_00-00.json", [("A", "09:05", "09:45")])
+    capture("LBG_TO_LUT_AT_2024-08-04 09:00:00_2025-03-12T02-00-00.000000_00-00.json", [])
+
+    days = list(days_from_captures(str(tmp_path / "*.json")))
+
+    assert days == [
+        BundleDay(
+            "LBG",
+            "DFD",
+            DAY,
+            datetime(2025, 3, 12, 2),
+            [(DAY.replace(hour=9, minute=5), DAY.replace(hour=9, minute=45), DAY.replace(hour=9, minute=45), "A")],
+        )
+    ]
@@ -0,0 +1,129 @@
+import asyncio
+import os
+import sqlite3
+
+import pytest
+import pytest_asyncio
+
+from app.connectors.shared_cache.factory import create_shared_cache
+from app.connectors.shared_cache.fake_redis import FakeRedisServer
+from app.connectors.shared_cache.local_cache import LocalSharedCache
+from app.connectors.shared_cache.redis_cache import RedisSharedCache
+from app.connectors.shared_cache.sqlite_cache import SQLiteSharedCache
+
+
+@pytest_asyncio.fixture(params=["local", "sqlite", "redis"])
+async def cache(request, tmp_path):
+    server = None
+    if request.param == "local":
+        backend = LocalSharedCache()
+    elif request.param == "sqlite":
+        backend = SQLiteSharedCache(str(tmp_path / "shared_cache.db"))
+    else:
+        server = await FakeRedisServer().start()
+        backend = RedisSharedCache(server.url)
+    yield backend
+    await backend.close()
+    if server is not None:
+        await server.stop()
+
+
+@pytest.mark.asyncio
+async def test_lock_is_exclusive_and_only_released_by_its_holder(cache):
+    assert await cache.acquire_lock("fetch", "first", ttl_seconds=5)
+    assert not await cache.acquire_lock("fetch", "second", ttl_seconds=5)
+    assert not await cache.release_lock("fetch", "second")
+
+    assert await cache.release_lock("fetch", "first")
+    assert await cache.acquire_lock("fetch", "second", ttl_seconds=5)
+
+
+@pytest.mark.asyncio
+async def test_expired_lock_can_be_taken_over(cache):
+    assert await cache.acquire_lock("fetch", "crashed", ttl_seconds=0.05)
+    await asyncio.sleep(0.1)
+    assert await cache.acquire_lock("fetch", "next", ttl_seconds=5)
+    assert not await cache.release_lock("fetch", "crashed")
+
+
+@pytest.mark.asyncio
+async def test_lock_context_serialises_holders(cache):
+    order = []
+
+    async def worker(name):
+        async with cache.lock("fetch", ttl_seconds=5, wait_seconds=5, poll_seconds=0.01) as acquired:
+            assert acquired
+            order.append(f"{name} in")
+            await asyncio.sleep(0.02)
+            order.append(f"{name} out")
+
+    await asyncio.gather(worker("a"), worker("b"))
+    assert order in (["a in", "a out", "b in", "b out"], ["b in", "b out", "a in", "a out"])
+
+
+def test_sqlite_backend_is_shared_between_connections(tmp_path):
+    path = str(tmp_path / "shared_cache.db")
+    worker_one, worker_two = SQLiteSharedCache(path), SQLiteSharedCache(path)
+
+    async def scenario():
+        assert await worker_one.acquire_lock("fetch", "one", ttl_seconds=5)
+        assert not await worker_two.acquire_lock("fetch", "two", ttl_seconds=5)
+        assert not await worker_two.release_lock("fetch", "two")
+        assert await worker_one.release_lock("fetch", "one")
+        assert await worker_two.acquire_lock("fetch", "two", ttl_seconds=5)
+
+    asyncio.run(scenario())
+
+
+def test_sqlite_backend_reconnects_in_a_forked_worker(tmp_path):
+    """Test that a worker forked from a process that used the cache opens its own connection."""
+    cache = SQLiteSharedCache(str(tmp_path / "shared_cache.db"))
+    asyncio.run(cache.acquire_lock("parent", "one", ttl_seconds=5))
+    inherited = cache._connection
+
+    pid = os.fork()
+    if pid == 0:
+        status = 1
+        try:
+            acquired = asyncio.run(cache.acquire_lock("child", "two", ttl_seconds=5))
+            status = 0 if acquired and cache._connection is not inherited else 1
+        finally:
+            os._exit(status)
+    _, status = os.waitpid(pid, 0)
+
+    assert os.waitstatus_to_exitcode(status) == 0
+    assert not asyncio.run(cache.acquire_lock("child", "three", ttl_seconds=5))
+    assert cache._connection is inherited
+
+
+@pytest.mark.asyncio
+async def test_sqlite_lock_waits_off_the_event_loop(tmp_path):
+    """Test that waiting on another worker's write lock leaves the loop free."""
+    path = str(tmp_path / "shared_cache.db")
+    cache = SQLiteSharedCache(path, busy_timeout_ms=500)
+    await cache.acquire_lock("warm", "one", ttl_seconds=5)
+    other_worker = sqlite3.connect(path, isolation_level=None)
+    other_worker.execute("BEGIN IMMEDIATE")
+    ticks = 0
+
+    async def tick():
+        nonlocal ticks
+        while True:
+            ticks += 1
+            await asyncio.sleep(0.01)
+
+    ticker = asyncio.create_task(tick())
+    try:
+        with pytest.raises(sqlite3.OperationalError):
+            await cache.acquire_lock("fetch", "one", ttl_seconds=5)
+    finally:
+        ticker.cancel()
+        other_worker.rollback()
+        other_worker.close()
+        await cache.close()
+    assert ticks > 10
+
+
+def test_create_shared_cache_rejects_unknown_backend():
+    with pytest.raises(ValueError):
+        create_shared_cache({"backend": "memcached"})
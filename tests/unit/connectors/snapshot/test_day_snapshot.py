@@ -0,0 +1,112 @@
+import pytest
+from datetime import datetime
+from app.connectors.snapshot.day_snapshot import DaySnapshot, SnapshotError, write_snapshot
+from app.connectors.snapshot.snapshot_store import MISSING, SnapshotStore
+from app.utils.date_helpers import to_epoch_minutes
+
+DAY = datetime(2024, 8, 4)
+
+
+def minutes(hour, minute, day=4):
+    return to_epoch_minutes(datetime(2024, 8, day, hour, minute))
+
+
+ROWS = [
+    ("LBG", "DFD", minutes(15, 45), minutes(16, 20), minutes(16, 20)),
+    ("LBG", "DFD", minutes(15, 30), minutes(16, 5), minutes(16, 5)),
+    ("LBG", "DFD", minutes(23, 50), minutes(0, 25, day=5), minutes(0, 25, day=5)),
+]
+
+
+@pytest.fixture
+def snapshot_path(tmp_path):
+    path = str(tmp_path / "LBG_DFD_2024-08-04.ttsnap")
+    write_snapshot(path, to_epoch_minutes(DAY), ROWS)
+    return path
+
+
+def test_snapshot_round_trip_sorted_by_departure(snapshot_path):
+    """Test that rows come back sorted by departure, with station codes resolved."""
+    snapshot = DaySnapshot(snapshot_path)
+
+    assert len(snapshot) == 3
+    assert snapshot.stations == ["DFD", "LBG"]
+    assert [snapshot.row(i) for i in range(3)] == sorted(ROWS, key=lambda row: row[2])
+    snapshot.close()
+
+
+def test_snapshot_columns_are_views_onto_the_mapped_file(snapshot_path):
+    """Test that loading maps the file rather than copying columns into Python objects."""
+    snapshot = DaySnapshot(snapshot_path)
+
+    assert isinstance(snapshot.departure_minutes, memoryview)
+    assert snapshot.departure_minutes.format == "i"
+    snapshot.close()
+
+
+def test_first_departure_between(snapshot_path):
+    snapshot = DaySnapshot(snapshot_path)
+
+    assert snapshot.first_departure_between(minutes(15, 31), minutes(16, 0)) == 1
+    assert snapshot.first_departure_between(minutes(16, 0), minutes(23, 0)) is None
+    snapshot.close()
+
+
+def test_corrupt_snapshot_fails_checksum(snapshot_path):
+    """Test that a flipped byte in the column data is detected."""
+    with open(snapshot_path, "r+b") as file:
+        file.seek(-1, 2)
+        last = file.read(1)
+        file.seek(-1, 2)
+        file.write(bytes([last[0] ^ 0xFF]))
+
+    with pytest.raises(SnapshotError):
+        DaySnapshot(snapshot_path)
+
+
+def test_truncated_snapshot_is_rejected(snapshot_path):
+    with open(snapshot_path, "r+b") as file:
+        file.truncate(30)
+
+    with pytest.raises(SnapshotError):
+        DaySnapshot(snapshot_path)
+
+
+def test_store_finds_first_departure_across_midnight(tmp_path):
+    """Test that a window spanning midnight needs both days and matches the DB query semantics."""
+    store = SnapshotStore(str(tmp_path))
+    store.write("LBG", "DFD", DAY, ROWS[2:])
+
+    assert (
+        store.find_first_departure("LBG", "DFD", datetime(2024, 8, 4, 23, 55), 60)
+        is MISSING
+    )
+
+    store.write("LBG", "DFD", datetime(2024, 8, 5), [])
+    assert store.find_first_departure("LBG", "DFD", datetime(2024, 8, 4, 23, 55), 60) is None
+
+    found = store.find_first_departure("LBG", "DFD", datetime(2024, 8, 4, 23, 49, 30), 60)
+    assert found[2] == datetime(2024, 8, 4, 23, 50)
+    assert found[4] == datetime(2024, 8, 5, 0, 25)
+
+
+def test_store_picks_up_rewritten_snapshots(tmp_path):
+    """Test that a snapshot rewritten on disk (e.g. by another worker) replaces the cached mapping."""
+    store = SnapshotStore(str(tmp_path))
+    store.write("LBG", "DFD", DAY, ROWS[:1])
+    assert len(store.get("LBG", "DFD", DAY)) == 1
+
+    other_worker = SnapshotStore(str(tmp_path))
+    other_worker.write("LBG", "DFD", DAY, ROWS)
+
+    assert len(store.get("LBG", "DFD", DAY)) == 3
+
+
+def test_store_purges_expired_days(tmp_path):
+    store = SnapshotStore(str(tmp_path))
+    store.write("LBG", "DFD", datetime(2024, 8, 3), ROWS)
+    store.write("LBG", "DFD", DAY, ROWS)
+
+    assert store.purge_before(DAY) == 1
+    assert store.get("LBG", "DFD", datetime(2024, 8, 3)) is None
+    assert store.get("LBG", "DFD", DAY) is not None
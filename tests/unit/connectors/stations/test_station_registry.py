@@ -0,0 +1,45 @@
+from unittest.mock import patch
+
+from app.connectors.stations.station_registry import StationRegistry
+
+MONOTONIC_TARGET = "app.connectors.stations.station_registry.time.monotonic"
+
+
+def test_bundled_dataset_knows_the_network():
+    """Test that the bundled CRS list loads and rejects codes that aren't stations."""
+    registry = StationRegistry()
+
+    assert len(registry.codes) > 100
+    assert registry.is_known("LBG") and registry.is_known("dfd")
+    assert not registry.is_known("XYZ")
+
+
+def test_codes_missing_from_a_partial_dataset_are_only_rejected_on_request():
+    """Test that real stations the bundled list lacks are accepted unless reject_unknown is set."""
+    assert not StationRegistry().rejects("EDN")
+    assert StationRegistry(reject_unknown=True).rejects("EDN")
+    assert not StationRegistry(reject_unknown=True).rejects("lbg")
+
+
+def test_missing_dataset_accepts_any_code(tmp_path):
+    """Test that a registry that couldn't load falls back to the format check alone."""
+    registry = StationRegistry(path=str(tmp_path / "missing.csv"))
+
+    assert registry.is_known("XYZ")
+
+
+def test_empty_pairs_expire_and_are_bounded(tmp_path):
+    """Test that negative entries last for the TTL and the oldest are evicted first."""
+    dataset = tmp_path / "stations.csv"
+    dataset.write_text("crs,name\nLBG,London Bridge\nDFD,Dartford\nLUT,Luton\n")
+    registry = StationRegistry(path=str(dataset), empty_pair_ttl_seconds=60, max_empty_pairs=2)
+
+    with patch(MONOTONIC_TARGET, return_value=1000.0):
+        registry.record_empty("LBG", "LUT")
+        registry.record_empty("DFD", "LUT")
+        registry.record_empty("LUT", "DFD")
+        assert registry.first_known_empty(["LBG", "LUT"]) is None
+        assert registry.first_known_empty(["LBG", "DFD", "LUT"]) == ("DFD", "LUT")
+
+    with patch(MONOTONIC_TARGET, return_value=1061.0):
+        assert not registry.is_known_empty("DFD", "LUT")
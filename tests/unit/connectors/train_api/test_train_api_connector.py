@@ -1,9 +1,14 @@
 import pytest
 import json
+import tracemalloc
 from datetime import datetime, timedelta
 from pathlib import Path
-from app.connectors.train_api.train_api_connector import map_api_response_to_model
+from app.connectors.train_api.train_api_connector import (
+    map_api_response_to_model,
+    map_calling_points_to_model,
+)
 from app.connectors.train_api.models import TrainStationData, TrainDeparture
+from benchmarks.upstream_stub import build_station_timetable
 
 TEST_DATA_PATH = "tests/data/test_train_api_responses.json"
 
@@ -43,3 +48,59 @@ def test_map_api_response_to_model(case_name, test_data):
             departure.destination_aimed_arrival_time.date()
             == datetime.fromisoformat(api_response["date"]).date()
         ), f"Test case '{case_name}' failed: Did not expect next-day adjustment, but it changed."
+
+
+def test_map_calling_points_to_model_fans_out_per_stop():
+    """Test that a whole-board response becomes one departure per station each train calls at."""
+    api_response = {
+        "date": "2024-08-03",
+        "request_time": "2024-08-03T12:00:00Z",
+        "station_code": "crs:LBG",
+        "departures": {
+            "all": [
+                {
+                    "train_uid": "P1",
+                    "expected_departure_time": "23:30",
+                    "expected_arrival_time": "23:28",
+                    "status": "ON TIME",
+                    "station_detail": {
+                        "calling_at": [
+                            {"station_code": "DFD", "aimed_arrival_time": "23:55"},
+                            {"station_code": "XXX", "aimed_arrival_time": None},
+                            {"station_code": "GRV", "aimed_arrival_time": "00:20"},
+                        ]
+                    },
+                }
+            ]
+        },
+    }
+
+    result = map_calling_points_to_model(api_response)
+
+    assert result.train_count == 1
+    assert [
+        (departure.destination_station_code, departure.destination_aimed_arrival_time)
+        for departure in result.departures
+    ] == [
+        ("DFD", datetime(2024, 8, 3, 23, 55)),
+        ("GRV", datetime(2024, 8, 4, 0, 20)),
+    ]
+    assert {departure.train_uid for departure in result.departures} == {"P1"}
+
+
+def test_mapped_board_stays_compact():
+    """Test that a full 1000 departure board maps into a few tens of KB, not an object per field."""
+    board = build_station_timetable("LBG", "DFD", "2024-08-04", departures=1000)
+    map_api_response_to_model(board)
+
+    tracemalloc.start()
+    try:
+        result = map_api_response_to_model(board)
+        current, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    assert len(result.departures) == 1000
+    # About 30 KB at the time of writing; a list of pydantic models took over 1 MB
+    assert current < 100_000
+    assert peak < 150_000
@@ -0,0 +1,162 @@
+import pytest
+from datetime import datetime
+from unittest.mock import AsyncMock, MagicMock
+
+from app.feature.train_times.models import TrainTimeRequest, TrainTimeResponse
+from app.feature.train_times.response_cache import (
+    ResponseCache,
+    etag_matches,
+    make_etag,
+    request_key,
+)
+from app.feature.train_times.services import TrainTimeService
+from app.utils.date_helpers import to_epoch_minutes
+
+
+DAY_KEY = ("LBG", "DFD", datetime(2024, 8, 4))
+VERSIONS = {DAY_KEY: datetime(2024, 8, 4, 9, 0)}
+# 15:30 to the 16:15 arrival
+RANGE_KEY = (
+    "LBG",
+    "DFD",
+    to_epoch_minutes(datetime(2024, 8, 4, 15, 30)),
+    to_epoch_minutes(datetime(2024, 8, 4, 16, 15)),
+)
+RANGES = {RANGE_KEY: 0}
+
+
+@pytest.fixture
+def request_body():
+    return TrainTimeRequest(
+        station_codes=["lbg", "DFD"], start_time="2024-08-04 15:30", max_wait_time=60
+    )
+
+
+def test_entry_is_dropped_when_a_day_it_read_is_refetched(request_body):
+    cache = ResponseCache()
+    key = request_key(request_body)
+    response = TrainTimeResponse(arrival_time=datetime(2024, 8, 4, 16, 15))
+    entry = cache.put(key, response, dict(VERSIONS), dict(RANGES))
+
+    assert cache.get(key, lambda keys: dict(VERSIONS), lambda keys: dict(RANGES)).etag == entry.etag
+    refetched = {DAY_KEY: datetime(2024, 8, 4, 12, 0)}
+    assert cache.get(key, lambda keys: refetched, lambda keys: dict(RANGES)) is None
+    assert cache.get(key, lambda keys: refetched, lambda keys: dict(RANGES)) is None
+
+
+def test_entry_is_dropped_when_a_departure_in_its_range_changes(request_body):
+    cache = ResponseCache()
+    key = request_key(request_body)
+    response = TrainTimeResponse(arrival_time=datetime(2024, 8, 4, 16, 15))
+    entry = cache.put(key, response, dict(VERSIONS), dict(RANGES))
+
+    # Another worker refreshed a window and changed a departure in the range
+    assert cache.get(key, lambda keys: dict(VERSIONS), lambda keys: {RANGE_KEY: 7}) is None
+    assert make_etag(key, VERSIONS, {RANGE_KEY: 7}) != entry.etag
+
+
+def test_recently_validated_entry_skips_the_version_lookup(request_body):
+    cache = ResponseCache(revalidate_seconds=60)
+    key = request_key(request_body)
+    cache.put(key, TrainTimeResponse(arrival_time=datetime(2024, 8, 4, 16, 15)), VERSIONS, RANGES)
+    current_versions, current_ranges = MagicMock(), MagicMock()
+
+    assert cache.get(key, current_versions, current_ranges) is not None
+    current_versions.assert_not_called()
+    current_ranges.assert_not_called()
+
+
+def test_invalidating_a_day_drops_only_the_entries_built_on_it(request_body):
+    cache = ResponseCache(revalidate_seconds=60)
+    response = TrainTimeResponse(arrival_time=datetime(2024, 8, 4, 16, 15))
+    other_day = ("DFD", "LUT", datetime(2024, 8, 4))
+    journey = request_key(request_body)
+    other = (("DFD", "LUT"), "2024-08-04 15:30", 60)
+    cache.put(journey, response, {**VERSIONS, other_day: datetime(2024, 8, 4, 9, 0)}, RANGES)
+    cache.put(other, response, {other_day: datetime(2024, 8, 4, 9, 0)}, {})
+
+    assert cache.invalidate_days([DAY_KEY]) == 1
+
+    assert not cache.contains(journey)
+    assert cache.contains(other)
+    assert cache.invalidate_days([DAY_KEY]) == 0
+
+
+def test_invalidating_departures_drops_only_the_entries_whose_range_holds_one(request_body):
+    cache = ResponseCache()
+    response = TrainTimeResponse(arrival_time=datetime(2024, 8, 4, 16, 15))
+    afternoon = request_key(request_body)
+    morning = (("LBG", "DFD"), "2024-08-04 09:00", 60)
+    morning_range = (
+        "LBG",
+        "DFD",
+        to_epoch_minutes(datetime(2024, 8, 4, 9, 0)),
+        to_epoch_minutes(datetime(2024, 8, 4, 9, 40)),
+    )
+    cache.put(afternoon, response, VERSIONS, RANGES)
+    cache.put(morning, response, VERSIONS, {morning_range: 0})
+
+    delayed = [to_epoch_minutes(datetime(2024, 8, 4, 15, 45))]
+    assert cache.invalidate_departures("DFD", "LBG", delayed) == 0
+    assert cache.invalidate_departures("LBG", "DFD", delayed) == 1
+
+    assert not cache.contains(afternoon)
+    assert cache.contains(morning)
+    # The range's end is exclusive
+    assert cache.invalidate_departures("LBG", "DFD", [morning_range[3]]) == 0
+
+
+def test_etag_matches_if_none_match_lists():
+    assert etag_matches('"abc", W/"def"', '"def"')
+    assert etag_matches("*", '"abc"')
+    assert not etag_matches('"abc"', '"def"')
+    assert not etag_matches(None, '"def"')
+
+
+@pytest.mark.asyncio
+async def test_service_serves_repeat_requests_from_the_response_cache(
+    request_body, monkeypatch
+):
+    cache = ResponseCache()
+    monkeypatch.setattr("app.feature.train_times.services.response_cache", cache)
+    db = MagicMock()
+    db.get_api_call_versions.return_value = dict(VERSIONS)
+    db.get_departure_change_ids.return_value = dict(RANGES)
+    service = TrainTimeService(db)
+    service._handle_train_schedule_check = AsyncMock(return_value=True)
+    service.fetch_train_schedule = MagicMock(
+        return_value=MagicMock(destination_aimed_arrival_time=datetime(2024, 8, 4, 16, 15))
+    )
+
+    first, etag = await service.get_train_destination_arrival(request_body)
+    second, repeat_etag = await service.get_train_destination_arrival(request_body)
+
+    assert etag is not None and repeat_etag == etag
+    assert second == first
+    service.fetch_train_schedule.assert_called_once()
+    assert db.get_api_call_versions.call_args_list[0].args[0] == [DAY_KEY]
+    assert db.get_departure_change_ids.call_args_list[0].args[0] == [RANGE_KEY]
+
+    # Forced refreshes always recompute
+    await service.get_train_destination_arrival(
+        request_body.model_copy(update={"force_cache_refresh": True})
+    )
+    assert service.fetch_train_schedule.call_count == 2
+
+
+@pytest.mark.asyncio
+async def test_service_does_not_cache_answers_from_uncached_days(request_body, monkeypatch):
+    cache = ResponseCache()
+    monkeypatch.setattr("app.feature.train_times.services.response_cache", cache)
+    db = MagicMock()
+    db.get_api_call_versions.return_value = {}
+    service = TrainTimeService(db)
+    service._handle_train_schedule_check = AsyncMock(return_value=True)
+    service.fetch_train_schedule = MagicMock(
+        return_value=MagicMock(destination_aimed_arrival_time=datetime(2024, 8, 4, 16, 15))
+    )
+
+    _, etag = await service.get_train_destination_arrival(request_body)
+
+    assert etag is None
+    assert not cache.contains(request_key(request_body))
@@ -1,10 +1,28 @@
+import asyncio
 import pytest
 from unittest.mock import AsyncMock, MagicMock, patch
 from datetime import datetime, timedelta, timezone
-from app.feature.train_times.services import TrainTimeService
-from app.feature.train_times.models import TrainTimeRequest, TrainTimeResponse
+from array import array
+from app.feature.train_times.services import (
+    TrainTimeService,
+    interval_coverage_config,
+    sweep_leg,
+)
+from app.feature.train_times.models import (
+    TrainDeparturesRequest,
+    TrainProfileRequest,
+    TrainTimeRequest,
+    TrainTimeResponse,
+)
+from app.feature.train_times.write_behind import WriteBehind
+from app.connectors.db.db_connector import StoredDepartures
 from app.connectors.db.models import TrainSchedule
-from app.utils.error_handler import TrainServiceError
+from app.connectors.db.tracker_mirror import TrackerMirror
+from app.connectors.stations.station_registry import station_registry
+from app.connectors.train_api.models import DepartureBatch
+from app.utils.date_helpers import to_epoch_minutes
+from app.utils.error_handler import TrainServiceError, UpstreamUnavailableError
+from app.utils.metrics import metrics
 
 
 # Opted to only test a few files, but in real world scenario ideally test most code and ensure coverage 80+
@@ -13,16 +31,40 @@ def mock_db_connector():
     mock_db = MagicMock()
     mock_db.get_train_schedule = MagicMock()
     mock_db.has_recent_api_call = MagicMock(return_value=False)
-    mock_db.add_train_schedule = MagicMock()
+    mock_db.get_coverage = MagicMock(return_value={})
+    # Nothing of the day fetched yet
+    mock_db.get_coverage_gaps = MagicMock(side_effect=lambda origin, destination, start, end: [(start, end)])
+    mock_db.add_coverage_interval = MagicMock(return_value=False)
+    mock_db.store_departures = MagicMock(return_value=StoredDepartures(0, 0, 0, frozenset()))
     mock_db.add_api_call_tracker = MagicMock()
+    mock_db.get_api_call_last_fetched = MagicMock(return_value=None)
+    mock_db.get_window_refreshed_at = MagicMock(return_value=None)
     return mock_db
 
 
+@pytest.fixture
+def whole_day_fetches():
+    with patch.dict(interval_coverage_config, {"enabled": False}):
+        yield
+
+
+@pytest.fixture
+def window_fetches():
+    with patch.dict(interval_coverage_config, {"enabled": True}):
+        yield
+
+
 @pytest.fixture
 def train_time_service(mock_db_connector):
     return TrainTimeService(mock_db_connector)
 
 
+@pytest.fixture(autouse=True)
+def clear_empty_pairs():
+    yield
+    station_registry.clear_empty()
+
+
 @pytest.fixture
 def mock_train_schedule():
     return TrainSchedule(
@@ -60,7 +102,7 @@ async def test_fetch_and_store_train_data(
         "LBG", "DFD", datetime(2024, 8, 4, 15, 30, tzinfo=timezone.utc)
     )
 
-    mock_db_connector.add_train_schedule.assert_called_once()
+    mock_db_connector.store_departures.assert_called_once()
     mock_db_connector.add_api_call_tracker.assert_called_once()
 
 
@@ -116,7 +158,7 @@ async def test_handle_train_schedule_check_no_refresh(
 
 @pytest.mark.asyncio
 async def test_handle_train_schedule_check_with_refresh(
-    train_time_service, mock_db_connector
+    train_time_service, mock_db_connector, whole_day_fetches
 ):
     """Test handling the train schedule check when cache does not exist (API call needed)."""
     mock_db_connector.has_recent_api_call.return_value = False
@@ -182,7 +224,7 @@ async def test_calculate_train_destination_arrival_past_midnight(
     )
 
     with patch.object(
-        train_time_service, "_handle_train_schedule_check", new=AsyncMock()
+        train_time_service, "_handle_train_schedule_check", new=AsyncMock(return_value=True)
     ) as mock_handle_check:
         result = await train_time_service.calculate_train_destination_arrival(request)
 
@@ -245,7 +287,7 @@ async def test_fetch_train_schedule_increasing_times(
     )
 
     with patch.object(
-        train_time_service, "_handle_train_schedule_check", new=AsyncMock()
+        train_time_service, "_handle_train_schedule_check", new=AsyncMock(return_value=True)
     ):
         await train_time_service.calculate_train_destination_arrival(request)
 
@@ -272,7 +314,7 @@ async def test_handle_train_schedule_check_multiple_days(train_time_service):
     """Test that _handle_train_schedule_check is called three times if train spans two extra days."""
 
     with patch.object(
-        train_time_service, "_handle_train_schedule_check", new=AsyncMock()
+        train_time_service, "_handle_train_schedule_check", new=AsyncMock(return_value=True)
     ) as mock_handle_check:
 
         request = TrainTimeRequest(
@@ -302,3 +344,558 @@ async def test_handle_train_schedule_check_multiple_days(train_time_service):
         assert (
             called_times[2].date() == datetime(2024, 8, 6).date()
         ), f"Expected third call on 2024-08-06, got {called_times[2].date()}"
+
+
+@pytest.mark.asyncio
+async def test_handle_train_schedule_check_records_cache_metrics(
+    train_time_service, mock_db_connector
+):
+    """Test that cache hits and misses are counted for the load generator reports."""
+    request = TrainTimeRequest(
+        station_codes=["LBG", "DFD"],
+        start_time="2024-08-04 15:30",
+        max_wait_time=60,
+        force_cache_refresh=False,
+    )
+    before = metrics.snapshot()
+
+    with patch.object(
+        train_time_service, "fetch_and_store_train_data", new=AsyncMock()
+    ):
+        mock_db_connector.has_recent_api_call.return_value = True
+        await train_time_service._handle_train_schedule_check(
+            request, "LBG", "DFD", datetime(2024, 8, 4, 16, 10)
+        )
+        mock_db_connector.has_recent_api_call.return_value = False
+        await train_time_service._handle_train_schedule_check(
+            request, "LBG", "DFD", datetime(2024, 8, 4, 16, 10)
+        )
+
+    after = metrics.snapshot()
+    assert after.get("cache_hit", 0) - before.get("cache_hit", 0) == 1
+    assert after.get("cache_miss", 0) - before.get("cache_miss", 0) == 1
+
+
+@pytest.mark.asyncio
+async def test_concurrent_misses_for_the_same_day_fetch_once(
+    train_time_service, mock_db_connector, whole_day_fetches
+):
+    """Test that requests missing the same day share one upstream fetch."""
+    request = TrainTimeRequest(
+        station_codes=["LBG", "DFD"],
+        start_time="2024-08-04 15:30",
+        max_wait_time=60,
+        force_cache_refresh=False,
+    )
+
+    async def slow_fetch(*args):
+        await asyncio.sleep(0.05)
+
+    with patch.object(
+        train_time_service, "fetch_and_store_train_data", new=AsyncMock(side_effect=slow_fetch)
+    ) as mock_fetch:
+        await asyncio.gather(
+            *(
+                train_time_service._handle_train_schedule_check(
+                    request, "LBG", "DFD", datetime(2024, 8, 4, 15, 30 + minute)
+                )
+                for minute in range(5)
+            )
+        )
+
+    mock_fetch.assert_awaited_once()
+
+
+@pytest.mark.asyncio
+async def test_fetch_is_cancelled_once_every_waiting_request_is(
+    train_time_service, mock_db_connector, whole_day_fetches
+):
+    """Test that a shared fetch outlives one cancelled request but stops when all are gone."""
+    upstream_calls = []
+
+    async def slow_fetch(*args):
+        upstream_calls.append(asyncio.current_task())
+        await asyncio.sleep(10)
+
+    with patch.object(
+        train_time_service, "fetch_and_store_train_data", new=AsyncMock(side_effect=slow_fetch)
+    ):
+        waiters = [
+            asyncio.ensure_future(
+                train_time_service._fetch_once("LBG", "DFD", datetime(2024, 8, 4, 15, 30), False)
+            )
+            for _ in range(2)
+        ]
+        await asyncio.sleep(0.01)
+        waiters[0].cancel()
+        await asyncio.sleep(0.01)
+        assert len(upstream_calls) == 1
+        assert not upstream_calls[0].done()
+
+        waiters[1].cancel()
+        await asyncio.wait(waiters)
+        await asyncio.sleep(0)
+
+    assert upstream_calls[0].cancelled()
+
+
+@pytest.mark.asyncio
+async def test_fetch_skipped_when_another_worker_fetched_while_waiting(
+    train_time_service, mock_db_connector
+):
+    """Test that the day is not refetched after the shared lock if it is now cached."""
+    mock_db_connector.get_api_call_last_fetched.return_value = datetime(2024, 8, 4, 15, 0)
+
+    with patch.object(
+        train_time_service, "fetch_and_store_train_data", new=AsyncMock()
+    ) as mock_fetch:
+        await train_time_service._fetch_once("LBG", "DFD", datetime(2024, 8, 4, 15, 30), False)
+        mock_fetch.assert_not_awaited()
+
+        # A forced refresh only trusts a fetch made after it started waiting
+        await train_time_service._fetch_once("LBG", "DFD", datetime(2024, 8, 4, 15, 30), True)
+        mock_fetch.assert_awaited_once()
+
+
+@pytest.mark.asyncio
+async def test_forced_refresh_serves_stale_data_when_upstream_is_down(
+    train_time_service, mock_db_connector
+):
+    """Test that a forced refresh falls back to already stored data during an outage."""
+    mock_db_connector.get_api_call_last_fetched.return_value = datetime(2024, 8, 4, 9, 0)
+
+    with patch.object(
+        train_time_service,
+        "fetch_and_store_train_data",
+        new=AsyncMock(side_effect=UpstreamUnavailableError("down")),
+    ):
+        await train_time_service._fetch_once("LBG", "DFD", datetime(2024, 8, 4, 15, 30), True)
+
+        mock_db_connector.get_api_call_last_fetched.return_value = None
+        with pytest.raises(UpstreamUnavailableError):
+            await train_time_service._fetch_once(
+                "LBG", "DFD", datetime(2024, 8, 4, 15, 30), True
+            )
+
+
+@pytest.mark.asyncio
+async def test_forced_refresh_of_cached_day_only_fetches_a_window(
+    train_time_service, mock_db_connector, patch_fetch_train_times
+):
+    """Test that forcing a refresh of a cached day fetches the leg's window and stores the diff."""
+    mock_db_connector.get_api_call_last_fetched.return_value = datetime(2024, 8, 4, 9, 0)
+    mock_db_connector.has_recent_api_call.return_value = True
+    delayed = frozenset({to_epoch_minutes(datetime(2024, 8, 4, 15, 40))})
+    mock_db_connector.store_departures.return_value = StoredDepartures(0, 1, 0, delayed)
+    patch_fetch_train_times.return_value = MagicMock(departures=[])
+
+    with patch.object(
+        train_time_service, "fetch_and_store_train_data", new=AsyncMock()
+    ) as mock_fetch_day, patch(
+        "app.feature.train_times.services.response_cache"
+    ) as response_cache:
+        await train_time_service._fetch_once(
+            "LBG",
+            "DFD",
+            datetime(2024, 8, 4, 15, 30),
+            True,
+            (datetime(2024, 8, 4, 15, 30), datetime(2024, 8, 4, 16, 30)),
+        )
+
+    mock_fetch_day.assert_not_awaited()
+    window = (datetime(2024, 8, 4, 15, 15), datetime(2024, 8, 4, 17, 0))
+    assert patch_fetch_train_times.await_args.kwargs["window"] == window
+    assert mock_db_connector.store_departures.call_args.args[4] == window
+    # Only the cached responses around the changed departure are dropped, the day's
+    # version is left alone
+    response_cache.invalidate_departures.assert_called_once_with("LBG", "DFD", delayed)
+    response_cache.invalidate_days.assert_not_called()
+    mock_db_connector.add_api_call_tracker.assert_not_called()
+
+
+@pytest.mark.asyncio
+async def test_forced_window_refresh_skipped_when_another_worker_refreshed_it(
+    train_time_service, mock_db_connector, patch_fetch_train_times
+):
+    """Test that a window refreshed while we waited for the shared lock isn't fetched again."""
+    mock_db_connector.get_api_call_last_fetched.return_value = datetime(2024, 8, 4, 9, 0)
+    mock_db_connector.get_window_refreshed_at.return_value = datetime(2099, 1, 1)
+
+    await train_time_service._fetch_once(
+        "LBG",
+        "DFD",
+        datetime(2024, 8, 4, 15, 30),
+        True,
+        (datetime(2024, 8, 4, 15, 30), datetime(2024, 8, 4, 16, 30)),
+    )
+
+    patch_fetch_train_times.assert_not_awaited()
+
+
+def board_departures(*departures):
+    batch = DepartureBatch("LBG")
+    for destination, hour in departures:
+        departs = to_epoch_minutes(datetime(2024, 8, 4, hour, 0))
+        batch.append(destination, departs, departs - 2, departs + 40)
+    return batch
+
+
+@pytest.mark.asyncio
+async def test_origin_mode_stores_every_destination_from_one_board(
+    train_time_service, mock_db_connector
+):
+    """Test that one board fetch is fanned out per destination and marks them all cached."""
+    board = MagicMock(
+        departures=board_departures(("DFD", 9), ("LUT", 9), ("DFD", 10)),
+        train_count=2,
+    )
+
+    with patch(
+        "app.feature.train_times.services.fetch_departure_board", new=AsyncMock(return_value=board)
+    ):
+        destinations = await train_time_service.fetch_and_store_origin_data(
+            "LBG", datetime(2024, 8, 4, 15, 30)
+        )
+
+    assert sorted(destinations) == ["DFD", "LUT"]
+    stored = {
+        call.args[1]: len(call.args[3])
+        for call in mock_db_connector.store_departures.call_args_list
+    }
+    assert stored == {"DFD": 2, "LUT": 1}
+    origin, covered, _ = mock_db_connector.add_api_call_trackers.call_args.args
+    assert origin == "LBG" and sorted(covered) == ["DFD", "LUT"]
+
+
+@pytest.mark.asyncio
+async def test_origin_mode_shares_one_fetch_across_destinations(
+    train_time_service, mock_db_connector
+):
+    """Test that concurrent misses for different destinations from one origin make one upstream call."""
+
+    async def slow_board(*args):
+        await asyncio.sleep(0.05)
+        return ["DFD", "LUT"]
+
+    with patch("app.feature.train_times.services.fetch_mode", "origin"), patch.object(
+        train_time_service, "fetch_and_store_origin_data", new=AsyncMock(side_effect=slow_board)
+    ) as mock_board, patch.object(
+        train_time_service, "fetch_and_store_train_data", new=AsyncMock()
+    ) as mock_pair:
+        await asyncio.gather(
+            train_time_service._fetch_once("LBG", "DFD", datetime(2024, 8, 4, 15, 30), False),
+            train_time_service._fetch_once("LBG", "LUT", datetime(2024, 8, 4, 16, 0), False),
+        )
+
+    mock_board.assert_awaited_once()
+    mock_pair.assert_not_awaited()
+
+
+@pytest.mark.asyncio
+async def test_origin_mode_falls_back_to_the_pair_when_the_board_is_truncated(
+    train_time_service, mock_db_connector
+):
+    """Test that a board at the API's departure limit isn't trusted and the single pair is fetched."""
+    board = MagicMock(departures=board_departures(("DFD", 9)), train_count=1000)
+
+    with patch("app.feature.train_times.services.fetch_mode", "origin"), patch(
+        "app.feature.train_times.services.fetch_departure_board", new=AsyncMock(return_value=board)
+    ), patch.object(
+        train_time_service, "fetch_and_store_train_data", new=AsyncMock()
+    ) as mock_pair:
+        await train_time_service.fetch_and_store_day("LBG", "DFD", datetime(2024, 8, 4, 15, 30))
+
+    mock_pair.assert_awaited_once()
+    mock_db_connector.add_api_call_trackers.assert_not_called()
+
+
+@pytest.mark.asyncio
+async def test_pair_without_trains_is_refused_until_forced(
+    train_time_service, mock_db_connector, patch_fetch_train_times, whole_day_fetches
+):
+    """Test that a pair the API had no trains for is answered without the DB or the API."""
+    patch_fetch_train_times.return_value = MagicMock(departures=[])
+    with pytest.raises(TrainServiceError):
+        await train_time_service.fetch_and_store_train_data(
+            "LBG", "DFD", datetime(2024, 8, 4, 15, 30)
+        )
+    request = TrainTimeRequest(
+        station_codes=["LUT", "LBG", "DFD"], start_time="2024-08-04 15:30", max_wait_time=60
+    )
+    mock_db_connector.reset_mock()
+
+    with pytest.raises(TrainServiceError, match="LBG to DFD"):
+        await train_time_service.get_train_destination_arrival(request)
+
+    mock_db_connector.has_recent_api_call.assert_not_called()
+    assert patch_fetch_train_times.await_count == 1
+    assert train_time_service.is_warm(request)
+
+    forced = request.model_copy(update={"force_cache_refresh": True})
+    with pytest.raises(TrainServiceError, match="No train data available for LUT"):
+        await train_time_service.get_train_destination_arrival(forced)
+    assert patch_fetch_train_times.await_count == 2
+
+
+def test_admission_priority_is_judged_from_memory(train_time_service, mock_db_connector):
+    """Test that is_warm never queries: a day the tracker mirror doesn't hold counts as cold."""
+    mock_db_connector.tracker_mirror = TrackerMirror()
+    request = TrainTimeRequest(
+        station_codes=["LBG", "DFD", "LUT"], start_time="2024-08-04 15:30", max_wait_time=60
+    )
+    day = datetime(2024, 8, 4)
+
+    mock_db_connector.tracker_mirror.put(("LBG", "DFD", day), datetime(2024, 8, 4, 6, 0))
+    assert not train_time_service.is_warm(request)
+
+    mock_db_connector.tracker_mirror.put(("DFD", "LUT", day), datetime(2024, 8, 4, 6, 0))
+    assert train_time_service.is_warm(request)
+    mock_db_connector.get_coverage.assert_not_called()
+    mock_db_connector.has_recent_api_call.assert_not_called()
+
+
+@pytest.mark.asyncio
+async def test_multi_leg_cache_check_is_one_coverage_lookup(
+    train_time_service, mock_db_connector
+):
+    """Test that every leg and day of a journey is checked with a single coverage call."""
+    fetched = datetime(2024, 8, 4, 9, 0)
+    mock_db_connector.get_coverage.side_effect = lambda keys: {key: fetched for key in keys}
+    mock_db_connector.get_train_schedule.return_value = TrainSchedule(
+        origin_station_code="LBG",
+        destination_station_code="DFD",
+        origin_expected_departure_time=datetime(2024, 8, 4, 23, 45),
+        origin_expected_arrival_time=datetime(2024, 8, 5, 0, 20),
+        destination_aimed_arrival_time=datetime(2024, 8, 5, 0, 20),
+    )
+    request = TrainTimeRequest(
+        station_codes=["LBG", "DFD", "LUT"], start_time="2024-08-04 23:30", max_wait_time=60
+    )
+
+    with patch.object(
+        train_time_service, "fetch_and_store_train_data", new=AsyncMock()
+    ) as mock_fetch:
+        await train_time_service.calculate_train_destination_arrival(request)
+
+    mock_db_connector.get_coverage.assert_called_once()
+    keys = set(mock_db_connector.get_coverage.call_args.args[0])
+    assert ("DFD", "LUT", datetime(2024, 8, 5)) in keys
+    mock_db_connector.has_recent_api_call.assert_not_called()
+    mock_fetch.assert_not_awaited()
+
+
+@pytest.mark.asyncio
+async def test_uncached_day_fetches_only_the_missing_window(
+    train_time_service, mock_db_connector, patch_fetch_train_times, window_fetches
+):
+    """Test that a late-evening miss fetches the uncovered part of its window, not whole days."""
+    patch_fetch_train_times.return_value = MagicMock(departures=[])
+    mock_db_connector.get_coverage_gaps.side_effect = lambda origin, destination, start, end: [
+        gap for gap in [(start, datetime(2024, 8, 4, 23, 0))] if gap[0] < gap[1]
+    ]
+    request = TrainTimeRequest(
+        station_codes=["LBG", "DFD"], start_time="2024-08-04 22:10", max_wait_time=30
+    )
+
+    with patch.object(
+        train_time_service, "fetch_and_store_train_data", new=AsyncMock()
+    ) as mock_fetch_day:
+        await asyncio.gather(
+            train_time_service._handle_train_schedule_check(
+                request, "LBG", "DFD", datetime(2024, 8, 4, 22, 10)
+            ),
+            train_time_service._handle_train_schedule_check(
+                request, "LBG", "DFD", datetime(2024, 8, 4, 22, 25)
+            ),
+        )
+
+    mock_fetch_day.assert_not_awaited()
+    # Both requests need 22:00 to midnight, of which 23:00 onwards is already covered
+    patch_fetch_train_times.assert_awaited_once()
+    window = (datetime(2024, 8, 4, 22, 0), datetime(2024, 8, 4, 23, 0))
+    assert patch_fetch_train_times.await_args.kwargs["window"] == window
+    mock_db_connector.add_coverage_interval.assert_called_once_with("LBG", "DFD", *window)
+    mock_db_connector.add_api_call_tracker.assert_not_called()
+
+
+@pytest.mark.asyncio
+async def test_cold_miss_is_answered_before_the_fetch_is_stored(
+    train_time_service, mock_db_connector, patch_fetch_train_times, window_fetches
+):
+    """Test that with write-behind running a miss is answered from the fetched departures, stored afterwards."""
+    departures = DepartureBatch("LBG")
+    departures.append(
+        "DFD",
+        to_epoch_minutes(datetime(2024, 8, 4, 15, 40)),
+        to_epoch_minutes(datetime(2024, 8, 4, 16, 20)),
+        to_epoch_minutes(datetime(2024, 8, 4, 16, 20)),
+    )
+    patch_fetch_train_times.return_value = MagicMock(departures=departures)
+    writer = WriteBehind(linger_seconds=60)
+    await writer.start()
+    request = TrainTimeRequest(
+        station_codes=["LBG", "DFD"], start_time="2024-08-04 15:30", max_wait_time=60
+    )
+
+    with patch("app.feature.train_times.services.write_behind", writer):
+        response = await train_time_service.calculate_train_destination_arrival(request)
+        stored_before_answer = mock_db_connector.store_departures.called
+        await writer.stop()
+
+    assert response.arrival_time == datetime(2024, 8, 4, 16, 20)
+    assert not stored_before_answer
+    mock_db_connector.get_train_schedule.assert_not_called()
+    mock_db_connector.store_departures.assert_called_once()
+    mock_db_connector.add_coverage_interval.assert_called_once()
+
+
+def test_sweep_leg_matches_a_lookup_per_start():
+    """Test that the merge pass picks the same train a per-start lookup would, in any start order."""
+    departures = array("i", [600, 610, 610, 650])
+    arrivals = array("i", [640, 660, 655, 700])
+
+    arrived = sweep_leg([615, None, 600, 605, 640, 651], departures, arrivals, 10)
+
+    # 640 waits until 650, which is outside its 10 minute window
+    assert arrived == [None, None, 640, 660, None, None]
+
+
+@pytest.mark.asyncio
+async def test_profile_loads_each_leg_once_for_every_start_time(
+    train_time_service, mock_db_connector
+):
+    """Test that a profile reads each leg's timetable once and chains the arrivals leg to leg."""
+    mock_db_connector.has_recent_api_call.return_value = True
+    timetables = {
+        ("LBG", "DFD"): [
+            (datetime(2024, 8, 4, 6, 10), datetime(2024, 8, 4, 6, 40)),
+            (datetime(2024, 8, 4, 6, 25), datetime(2024, 8, 4, 6, 55)),
+        ],
+        ("DFD", "LUT"): [
+            (datetime(2024, 8, 4, 6, 45), datetime(2024, 8, 4, 7, 30)),
+            (datetime(2024, 8, 4, 7, 15), datetime(2024, 8, 4, 8, 0)),
+        ],
+    }
+    mock_db_connector.get_departure_times.side_effect = (
+        lambda origin, destination, start, end: timetables[(origin, destination)]
+    )
+    request = TrainProfileRequest(
+        station_codes=["LBG", "DFD", "LUT"],
+        earliest_start_time="2024-08-04 06:00",
+        latest_start_time="2024-08-04 06:30",
+        step_minutes=10,
+        max_wait_time=25,
+    )
+
+    response = await train_time_service.calculate_train_arrival_profile(request)
+
+    assert [entry.arrival_time for entry in response.profile] == [
+        datetime(2024, 8, 4, 7, 30),
+        datetime(2024, 8, 4, 7, 30),
+        # Reaches DFD at 06:55, too late for the 06:45
+        datetime(2024, 8, 4, 8, 0),
+        # Nothing leaves LBG between 06:30 and 06:55
+        None,
+    ]
+    assert mock_db_connector.get_departure_times.call_count == 2
+    mock_db_connector.get_train_schedule.assert_not_called()
+
+
+@pytest.mark.asyncio
+async def test_next_departures_pages_with_a_cursor_and_stops_when_full(
+    train_time_service, mock_db_connector
+):
+    """Test that a page reads only the days it needs and the cursor resumes after it."""
+    mock_db_connector.has_recent_api_call.return_value = True
+    # 22:30 to 00:30, crossing midnight
+    timetable = [
+        (row_id, datetime(2024, 8, 4, 22, 0) + timedelta(minutes=30 * row_id))
+        for row_id in range(1, 6)
+    ]
+
+    def get_departures_page(origin, destination, start, end, limit, after=None):
+        rows = [
+            (row_id, departure, departure + timedelta(minutes=40))
+            for row_id, departure in timetable
+            if start <= departure < end and (after is None or (departure, row_id) > after)
+        ]
+        return rows[:limit]
+
+    mock_db_connector.get_departures_page.side_effect = get_departures_page
+    request = TrainDeparturesRequest(
+        station_codes=["LBG", "DFD"], start_time="2024-08-04 22:00", max_wait_time=600, limit=2
+    )
+
+    first = await train_time_service.get_next_departures(request)
+    # The first day alone fills the first page, the next day isn't looked at
+    assert mock_db_connector.has_recent_api_call.call_count == 1
+    assert mock_db_connector.get_departures_page.call_count == 1
+    second = await train_time_service.get_next_departures(
+        request.model_copy(update={"cursor": first.next_cursor})
+    )
+    last = await train_time_service.get_next_departures(
+        request.model_copy(update={"cursor": second.next_cursor})
+    )
+
+    assert [entry.departure_time.strftime("%H:%M") for entry in first.departures] == [
+        "22:30",
+        "23:00",
+    ]
+    assert [entry.departure_time.strftime("%H:%M") for entry in second.departures] == [
+        "23:30",
+        "00:00",
+    ]
+    assert [entry.departure_time.strftime("%H:%M") for entry in last.departures] == ["00:30"]
+    assert last.next_cursor is None
+
+
+@pytest.mark.asyncio
+async def test_stream_yields_each_leg_then_the_arrival(train_time_service, mock_db_connector):
+    """Test that a streamed journey reports each leg, cached or not, before the final arrival."""
+    request = TrainTimeRequest(
+        station_codes=["LBG", "DFD", "LUT"], start_time="2024-08-04 15:30", max_wait_time=60
+    )
+    mock_db_connector.get_train_schedule.side_effect = [
+        TrainSchedule(
+            origin_station_code="LBG",
+            destination_station_code="DFD",
+            origin_expected_departure_time=datetime(2024, 8, 4, 15, 40),
+            destination_aimed_arrival_time=datetime(2024, 8, 4, 16, 20),
+        ),
+        TrainSchedule(
+            origin_station_code="DFD",
+            destination_station_code="LUT",
+            origin_expected_departure_time=datetime(2024, 8, 4, 16, 30),
+            destination_aimed_arrival_time=datetime(2024, 8, 4, 17, 10),
+        ),
+    ]
+
+    with patch.object(
+        train_time_service,
+        "_handle_train_schedule_check",
+        new=AsyncMock(side_effect=[True, False]),
+    ):
+        events = [
+            event.model_dump()
+            async for event in train_time_service.stream_train_destination_arrival(request)
+        ]
+
+    assert events == [
+        {
+            "type": "leg",
+            "origin_station_code": "LBG",
+            "destination_station_code": "DFD",
+            "departure_time": "2024-08-04 15:40:00",
+            "arrival_time": "2024-08-04 16:20:00",
+            "cached": True,
+        },
+        {
+            "type": "leg",
+            "origin_station_code": "DFD",
+            "destination_station_code": "LUT",
+            "departure_time": "2024-08-04 16:30:00",
+            "arrival_time": "2024-08-04 17:10:00",
+            "cached": False,
+        },
+        {"type": "arrival", "arrival_time": "2024-08-04 17:10:00"},
+    ]
@@ -0,0 +1,119 @@
+import asyncio
+import pytest
+from datetime import datetime
+from unittest.mock import MagicMock
+from app.connectors.train_api.models import DepartureBatch
+from app.feature.train_times.write_behind import PendingDepartures, WriteBehind
+from app.utils.date_helpers import to_epoch_minutes
+from app.utils.metrics import metrics
+
+WINDOW = (datetime(2024, 8, 4, 15, 0), datetime(2024, 8, 4, 18, 0))
+
+
+def batch(*departures):
+    departures_batch = DepartureBatch("LBG")
+    for departure, arrival in departures:
+        departures_batch.append(
+            "DFD", to_epoch_minutes(departure), to_epoch_minutes(arrival), to_epoch_minutes(arrival)
+        )
+    return departures_batch
+
+
+def pending(window, *departures):
+    return [PendingDepartures("LBG", "DFD", window, batch(*departures))]
+
+
+@pytest.mark.asyncio
+async def test_queued_departures_are_served_until_persisted():
+    """Test that a submitted fetch answers searches straight away and is stored by the writer."""
+    writer = WriteBehind(linger_seconds=0)
+    await writer.start()
+    persist = MagicMock()
+    departure = (datetime(2024, 8, 4, 15, 40), datetime(2024, 8, 4, 16, 20))
+
+    await writer.submit(pending(WINDOW, departure), persist)
+    record = writer.find_first_departure("LBG", "DFD", datetime(2024, 8, 4, 15, 30), 60)
+    await writer.wait_for("LBG", "DFD")
+
+    assert record.origin_expected_departure_time == departure[0]
+    assert record.origin_expected_arrival_time == departure[1]
+    persist.assert_called_once()
+    assert writer.find_first_departure("LBG", "DFD", datetime(2024, 8, 4, 15, 30), 60) is None
+    assert writer.gaps("LBG", "DFD", *WINDOW) == [WINDOW]
+    await writer.stop()
+
+
+@pytest.mark.asyncio
+async def test_queued_windows_answer_only_the_times_they_cover():
+    """Test that queued windows only answer for the times they cover, and newer fetches win."""
+    writer = WriteBehind()
+    await writer.start()
+    await writer.submit(
+        pending(WINDOW, (datetime(2024, 8, 4, 15, 40), datetime(2024, 8, 4, 16, 20))), MagicMock()
+    )
+    # A later refresh found the 15:40 now leaves at 15:55
+    await writer.submit(
+        pending(
+            (datetime(2024, 8, 4, 15, 30), datetime(2024, 8, 4, 16, 30)),
+            (datetime(2024, 8, 4, 15, 55), datetime(2024, 8, 4, 16, 35)),
+        ),
+        MagicMock(),
+    )
+
+    # The rest of that search has to come from the stored rows
+    assert writer.gaps("LBG", "DFD", datetime(2024, 8, 4, 17, 30), datetime(2024, 8, 4, 18, 30)) == [
+        (datetime(2024, 8, 4, 18, 0), datetime(2024, 8, 4, 18, 30))
+    ]
+    record = writer.find_first_departure("LBG", "DFD", datetime(2024, 8, 4, 15, 30), 60)
+    assert record.origin_expected_departure_time == datetime(2024, 8, 4, 15, 55)
+    assert writer.find_first_departure("LBG", "DFD", datetime(2024, 8, 4, 16, 0), 60) is None
+    await writer.stop()
+
+
+@pytest.mark.asyncio
+async def test_stop_flushes_queued_writes():
+    """Test that shutting down stores writes the writer hadn't got to yet."""
+    writer = WriteBehind(linger_seconds=60)
+    await writer.start()
+    persists = [MagicMock(), MagicMock()]
+    for persist in persists:
+        await writer.submit(pending(WINDOW), persist)
+    await asyncio.sleep(0)
+
+    await writer.stop()
+
+    for persist in persists:
+        persist.assert_called_once()
+    assert writer.gaps("LBG", "DFD", *WINDOW) == [WINDOW]
+
+
+@pytest.mark.asyncio
+async def test_full_queue_holds_back_submits_and_failures_are_dropped():
+    """Test backpressure on a full queue, and that a failed write stops being served."""
+    metrics.reset()
+    writer = WriteBehind(max_queued_writes=1, linger_seconds=0)
+    await writer.start()
+    failing = MagicMock(side_effect=RuntimeError("disk full"))
+    persist = MagicMock()
+
+    await writer.submit(pending(WINDOW), failing)
+    await writer.submit(pending(WINDOW), persist)
+    await writer.wait_for("LBG")
+
+    assert metrics.get("write_behind_backpressure") == 1
+    assert metrics.get("write_behind_failed") == 1
+    persist.assert_called_once()
+    assert writer.gaps("LBG", "DFD", *WINDOW) == [WINDOW]
+    await writer.stop()
+
+
+@pytest.mark.asyncio
+async def test_writes_inline_when_the_writer_is_not_running():
+    """Test that scripts and tests without the lifespan still store synchronously."""
+    writer = WriteBehind()
+    persist = MagicMock()
+
+    await writer.submit(pending(WINDOW), persist)
+
+    persist.assert_called_once()
+    assert len(writer) == 0
@@ -0,0 +1,146 @@
+import pytest
+from unittest.mock import AsyncMock, MagicMock
+from datetime import datetime
+from app.connectors.shared_cache.local_cache import LocalSharedCache
+from app.jobs.cache_warmer import CacheWarmer
+from app.utils.error_handler import TrainServiceError
+from app.utils.metrics import RouteHistory
+
+
+@pytest.fixture(autouse=True)
+def shared_cache(monkeypatch):
+    cache = LocalSharedCache()
+    monkeypatch.setattr("app.jobs.cache_warmer.shared_cache", cache)
+    return cache
+
+
+@pytest.fixture
+def mock_db_connector():
+    mock_db = MagicMock()
+    mock_db.get_popular_routes = MagicMock(return_value=[("DFD", "LUT", 3)])
+    mock_db.has_recent_api_call = MagicMock(return_value=False)
+    return mock_db
+
+
+@pytest.fixture
+def history():
+    history = RouteHistory()
+    for _ in range(5):
+        history.record("LBG", "DFD")
+    return history
+
+
+def make_warmer(mock_db_connector, history, **settings):
+    settings = {"days_ahead": 1, "min_seconds_between_calls": 0, **settings}
+    warmer = CacheWarmer(mock_db_connector, settings, history=history)
+    warmer.service = MagicMock()
+    warmer.service.fetch_day_once = AsyncMock()
+    return warmer
+
+
+def test_hot_routes_combines_history_and_tracker(mock_db_connector, history):
+    """Test that request history outranks routes that were only fetched a few times."""
+    warmer = make_warmer(mock_db_connector, history)
+
+    assert warmer.hot_routes() == [("LBG", "DFD"), ("DFD", "LUT")]
+
+
+@pytest.mark.asyncio
+async def test_run_once_fetches_missing_days_and_reports_coverage(
+    mock_db_connector, history
+):
+    """Test that only uncovered route-days are fetched, today first, and coverage is reported."""
+    mock_db_connector.has_recent_api_call.side_effect = (
+        lambda origin, destination, day: (origin, destination) == ("DFD", "LUT")
+    )
+    warmer = make_warmer(mock_db_connector, history)
+
+    report = await warmer.run_once()
+
+    calls = warmer.service.fetch_day_once.call_args_list
+    assert [call.args[:2] for call in calls] == [("LBG", "DFD"), ("LBG", "DFD")]
+    assert calls[0].args[2] < calls[1].args[2]
+    assert calls[0].args[2] == datetime.now().replace(
+        hour=0, minute=0, second=0, microsecond=0
+    )
+    assert report["keys"] == 4
+    assert report["already_warm"] == 2
+    assert report["fetched"] == 2
+    assert report["coverage"] == 1.0
+
+
+@pytest.mark.asyncio
+async def test_run_once_respects_call_budget(mock_db_connector, history):
+    """Test that the warmer stops once max_calls_per_run upstream calls were made, failures included."""
+    warmer = make_warmer(mock_db_connector, history, max_calls_per_run=2)
+    warmer.service.fetch_day_once.side_effect = [
+        TrainServiceError("No train data"),
+        None,
+    ]
+
+    report = await warmer.run_once()
+
+    assert warmer.service.fetch_day_once.call_count == 2
+    assert report["failed"] == 1
+    assert report["fetched"] == 1
+    assert report["coverage"] == 0.25
+
+
+@pytest.mark.asyncio
+async def test_run_once_skips_days_covered_by_an_earlier_board_fetch(
+    mock_db_connector, history
+):
+    """Test that a route-day stored by another route's board fetch costs no extra call."""
+    mock_db_connector.get_popular_routes.return_value = [("LBG", "LUT", 3)]
+    covered = set()
+    mock_db_connector.has_recent_api_call.side_effect = (
+        lambda origin, destination, day: (origin, destination, day) in covered
+    )
+    warmer = make_warmer(mock_db_connector, history, days_ahead=0)
+
+    async def fetch_board(origin, destination, day):
+        covered.update({("LBG", "DFD", day), ("LBG", "LUT", day)})
+
+    warmer.service.fetch_day_once.side_effect = fetch_board
+
+    report = await warmer.run_once()
+
+    assert warmer.service.fetch_day_once.call_count == 1
+    assert report["covered_by_board"] == 1
+    assert report["coverage"] == 1.0
+
+
+@pytest.mark.asyncio
+async def test_run_once_skips_days_queued_for_writing(mock_db_connector, history, monkeypatch):
+    """Test that a board fetch whose rows are still queued by write-behind counts as covering the day."""
+    mock_db_connector.get_popular_routes.return_value = [("LBG", "LUT", 3)]
+    queued = set()
+    monkeypatch.setattr(
+        "app.jobs.cache_warmer.write_behind.covers",
+        lambda origin, destination, start, end: (origin, destination, start) in queued,
+    )
+    warmer = make_warmer(mock_db_connector, history, days_ahead=0)
+
+    async def fetch_board(origin, destination, day):
+        queued.update({("LBG", "DFD", day), ("LBG", "LUT", day)})
+
+    warmer.service.fetch_day_once.side_effect = fetch_board
+
+    report = await warmer.run_once()
+
+    assert warmer.service.fetch_day_once.call_count == 1
+    assert report["covered_by_board"] == 1
+
+
+@pytest.mark.asyncio
+async def test_route_days_are_warmed_by_one_worker_per_interval(mock_db_connector, history):
+    """Test that another worker's warmer leaves route-days this one claimed alone."""
+    warmer = make_warmer(mock_db_connector, history)
+    other_worker = make_warmer(mock_db_connector, history)
+
+    await warmer.run_once()
+    report = await other_worker.run_once()
+
+    assert warmer.service.fetch_day_once.call_count == 4
+    other_worker.service.fetch_day_once.assert_not_awaited()
+    assert report["warmed_elsewhere"] == 4
@@ -0,0 +1,121 @@
+import pytest
+from datetime import datetime
+from unittest.mock import AsyncMock, MagicMock
+
+from app.connectors.db.db_connector import DatabaseConnector
+from app.connectors.shared_cache.local_cache import LocalSharedCache
+from app.feature.train_times.models import TrainTimeRequest
+from app.feature.train_times.response_cache import ResponseCache, request_key
+from app.feature.train_times.services import TrainTimeService
+from app.jobs.live_updates import LiveUpdatePoller
+from app.utils.metrics import RouteHistory
+from benchmarks.upstream_stub import UpstreamStub
+
+TODAY = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
+NOW = TODAY.replace(hour=8, minute=55)
+
+
+@pytest.fixture(autouse=True)
+def shared_cache(monkeypatch):
+    cache = LocalSharedCache()
+    monkeypatch.setattr("app.jobs.live_updates.shared_cache", cache)
+    return cache
+
+
+def history(*legs):
+    history = RouteHistory()
+    for leg in legs:
+        history.record(*leg)
+    return history
+
+
+@pytest.mark.asyncio
+async def test_only_hot_legs_with_fetched_departures_are_polled_once_per_interval():
+    window = (TODAY.replace(hour=8, minute=40), TODAY.replace(hour=10, minute=55))
+    db = MagicMock()
+    db.get_coverage.return_value = {
+        ("LBG", "DFD", TODAY): datetime(2024, 8, 4, 6, 0),
+        ("DFD", "LUT", TODAY): None,
+        ("LUT", "DFD", TODAY): None,
+    }
+    # DFD to LUT has part of the window fetched, LUT to DFD none of it
+    db.get_coverage_gaps.side_effect = lambda origin, destination, start, end: (
+        [(start, window[0].replace(hour=9))] if origin == "DFD" else [(start, end)]
+    )
+    # The latest departure change on the day, before and after each poll
+    db.get_departure_change_ids.side_effect = [{"day": 3}, {"day": 5}, {"day": 0}, {"day": 0}]
+    poller = LiveUpdatePoller(
+        db,
+        {"min_seconds_between_calls": 0},
+        history=history(("LBG", "DFD"), ("LBG", "DFD"), ("DFD", "LUT"), ("LUT", "DFD")),
+    )
+    poller.service.refresh_train_data_window = AsyncMock()
+
+    report = await poller.run_once(now=NOW)
+
+    assert [call.args for call in poller.service.refresh_train_data_window.await_args_list] == [
+        ("LBG", "DFD", window),
+        ("DFD", "LUT", window),
+    ]
+    assert report["hot_keys"] == 2
+    assert (report["polled"], report["changed"]) == (2, 1)
+
+    # Claimed for the interval, so another worker's poller leaves it alone
+    other_worker = LiveUpdatePoller(db, {}, history=history(("LBG", "DFD")))
+    other_worker.service.refresh_train_data_window = AsyncMock()
+    report = await other_worker.run_once(now=NOW)
+
+    other_worker.service.refresh_train_data_window.assert_not_awaited()
+    assert report["polled_elsewhere"] == 1
+
+
+@pytest.mark.asyncio
+async def test_delays_reach_cached_answers_without_a_forced_refresh(tmp_path, monkeypatch):
+    response_cache = ResponseCache()
+    monkeypatch.setattr("app.feature.train_times.services.response_cache", response_cache)
+    db = DatabaseConnector(database_url=f"sqlite:///{tmp_path / 'live.db'}")
+    db.create_db()
+    service = TrainTimeService(db)
+    request = TrainTimeRequest(
+        station_codes=["LBG", "DFD"], start_time=f"{TODAY:%Y-%m-%d} 09:00", max_wait_time=30
+    )
+    # Reads 09:30 to its 10:08 arrival, which the delay below doesn't touch
+    later = request.model_copy(update={"start_time": f"{TODAY:%Y-%m-%d} 09:30"})
+    # A train every 15 minutes from 05:00, 38 minutes to DFD
+    stub = UpstreamStub(departures=76)
+
+    with stub.patch():
+        await service.fetch_and_store_day("LBG", "DFD", TODAY)
+        before, _ = await service.get_train_destination_arrival(request)
+        assert before.arrival_time == TODAY.replace(hour=9, minute=38)
+        _, later_etag = await service.get_train_destination_arrival(later)
+        assert response_cache.contains(request_key(request))
+
+        # The same answers cached by another worker, which only sees the database
+        other_worker = ResponseCache()
+        for cached in (request, later):
+            entry = response_cache.get(
+                request_key(cached), db.get_api_call_versions, db.get_departure_change_ids
+            )
+            other_worker.put(request_key(cached), entry.response, entry.versions, entry.ranges)
+
+        # The 09:00 now leaves at 09:20, after the 09:15
+        stub.delay("S00016", 20)
+        poller = LiveUpdatePoller(db, {}, history=history(("LBG", "DFD")))
+        report = await poller.run_once(now=NOW)
+
+        assert (report["polled"], report["changed"]) == (1, 1)
+        assert not response_cache.contains(request_key(request))
+        assert response_cache.contains(request_key(later))
+        for cached, survives in ((request, False), (later, True)):
+            entry = other_worker.get(
+                request_key(cached), db.get_api_call_versions, db.get_departure_change_ids
+            )
+            assert (entry is not None) == survives
+        after, _ = await service.get_train_destination_arrival(request)
+        _, later_etag_after = await service.get_train_destination_arrival(later)
+
+    assert after.arrival_time == TODAY.replace(hour=9, minute=53)
+    assert later_etag_after == later_etag
+    # The day fetch and the poll, the requests themselves stayed on the cached path
+    assert stub.calls == 2
@@ -0,0 +1,122 @@
+import csv
+import gzip
+import pytest
+from datetime import datetime, timedelta
+from app.connectors.db.db_connector import DatabaseConnector
+from app.connectors.db.models import APICallTracker, TrainSchedule
+from app.jobs.retention import RetentionJob
+
+NOW = datetime(2024, 8, 20, 12, 0)
+
+
+@pytest.fixture
+def db(tmp_path):
+    db = DatabaseConnector(database_url=f"sqlite:///{tmp_path / 'retention.db'}")
+    db.create_db()
+    for days_ago in range(10):
+        day = NOW.replace(hour=0, minute=0) - timedelta(days=days_ago)
+        db.add_api_call_tracker("LBG", "DFD", day)
+        for hour in (6, 12, 18):
+            departure = day.replace(hour=hour)
+            db.add_train_schedule(
+                "LBG",
+                "DFD",
+                departure,
+                departure + timedelta(minutes=40),
+                departure + timedelta(minutes=40),
+            )
+    yield db
+    db.close()
+    db.engine.dispose()
+
+
+@pytest.mark.asyncio
+async def test_run_once_removes_expired_days_in_batches(db):
+    """Test that days past the horizon are deleted in batches along with their tracker rows."""
+    job = RetentionJob(
+        db, {"train_schedule_days": 3, "batch_size": 2, "pause_seconds_between_batches": 0}
+    )
+
+    report = await job.run_once(now=NOW)
+
+    assert report["train_schedule_deleted"] == 6 * 3
+    assert report["api_call_tracker_deleted"] == 6
+    oldest_departure = db.session.query(TrainSchedule.origin_expected_departure_time).order_by(
+        TrainSchedule.origin_expected_departure_time
+    ).first()[0]
+    assert oldest_departure == datetime(2024, 8, 17, 6, 0)
+    assert not db.has_recent_api_call("LBG", "DFD", datetime(2024, 8, 16, 9, 0))
+    assert db.has_recent_api_call("LBG", "DFD", datetime(2024, 8, 17, 9, 0))
+
+
+@pytest.mark.asyncio
+async def test_tracker_never_outlives_its_schedule_rows(db):
+    """Test that a longer tracker horizon is capped at the schedule horizon."""
+    job = RetentionJob(
+        db,
+        {"train_schedule_days": 2, "api_call_tracker_days": 30, "pause_seconds_between_batches": 0},
+    )
+
+    await job.run_once(now=NOW)
+
+    remaining_days = {row.start_time for row in db.session.query(APICallTracker).all()}
+    assert min(remaining_days) == datetime(2024, 8, 18)
+
+
+@pytest.mark.asyncio
+async def test_dry_run_only_counts(db):
+    """Test that a dry run reports expired rows without deleting anything."""
+    job = RetentionJob(db, {"train_schedule_days": 3})
+
+    report = await job.run_once(now=NOW, dry_run=True)
+
+    assert report["train_schedule_expired"] == 18
+    assert report["api_call_tracker_expired"] == 6
+    assert db.session.query(TrainSchedule).count() == 30
+
+
+@pytest.mark.asyncio
+async def test_expired_rows_are_archived(db, tmp_path):
+    """Test that archived rows land in a gzipped CSV per run."""
+    archive_dir = tmp_path / "archive"
+    job = RetentionJob(
+        db,
+        {"train_schedule_days": 8, "archive_dir": str(archive_dir), "pause_seconds_between_batches": 0},
+    )
+
+    await job.run_once(now=NOW)
+
+    with gzip.open(archive_dir / "train_schedule_20240820.csv.gz", "rt") as file:
+        rows = list(csv.DictReader(file))
+    assert len(rows) == 3
+    assert rows[0]["origin_station_code"] == "LBG"
+
+
+@pytest.mark.asyncio
+async def test_run_once_reclaims_free_pages_incrementally(db):
+    """Test that freed pages are returned to the filesystem without a full VACUUM."""
+    old_day = NOW - timedelta(days=30)
+    db.session.bulk_insert_mappings(
+        TrainSchedule,
+        [
+            {
+                "origin_station_code": "LBG",
+                "destination_station_code": "DFD",
+                "origin_expected_departure_time": old_day + timedelta(seconds=i),
+                "origin_expected_arrival_time": old_day + timedelta(hours=2),
+                "destination_aimed_arrival_time": old_day + timedelta(hours=2),
+            }
+            for i in range(5000)
+        ],
+    )
+    db.session.commit()
+    job = RetentionJob(
+        db,
+        {"train_schedule_days": 20, "incremental_vacuum_pages": 100000, "pause_seconds_between_batches": 0},
+    )
+
+    await job.run_once(now=NOW)
+
+    with db.engine.connect() as connection:
+        assert connection.exec_driver_sql("PRAGMA auto_vacuum").scalar() == 2
+        assert connection.exec_driver_sql("PRAGMA freelist_count").scalar() == 0
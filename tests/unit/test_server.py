@@ -0,0 +1,56 @@
+import os
+from datetime import datetime, timedelta
+from unittest.mock import patch
+
+from app.connectors.db.db_connector import DatabaseConnector
+from app.server import build_config, preload, worker_count
+from app.utils.date_helpers import get_start_window
+
+
+def test_worker_count_defaults_to_one_per_core():
+    assert worker_count({}) == os.cpu_count()
+    assert worker_count({"workers": None}) == os.cpu_count()
+    assert worker_count({"workers": 3}) == 3
+
+
+def test_build_config_applies_the_server_settings():
+    config = build_config(
+        {
+            "port": 9000,
+            "loop": "asyncio",
+            "http": "h11",
+            "backlog": 512,
+            "timeout_keep_alive": 10,
+            "timeout_graceful_shutdown": 15,
+            "limit_concurrency": 200,
+        },
+        app=None,
+    )
+
+    assert (config.host, config.port) == ("127.0.0.1", 9000)
+    assert (config.loop, config.http) == ("asyncio", "h11")
+    assert config.backlog == 512
+    assert config.timeout_keep_alive == 10
+    assert config.timeout_graceful_shutdown == 15
+    assert config.limit_concurrency == 200
+
+
+def test_preload_mirrors_cached_days_and_releases_connections(tmp_path):
+    db = DatabaseConnector(database_url=f"sqlite:///{tmp_path / 'preload.db'}")
+    db.create_db()
+    today = get_start_window(datetime.now())
+    yesterday = today - timedelta(days=1)
+    db.add_api_call_tracker("LBG", "DFD", today)
+    db.add_api_call_tracker("LBG", "DFD", yesterday)
+    db.tracker_mirror.clear()
+
+    with patch("app.main.db_connector", db):
+        app = preload()
+
+    from app.main import app as main_app
+
+    assert app is main_app
+    assert db.tracker_mirror.get(("LBG", "DFD", today)) is not None
+    # Only days from today on are worth sharing with the workers
+    assert db.tracker_mirror.get(("LBG", "DFD", yesterday)) is None
+    assert db.engine.pool.checkedin() == 0
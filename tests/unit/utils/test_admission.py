@@ -0,0 +1,105 @@
+import asyncio
+
+import pytest
+
+from app.utils.admission import COLD, WARM, AdmissionController
+from app.utils.error_handler import OverloadedError
+
+
+async def hold(controller, priority, release: asyncio.Event, order=None, name=None):
+    async with controller.admit(priority):
+        if order is not None:
+            order.append(name)
+        await release.wait()
+
+
+@pytest.mark.asyncio
+async def test_in_flight_limit_queues_then_rejects():
+    controller = AdmissionController(max_in_flight=2, max_queue=1, queue_timeout_seconds=5)
+    release = asyncio.Event()
+    holders = [asyncio.create_task(hold(controller, COLD, release)) for _ in range(3)]
+    await asyncio.sleep(0)
+
+    assert controller.in_flight == 2 and controller.queued == 1
+    with pytest.raises(OverloadedError) as error:
+        async with controller.admit(COLD):
+            pass
+    assert error.value.status_code == 503
+
+    release.set()
+    await asyncio.gather(*holders)
+    assert controller.in_flight == 0 and controller.queued == 0
+
+
+@pytest.mark.asyncio
+async def test_warm_requests_are_admitted_before_queued_cold_ones():
+    controller = AdmissionController(max_in_flight=1, max_queue=10, queue_timeout_seconds=5)
+    release, order = asyncio.Event(), []
+    first = asyncio.create_task(hold(controller, COLD, release, order, "first"))
+    await asyncio.sleep(0)
+    queued = [
+        asyncio.create_task(hold(controller, COLD, release, order, "cold")),
+        asyncio.create_task(hold(controller, WARM, release, order, "warm")),
+    ]
+    await asyncio.sleep(0)
+
+    release.set()
+    await asyncio.gather(first, *queued)
+    assert order == ["first", "warm", "cold"]
+
+
+@pytest.mark.asyncio
+async def test_warm_request_displaces_cold_when_the_queue_is_full():
+    controller = AdmissionController(max_in_flight=1, max_queue=1, queue_timeout_seconds=5)
+    release = asyncio.Event()
+    running = asyncio.create_task(hold(controller, COLD, release))
+    await asyncio.sleep(0)
+    cold = asyncio.create_task(hold(controller, COLD, release))
+    await asyncio.sleep(0)
+    warm = asyncio.create_task(hold(controller, WARM, release))
+    await asyncio.sleep(0)
+
+    with pytest.raises(OverloadedError):
+        await cold
+    release.set()
+    await asyncio.gather(running, warm)
+    assert controller.in_flight == 0
+
+
+@pytest.mark.asyncio
+async def test_queued_request_gives_up_at_the_deadline():
+    controller = AdmissionController(
+        max_in_flight=1, max_queue=5, queue_timeout_seconds=0.05, retry_after_seconds=3
+    )
+    release = asyncio.Event()
+    running = asyncio.create_task(hold(controller, COLD, release))
+    await asyncio.sleep(0)
+
+    with pytest.raises(OverloadedError) as error:
+        async with controller.admit(WARM):
+            pass
+    assert error.value.retry_after == 3
+    assert controller.queued == 0
+
+    release.set()
+    await running
+    assert controller.in_flight == 0
+
+
+@pytest.mark.asyncio
+async def test_cold_requests_cannot_take_every_slot():
+    controller = AdmissionController(
+        max_in_flight=3, max_cold_in_flight=1, max_queue=5, queue_timeout_seconds=5
+    )
+    release = asyncio.Event()
+    cold = [asyncio.create_task(hold(controller, COLD, release)) for _ in range(2)]
+    await asyncio.sleep(0)
+    assert controller.running == {"warm": 0, "cold": 1} and controller.queued == 1
+
+    # Warm traffic still gets straight in past the queued cold request
+    async with controller.admit(WARM):
+        assert controller.running["warm"] == 1
+
+    release.set()
+    await asyncio.gather(*cold)
+    assert controller.in_flight == 0
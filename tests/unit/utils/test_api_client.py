@@ -0,0 +1,156 @@
+import asyncio
+import json
+
+import pytest
+import pytest_asyncio
+import httpx
+
+from app.utils.api_client import UpstreamClient
+from app.utils.error_handler import UpstreamUnavailableError
+from app.utils.resilience import CircuitBreaker, LatencyTracker
+from benchmarks.fault_server import FaultInjectingServer
+
+TIMETABLE_PATH = "/station_timetables/crs%3ALBG.json"
+PARAMS = {"datetime": "2024-08-04T00:00:00+01:00", "destination": "crs:DFD"}
+
+
+@pytest_asyncio.fixture
+async def upstream():
+    server = await FaultInjectingServer(departures=5).start()
+    yield server
+    await server.stop()
+
+
+def make_client(**overrides) -> UpstreamClient:
+    settings = dict(
+        max_attempts=3,
+        backoff_base_seconds=0.01,
+        backoff_max_seconds=0.02,
+        timeout_min_seconds=0.2,
+        timeout_max_seconds=0.2,
+        breaker=CircuitBreaker(failure_threshold=2, reset_timeout_seconds=60),
+    )
+    settings.update(overrides)
+    return UpstreamClient(**settings)
+
+
+@pytest.mark.asyncio
+async def test_transient_failures_are_retried(upstream):
+    upstream.script = ["500", "reset", "ok"]
+    data = await make_client().get_json(upstream.base_url + TIMETABLE_PATH, PARAMS)
+
+    assert len(data["departures"]["all"]) == 5
+    assert upstream.requests == 3
+
+
+@pytest.mark.asyncio
+async def test_client_errors_are_not_retried(upstream):
+    upstream.script = ["404"]
+    with pytest.raises(httpx.HTTPStatusError):
+        await make_client().get_json(upstream.base_url + TIMETABLE_PATH, PARAMS)
+    assert upstream.requests == 1
+
+
+@pytest.mark.asyncio
+async def test_slow_attempts_time_out_and_the_circuit_opens(upstream):
+    upstream.script = ["delay:1"] * 6
+    client = make_client()
+
+    for _ in range(2):
+        with pytest.raises(UpstreamUnavailableError):
+            await client.get_json(upstream.base_url + TIMETABLE_PATH, PARAMS)
+    assert upstream.requests == 6
+    assert client.breaker.state == CircuitBreaker.OPEN
+
+    # Open circuit fails fast without touching the upstream
+    with pytest.raises(UpstreamUnavailableError) as error:
+        await client.get_json(upstream.base_url + TIMETABLE_PATH, PARAMS)
+    assert upstream.requests == 6
+    assert error.value.status_code == 503
+    assert error.value.retry_after > 0
+
+
+@pytest.mark.asyncio
+async def test_slow_attempt_is_hedged(upstream):
+    upstream.script = ["delay:0.5", "ok"]
+    client = make_client(
+        hedge_enabled=True,
+        hedge_min_delay_seconds=0.05,
+        timeout_min_seconds=1,
+        timeout_max_seconds=1,
+    )
+    for _ in range(5):
+        client.latency.observe(0.01)
+
+    data = await client.get_json(upstream.base_url + TIMETABLE_PATH, PARAMS)
+
+    assert data["departures"]["all"]
+    assert upstream.requests == 2
+
+
+def test_circuit_breaker_half_opens_for_a_single_trial():
+    now = [0.0]
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout_seconds=10, clock=lambda: now[0])
+    breaker.record_failure()
+    assert not breaker.allow()
+
+    now[0] = 11
+    assert breaker.allow()
+    assert not breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.OPEN
+
+    now[0] = 22
+    assert breaker.allow()
+    breaker.record_success()
+    assert breaker.state == CircuitBreaker.CLOSED and breaker.allow()
+
+
+def open_breaker(client: UpstreamClient):
+    """Open the client's breaker with its reset timeout already passed, so the next call is the trial."""
+    for _ in range(client.breaker.failure_threshold):
+        client.breaker.record_failure()
+    client.breaker.opened_at -= client.breaker.reset_timeout_seconds
+
+
+@pytest.mark.asyncio
+async def test_cancelled_trial_gives_back_its_slot(upstream):
+    upstream.script = ["delay:1", "ok"]
+    client = make_client(timeout_min_seconds=2, timeout_max_seconds=2)
+    open_breaker(client)
+
+    trial = asyncio.create_task(client.get_json(upstream.base_url + TIMETABLE_PATH, PARAMS))
+    while not upstream.requests:
+        await asyncio.sleep(0.01)
+    trial.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await trial
+
+    # The next call is let through as the trial and closes the circuit
+    data = await client.get_json(upstream.base_url + TIMETABLE_PATH, PARAMS)
+    assert data["departures"]["all"]
+    assert client.breaker.state == CircuitBreaker.CLOSED
+
+
+@pytest.mark.asyncio
+async def test_undecodable_trial_reopens_the_circuit(upstream):
+    upstream.script = ["garbage"]
+    client = make_client()
+    open_breaker(client)
+
+    with pytest.raises(json.JSONDecodeError):
+        await client.get_json(upstream.base_url + TIMETABLE_PATH, PARAMS)
+
+    assert client.breaker.state == CircuitBreaker.OPEN
+    assert client.breaker.retry_after() > 0
+
+
+def test_latency_tracker_timeout_follows_observed_latency():
+    tracker = LatencyTracker(min_timeout_seconds=0.5, max_timeout_seconds=10)
+    assert tracker.timeout() == 10
+    for _ in range(50):
+        tracker.observe(0.2)
+    assert tracker.timeout() == 0.5
+    for _ in range(50):
+        tracker.observe(3.0)
+    assert 3.0 <= tracker.timeout() < 10
@@ -0,0 +1,28 @@
+from app.utils.intervals import IntervalSet
+
+
+def test_add_merges_overlapping_and_touching_intervals():
+    """Test that intervals stay sorted and disjoint, with touching ones merged."""
+    intervals = IntervalSet([(10, 20), (30, 40)])
+    intervals.add(20, 25)
+    intervals.add(50, 60)
+    intervals.add(35, 55)
+
+    assert list(intervals) == [(10, 25), (30, 60)]
+
+
+def test_gaps_are_the_uncovered_parts_of_a_range():
+    """Test that gaps lists only what no interval covers, clipped to the range."""
+    intervals = IntervalSet([(10, 20), (30, 40)])
+
+    assert intervals.gaps(0, 50) == [(0, 10), (20, 30), (40, 50)]
+    assert intervals.gaps(12, 35) == [(20, 30)]
+    assert intervals.covers(31, 40)
+    assert not intervals.covers(15, 21)
+
+
+def test_discard_before_drops_finished_intervals():
+    intervals = IntervalSet([(10, 20), (30, 40)])
+    intervals.discard_before(20)
+
+    assert list(intervals) == [(30, 40)]
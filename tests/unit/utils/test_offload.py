@@ -0,0 +1,69 @@
+import threading
+import pytest
+from app.connectors.train_api.train_api_connector import map_api_response_to_model
+from app.utils.offload import INLINE, PROCESS, THREAD, Offloader
+from benchmarks.upstream_stub import build_station_timetable
+
+
+def current_thread_name(_):
+    return threading.current_thread().name
+
+
+@pytest.mark.asyncio
+async def test_small_work_stays_on_the_loop_thread():
+    """Test that work under the size threshold isn't handed to the pool."""
+    offloader = Offloader(mode=THREAD, min_size=200)
+
+    assert (
+        await offloader.run(current_thread_name, None, size=10)
+        == threading.current_thread().name
+    )
+    assert offloader._executor is None
+
+
+@pytest.mark.asyncio
+async def test_large_work_runs_in_the_thread_pool():
+    """Test that work over the threshold runs on a pool thread."""
+    offloader = Offloader(mode=THREAD, min_size=200)
+    try:
+        name = await offloader.run(current_thread_name, None, size=500)
+    finally:
+        offloader.shutdown()
+
+    assert name.startswith("offload")
+
+
+@pytest.mark.asyncio
+async def test_inline_mode_never_uses_a_pool():
+    """Test that inline mode runs everything on the loop whatever its size."""
+    offloader = Offloader(mode=INLINE)
+
+    assert (
+        await offloader.run(current_thread_name, None, size=10_000)
+        == threading.current_thread().name
+    )
+
+
+@pytest.mark.asyncio
+async def test_process_pool_maps_a_board_like_inline():
+    """Test that a board mapped in a worker process comes back as the same compact records."""
+    board = build_station_timetable("LBG", "DFD", "2024-08-04", departures=300)
+    offloader = Offloader(
+        mode=PROCESS,
+        max_workers=1,
+        min_size=200,
+        preload_modules=["app.connectors.train_api.train_api_connector"],
+    )
+    try:
+        result = await offloader.run(map_api_response_to_model, board, size=300)
+    finally:
+        offloader.shutdown()
+
+    assert result.departures == map_api_response_to_model(board).departures
+    assert len(result.departures) == 300
+
+
+def test_unknown_mode_is_rejected():
+    """Test that a typo in the offload mode fails at startup rather than silently running inline."""
+    with pytest.raises(ValueError):
+        Offloader(mode="processes")
@@ -0,0 +1,58 @@
+import asyncio
+import pytest
+from unittest.mock import AsyncMock, MagicMock
+
+from app.utils.error_handler import TrainServiceError
+from app.utils.responses import _ndjson_lines
+
+
+def client(disconnect: asyncio.Event):
+    request = MagicMock()
+
+    async def receive():
+        await disconnect.wait()
+        return {"type": "http.disconnect"}
+
+    request.receive = receive
+    return request
+
+
+@pytest.mark.asyncio
+async def test_disconnecting_cancels_the_event_being_worked_on():
+    """Test that the stream stops and cancels its pending work when the client goes away."""
+    disconnect = asyncio.Event()
+    cancelled = asyncio.Event()
+    on_close = AsyncMock()
+
+    async def events():
+        yield {"leg": 1}
+        try:
+            await asyncio.sleep(10)
+        except asyncio.CancelledError:
+            cancelled.set()
+            raise
+        yield {"leg": 2}
+
+    lines = _ndjson_lines(events(), client(disconnect), on_close)
+    assert await anext(lines) == b'{"leg":1}\n'
+    disconnect.set()
+
+    assert [line async for line in lines] == []
+    assert cancelled.is_set()
+    on_close.assert_awaited_once()
+
+
+@pytest.mark.asyncio
+async def test_errors_after_the_first_line_end_the_stream_with_an_error_line():
+    """Test that a failure part way through is reported in the stream itself."""
+
+    async def events():
+        yield {"leg": 1}
+        raise TrainServiceError("No train found", status_code=404)
+
+    lines = [line async for line in _ndjson_lines(events(), client(asyncio.Event()))]
+
+    assert lines == [
+        b'{"leg":1}\n',
+        b'{"type":"error","status_code":404,"message":"No train found"}\n',
+    ]